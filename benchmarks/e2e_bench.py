@@ -0,0 +1,501 @@
+"""
+End-to-end benchmark of agent turns against local stand-ins for the LLM
+endpoint and Tavily (see `fake_services.py`), so runs are repeatable and free.
+
+The agent is the one `cli.py` builds, with every cache and index placed in a
+temporary directory. For each scenario in `scenarios.py` it reports turn
+latency percentiles, model and per-tool latency, agent overhead (turn time
+not spent waiting on the model or a tool) and peak memory. Results are saved
+as JSON; with `--baseline` they are compared against an earlier run and the
+script exits with status 1 if a metric regressed by more than
+`--max-regression` percent.
+
+Usage:
+    python benchmarks/e2e_bench.py [--scenarios research math crawl] [--repeat 5]
+        [--llm-latency 0.2] [--tavily-latency 0.1] [--output results.json]
+        [--baseline baseline.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+
+from fake_services import FakeLLMServer, FakeTavilyServer
+from scenarios import SCENARIOS, all_turns
+
+# Differences below these are noise, whatever their relative size
+_NOISE_FLOOR_S = 0.005
+_NOISE_FLOOR_MB = 5.0
+
+
+class SpanRecorder(BaseCallbackHandler):
+    """Record the start and end of every model and tool call of an agent run."""
+
+    # Timestamps must be taken when the event happens, not when an executor gets to it
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open: dict = {}
+        self.spans: list[tuple[str, str, float, float]] = []
+        self.errors = 0
+        # Characters of every prompt sent to the main model
+        self.prompt_chars: list[int] = []
+
+    def _start(self, run_id, kind: str, name: str):
+        with self._lock:
+            self._open[run_id] = (kind, name, time.perf_counter())
+
+    def _end(self, run_id, error: bool = False):
+        with self._lock:
+            started = self._open.pop(run_id, None)
+            if started is not None:
+                self.spans.append((*started, time.perf_counter()))
+            self.errors += error
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        if "compression" in (kwargs.get("tags") or []):
+            # The fast model condensing a tool output counts towards the tool step
+            self._start(run_id, "tool", "[compress]")
+            return
+        self._start(run_id, "llm", "model")
+        with self._lock:
+            self.prompt_chars.append(
+                sum(len(str(message.content)) for batch in messages for message in batch)
+            )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=True)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tool", kwargs.get("name") or (serialized or {}).get("name", "tool"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=True)
+
+    def take(self) -> tuple[list[tuple[str, str, float, float]], int, list[int]]:
+        """Return and clear the spans, error count and main-model prompt sizes recorded so far."""
+        with self._lock:
+            spans, errors, prompt_chars = self.spans, self.errors, self.prompt_chars
+            self.spans, self.errors, self.prompt_chars = [], 0, []
+        return spans, errors, prompt_chars
+
+
+def _proc_rss(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _tree_rss(pid: int) -> int:
+    """Resident bytes of a process and its descendants (e.g. math workers), Linux only."""
+    total, stack = 0, [pid]
+    while stack:
+        pid = stack.pop()
+        try:
+            total += _proc_rss(pid)
+            for task in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{task}/children") as f:
+                    stack.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+class RssSampler(threading.Thread):
+    """Track the peak resident memory of this process plus its child processes."""
+
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+        self.supported = os.path.exists("/proc/self/task")
+
+    def run(self):
+        while self.supported and not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, _tree_rss(os.getpid()))
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def _percentiles(values: list[float]) -> dict:
+    values = sorted(values)
+    if len(values) == 1:
+        p50 = p90 = p99 = values[0]
+    else:
+        cuts = statistics.quantiles(values, n=100, method="inclusive")
+        p50, p90, p99 = cuts[49], cuts[89], cuts[98]
+    return {
+        "mean": round(statistics.fmean(values), 4),
+        "p50": round(p50, 4),
+        "p90": round(p90, 4),
+        "p99": round(p99, 4),
+        "max": round(values[-1], 4),
+    }
+
+
+def _busy_time(intervals: list[tuple[float, float]]) -> float:
+    """Length of the union of possibly overlapping intervals."""
+    busy, end = 0.0, float("-inf")
+    for start, stop in sorted(intervals):
+        if stop <= end:
+            continue
+        busy += stop - max(start, end)
+        end = stop
+    return busy
+
+
+async def run_turn(agent, prompt: str, thread_id: str, recorder: SpanRecorder) -> dict:
+    """Run one agent turn to completion and break down where its time went."""
+    config = {"configurable": {"thread_id": thread_id}, "callbacks": [recorder]}
+    started = time.perf_counter()
+    async for _ in agent.astream(
+        {"messages": [HumanMessage(content=prompt)]},
+        config=config,
+        stream_mode=["updates"],
+    ):
+        pass
+    latency = time.perf_counter() - started
+    spans, errors, prompt_chars = recorder.take()
+    llm = [stop - start for kind, _, start, stop in spans if kind == "llm"]
+    return {
+        "latency_s": latency,
+        "llm_s": llm,
+        "prompt_chars": prompt_chars,
+        "tools": [(name, stop - start) for kind, name, start, stop in spans if kind == "tool"],
+        "overhead_s": latency - _busy_time([(start, stop) for _, _, start, stop in spans]),
+        "errors": errors,
+    }
+
+
+def summarize(turns: list[dict]) -> dict:
+    """Aggregate measured turns into latency percentiles and per-tool statistics."""
+    tools: dict[str, list[float]] = {}
+    for turn in turns:
+        for name, seconds in turn["tools"]:
+            tools.setdefault(name, []).append(seconds)
+    llm = [seconds for turn in turns for seconds in turn["llm_s"]]
+    prompt_chars = [chars for turn in turns for chars in turn["prompt_chars"]]
+    total = sum(turn["latency_s"] for turn in turns)
+    overhead = [turn["overhead_s"] for turn in turns]
+    return {
+        "turns": len(turns),
+        "turn_latency_s": _percentiles([turn["latency_s"] for turn in turns]),
+        "llm": {
+            "calls": len(llm),
+            "mean_s": round(statistics.fmean(llm), 4) if llm else 0.0,
+            "share": round(sum(llm) / total, 4) if total else 0.0,
+            "prompt_chars_mean": round(statistics.fmean(prompt_chars)) if prompt_chars else 0,
+        },
+        "tools": {
+            name: {"calls": len(values), **_percentiles(values)}
+            for name, values in sorted(tools.items())
+        },
+        "overhead_s": _percentiles(overhead),
+        "overhead_share": round(sum(overhead) / total, 4) if total else 0.0,
+        "errors": sum(turn["errors"] for turn in turns),
+    }
+
+
+def _configure_environment(
+    args, workdir: str, llm_url: str, tavily_url: str, fast_url: str | None = None
+):
+    """Point the app at the stand-ins and keep its caches and indexes in `workdir`."""
+    os.environ.update(
+        MAIN_LLM_BASE_URL=llm_url + "/v1",
+        MAIN_LLM_API_KEY="fake",
+        MAIN_LLM_MODEL_NAME="fake",
+        TAVILY_API_KEY="fake",
+        TAVILY_API_BASE_URL=tavily_url,
+        USE_CRAWL4AI="False",
+        CACHE_DIR=os.path.join(workdir, "cache"),
+        PASSAGE_INDEX_PATH=os.path.join(workdir, "index", "passages.sqlite"),
+        SANDBOX_INDEX_PATH=os.path.join(workdir, "index", "files.sqlite"),
+        # Near-duplicate filtering with the built-in embedder, not an endpoint
+        DEDUP_EMBEDDINGS="local",
+        DEDUP_STORE_DIR=os.path.join(workdir, "index", "embeddings"),
+    )
+    if fast_url:
+        os.environ.update(
+            COMPRESSION_ENABLED="True",
+            CODER_LLM_BASE_URL=fast_url + "/v1",
+            CODER_LLM_API_KEY="fake",
+            CODER_LLM_MODEL_NAME="fake-fast",
+        )
+    else:
+        os.environ["COMPRESSION_ENABLED"] = "False"
+    os.environ["PREFETCH_ENABLED"] = str(args.prefetch)
+    if not args.caches:
+        os.environ.update(
+            SEARCH_CACHE_MODE="off",
+            PAGE_CACHE_ENABLED="False",
+            LLM_CACHE_MODE="off",
+            COMPRESSION_CACHE_ENABLED="False",
+        )
+
+
+def run_benchmark(args) -> dict:
+    llm = FakeLLMServer(all_turns(), latency=args.llm_latency, prefill=args.llm_prefill).start()
+    tavily = FakeTavilyServer(latency=args.tavily_latency, page_bytes=args.page_bytes).start()
+    # Stand-in for the fast model condensing tool outputs, with --fast-latency
+    fast = (
+        FakeLLMServer([], latency=args.fast_latency, prefill=args.llm_prefill / 4).start()
+        if args.fast_latency is not None
+        else None
+    )
+    workdir = tempfile.mkdtemp(prefix="e2e-bench-")
+    _configure_environment(args, workdir, llm.url, tavily.url, fast.url if fast else None)
+
+    # Imported only now, so the app reads the environment set above
+    from cli import build_agent
+    from tools.governor import governor_stats
+    from tools.math_pool import shutdown_math_pool
+    from tools.prefetch import get_prefetcher
+    from utils import run_sync
+
+    recorder = SpanRecorder()
+    sampler = RssSampler()
+    sampler.start()
+    started = time.perf_counter()
+    results = {}
+    try:
+        for name in args.scenarios:
+            measured = []
+            for run in range(args.warmup + args.repeat):
+                agent = build_agent(os.path.join(workdir, "sandbox", f"{name}-{run}"))
+                thread_id = f"bench-{name}-{uuid.uuid4().hex[:8]}"
+                for turn in SCENARIOS[name]["turns"]:
+                    result = run_sync(run_turn(agent, turn["prompt"], thread_id, recorder))
+                    if run >= args.warmup:
+                        measured.append(result)
+            results[name] = summarize(measured)
+            print(f"{name}: {results[name]['turns']} turns measured", file=sys.stderr)
+    finally:
+        sampler.stop()
+        shutdown_math_pool()
+        llm.stop()
+        tavily.stop()
+        if fast is not None:
+            fast.stop()
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    prefetcher = get_prefetcher()
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "llm_latency_s": args.llm_latency,
+            "tavily_latency_s": args.tavily_latency,
+            "page_bytes": args.page_bytes,
+            "caches": args.caches,
+            "fast_latency_s": args.fast_latency,
+            "llm_prefill_s_per_kchar": args.llm_prefill,
+            "prefetch": args.prefetch,
+        },
+        "wall_s": round(time.perf_counter() - started, 3),
+        "scenarios": results,
+        "upstream": governor_stats(),
+        "prefetch": prefetcher.stats() if prefetcher is not None else None,
+        "memory": {
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "peak_rss_with_children_mb": (
+                round(sampler.peak / 1024**2, 1) if sampler.supported else None
+            ),
+        },
+    }
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        f"{'scenario':<12}{'turns':>6}{'p50 s':>9}{'p90 s':>9}{'p99 s':>9}"
+        f"{'llm %':>8}{'overhead s':>12}{'errors':>8}"
+    ]
+    for name, result in report["scenarios"].items():
+        latency = result["turn_latency_s"]
+        lines.append(
+            f"{name:<12}{result['turns']:>6}{latency['p50']:>9.3f}{latency['p90']:>9.3f}"
+            f"{latency['p99']:>9.3f}{result['llm']['share'] * 100:>8.1f}"
+            f"{result['overhead_s']['mean']:>12.3f}{result['errors']:>8}"
+        )
+    lines.append("")
+    lines.append(
+        f"{'scenario':<12}{'tool':<28}{'calls':>7}{'p50 ms':>10}{'p90 ms':>10}{'max ms':>10}"
+    )
+    for name, result in report["scenarios"].items():
+        for tool, stats in result["tools"].items():
+            lines.append(
+                f"{name:<12}{tool:<28}{stats['calls']:>7}{stats['p50'] * 1000:>10.1f}"
+                f"{stats['p90'] * 1000:>10.1f}{stats['max'] * 1000:>10.1f}"
+            )
+    if report.get("upstream"):
+        from tools.governor import format_governor_stats
+
+        lines.append("")
+        lines.append(format_governor_stats(report["upstream"]))
+    if report.get("prefetch"):
+        from tools.prefetch import format_prefetch_stats
+
+        lines.append(format_prefetch_stats(report["prefetch"]))
+    memory = report["memory"]
+    lines.append("")
+    lines.append(f"Peak RSS: {memory['peak_rss_mb']:.1f} MB")
+    if memory["peak_rss_with_children_mb"] is not None:
+        lines.append(f"Peak RSS with child processes: {memory['peak_rss_with_children_mb']:.1f} MB")
+    return "\n".join(lines)
+
+
+def _comparable_metrics(report: dict) -> dict[str, float]:
+    """Flatten the metrics compared against a baseline; lower is better for all."""
+    metrics = {}
+    for name, result in report["scenarios"].items():
+        for q in ("p50", "p90"):
+            metrics[f"{name}.turn_latency_s.{q}"] = result["turn_latency_s"][q]
+        metrics[f"{name}.overhead_s.mean"] = result["overhead_s"]["mean"]
+        if "prompt_chars_mean" in result["llm"]:
+            metrics[f"{name}.llm.prompt_chars_mean"] = result["llm"]["prompt_chars_mean"]
+        for tool, stats in result["tools"].items():
+            metrics[f"{name}.tools.{tool}.p50"] = stats["p50"]
+    for key, value in report["memory"].items():
+        if value is not None:
+            metrics[f"memory.{key}"] = value
+    return metrics
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> tuple[str, list[str]]:
+    """
+    Compare a run against a baseline run.
+
+    Returns:
+        tuple: (comparison table, names of metrics that regressed by more than
+            `max_regression` percent and more than the noise floor).
+    """
+    current, before = _comparable_metrics(report), _comparable_metrics(baseline)
+    lines = [f"{'metric':<48}{'baseline':>11}{'current':>11}{'change':>9}"]
+    regressions = []
+    for key in sorted(current.keys() & before.keys()):
+        old, new = before[key], current[key]
+        change = (new - old) / old * 100 if old else 0.0
+        floor = _NOISE_FLOOR_MB if key.startswith("memory.") else _NOISE_FLOOR_S
+        flag = ""
+        if change > max_regression and new - old > floor:
+            regressions.append(key)
+            flag = "  REGRESSED"
+        lines.append(f"{key:<48}{old:>11.4f}{new:>11.4f}{change:>+8.1f}%{flag}")
+    return "\n".join(lines), regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end agent benchmark with local stand-ins.")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=5, help="Measured runs per scenario.")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured runs per scenario first.")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per model call.")
+    parser.add_argument(
+        "--llm-prefill",
+        type=float,
+        default=0.0,
+        help="Extra model seconds per 1000 prompt characters (the fast model gets a quarter).",
+    )
+    parser.add_argument("--tavily-latency", type=float, default=0.1, help="Seconds per Tavily call.")
+    parser.add_argument(
+        "--page-bytes", type=int, default=0, help="Pad fixture pages to at least this size."
+    )
+    parser.add_argument(
+        "--caches",
+        action="store_true",
+        help="Keep the search and page caches on (off by default, so every call reaches the stand-ins).",
+    )
+    parser.add_argument(
+        "--fast-latency",
+        type=float,
+        default=None,
+        help="Condense large tool outputs with a fast-model stand-in answering in this many seconds (off by default).",
+    )
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        help="Prefetch the top search hits in the background (off by default).",
+    )
+    parser.add_argument("--output", default="e2e_results.json", help="Where to save the results.")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against.")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=10.0,
+        help="Percent slowdown against the baseline that fails the run (default: 10).",
+    )
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(format_report(report))
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        settings = (
+            "llm_latency_s",
+            "tavily_latency_s",
+            "llm_prefill_s_per_kchar",
+            "fast_latency_s",
+            "page_bytes",
+            "caches",
+            "prefetch",
+        )
+        if any(baseline["meta"].get(key) != report["meta"][key] for key in settings):
+            print("\nWarning: the baseline ran with different stand-in settings", file=sys.stderr)
+        table, regressions = compare(report, baseline, args.max_regression)
+        print("\n" + table)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.max_regression:g}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
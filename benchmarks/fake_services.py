@@ -0,0 +1,322 @@
+"""
+Local stand-ins for the OpenAI-compatible chat endpoint and the Tavily API,
+used by `benchmarks/e2e_bench.py`.
+
+`FakeLLMServer` replays scripted tool-calling conversations: the last user
+message selects a scripted turn and the number of assistant messages since
+then selects the step, so the agent sees the same sequence of tool calls on
+every run. Unscripted requests without tools, such as those of the fast model
+condensing tool outputs, are answered extractively with the source sentences
+that best match the question. `FakeTavilyServer` serves `/search` and `/extract` from the
+Markdown pages in `benchmarks/fixtures`. Both sleep for a configurable latency
+before answering.
+
+They can also be run on their own, to point `main.py` or `cli.py` at them:
+
+Usage:
+    python benchmarks/fake_services.py [--llm-port 8701] [--tavily-port 8702]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURE_URL = "https://fixtures.bench/{}"
+
+
+def _tokens(text: str) -> list[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def _text_of(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(
+        part.get("text", "") for part in content or [] if isinstance(part, dict)
+    )
+
+
+def condense(prompt: str, facts: int = 5) -> str:
+    """
+    Answer a "Question: ...\n\nSource: <url> ..." prompt with the source
+    sentences sharing the most words with the question, as cited bullets.
+    """
+    question, _, source = prompt.partition("\n\n")
+    match = re.search(r"Source: (\S+)", source)
+    url = match.group(1) if match else "source"
+    words = set(_tokens(question))
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", source) if len(s.strip()) > 20]
+    ranked = sorted(sentences, key=lambda s: -len(words & set(_tokens(s))))[:facts]
+    if not ranked:
+        return "No relevant facts."
+    return "\n".join(f"- {sentence} [{url}]" for sentence in ranked)
+
+
+class _Service:
+    """A JSON-over-HTTP server on a background thread, bound to a free port by default."""
+
+    def __init__(self, latency: float = 0.0, port: int = 0):
+        self.latency = latency
+        self.requests = Counter()
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                path = self.path.rstrip("/")
+                service.requests[path] += 1
+                if service.latency:
+                    time.sleep(service.latency)
+                try:
+                    service.handle(self, path, body)
+                except KeyError:
+                    self.send_json({"error": f"unknown path {path}"}, status=404)
+
+            def send_json(self, payload, status: int = 200):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle(self, handler, path: str, body: dict):
+        raise NotImplementedError
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeLLMServer(_Service):
+    """
+    OpenAI-compatible `/v1/chat/completions` that replays scripted turns.
+
+    Args:
+        turns (list): Scripted turns, each a dict with a 'prompt' and a list of
+            'steps'; a step is either {'tool_calls': [{'name', 'args'}, ...]}
+            or {'content': final answer}.
+        latency (float): Seconds to wait before each completion.
+        port (int): Port to listen on, 0 for any free port.
+        prefill (float): Extra seconds per 1000 prompt characters, so longer
+            prompts take longer as with a real model.
+    """
+
+    def __init__(
+        self, turns: list[dict], latency: float = 0.0, port: int = 0, prefill: float = 0.0
+    ):
+        super().__init__(latency, port)
+        self.turns = {turn["prompt"]: turn["steps"] for turn in turns}
+        self.prefill = prefill
+
+    def next_step(self, messages: list[dict], tools: bool = True) -> dict:
+        """Return the scripted step that answers a conversation."""
+        last_user = max(
+            (i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1
+        )
+        prompt = _text_of(messages[last_user].get("content"))
+        steps = self.turns.get(prompt, [])
+        if not steps and not tools:
+            return {"content": condense(prompt)}
+        if not steps:
+            return {"content": "No scripted answer for this prompt."}
+        done = sum(1 for m in messages[last_user + 1 :] if m.get("role") == "assistant")
+        return steps[min(done, len(steps) - 1)]
+
+    def handle(self, handler, path: str, body: dict):
+        if not path.endswith("/chat/completions"):
+            raise KeyError(path)
+        step = self.next_step(body.get("messages", []), tools=bool(body.get("tools")))
+        message = {"role": "assistant", "content": step.get("content", "")}
+        if step.get("tool_calls"):
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{uuid.uuid4().hex[:16]}",
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": json.dumps(call["args"])},
+                }
+                for call in step["tool_calls"]
+            ]
+        finish_reason = "tool_calls" if step.get("tool_calls") else "stop"
+        prompt_chars = sum(len(_text_of(m.get("content"))) for m in body.get("messages", []))
+        if self.prefill:
+            time.sleep(self.prefill * prompt_chars / 1000)
+        usage = {
+            "prompt_tokens": prompt_chars // 4,
+            "completion_tokens": len(json.dumps(message)) // 4,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+        }
+        if body.get("stream"):
+            self._stream(handler, completion, message, finish_reason, usage)
+            return
+        handler.send_json(
+            {
+                **completion,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                "usage": usage,
+            }
+        )
+
+    def _stream(self, handler, completion, message, finish_reason, usage):
+        chunk = {**completion, "object": "chat.completion.chunk"}
+        delta = {"role": "assistant", "content": message["content"]}
+        if "tool_calls" in message:
+            delta["tool_calls"] = [
+                {"index": i, **call} for i, call in enumerate(message["tool_calls"])
+            ]
+        events = [
+            {**chunk, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]},
+            {**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]},
+            {**chunk, "choices": [], "usage": usage},
+        ]
+        data = "".join(f"data: {json.dumps(event)}\n\n" for event in events)
+        data = (data + "data: [DONE]\n\n").encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+
+def load_fixture_pages(page_bytes: int = 0) -> dict[str, dict]:
+    """
+    Load the fixture pages, keyed by their URL.
+
+    Args:
+        page_bytes: Pad each page to at least this size by repeating its
+            sections, to simulate long articles. 0 keeps pages as they are.
+    """
+    pages = {}
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if not name.endswith(".md"):
+            continue
+        with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+            text = f.read()
+        title, _, body = text.partition("\n")
+        sections, part = body, 2
+        while len(text.encode()) < page_bytes:
+            text += f"\n\n## Part {part}\n" + sections
+            part += 1
+        pages[FIXTURE_URL.format(name[:-3])] = {"title": title.lstrip("# "), "text": text}
+    return pages
+
+
+class FakeTavilyServer(_Service):
+    """
+    Tavily `/search` and `/extract` served from the fixture pages.
+
+    Search ranks pages by how many query words they contain; extract returns
+    a page's Markdown, and unknown URLs come back as failed results.
+
+    Args:
+        latency (float): Seconds to wait before each response.
+        page_bytes (int): Minimum page size, see `load_fixture_pages`.
+        port (int): Port to listen on, 0 for any free port.
+    """
+
+    def __init__(self, latency: float = 0.0, page_bytes: int = 0, port: int = 0):
+        super().__init__(latency, port)
+        self.pages = load_fixture_pages(page_bytes)
+        self._counts = {url: Counter(_tokens(page["text"])) for url, page in self.pages.items()}
+
+    def search(self, query: str, max_results: int = 5) -> dict:
+        words = set(_tokens(query))
+        scored = []
+        for url, counts in self._counts.items():
+            score = sum(min(counts[word], 5) for word in words)
+            if score:
+                scored.append((score, url))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        top = max((score for score, _ in scored), default=1)
+        return {
+            "query": query,
+            "results": [
+                {
+                    "title": self.pages[url]["title"],
+                    "url": url,
+                    "content": self.pages[url]["text"].split("\n\n")[1][:300],
+                    "score": round(score / top, 3),
+                    "raw_content": None,
+                }
+                for score, url in scored[:max_results]
+            ],
+            "response_time": self.latency,
+        }
+
+    def extract(self, urls: list[str]) -> dict:
+        results, failed = [], []
+        for url in urls:
+            page = self.pages.get(url)
+            if page is None:
+                failed.append({"url": url, "error": "Not found"})
+            else:
+                results.append({"url": url, "raw_content": page["text"], "images": []})
+        return {"results": results, "failed_results": failed, "response_time": self.latency}
+
+    def handle(self, handler, path: str, body: dict):
+        if path == "/search":
+            handler.send_json(self.search(body.get("query", ""), body.get("max_results", 5)))
+        elif path == "/extract":
+            urls = body.get("urls", [])
+            handler.send_json(self.extract([urls] if isinstance(urls, str) else urls))
+        else:
+            raise KeyError(path)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from scenarios import all_turns
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--llm-port", type=int, default=8701)
+    parser.add_argument("--tavily-port", type=int, default=8702)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tavily-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    llm = FakeLLMServer(all_turns(), args.llm_latency, args.llm_port).start()
+    tavily = FakeTavilyServer(args.tavily_latency, port=args.tavily_port).start()
+    print(f"MAIN_LLM_BASE_URL={llm.url}/v1")
+    print("MAIN_LLM_API_KEY=fake")
+    print("MAIN_LLM_MODEL_NAME=fake")
+    print("TAVILY_API_KEY=fake")
+    print(f"TAVILY_API_BASE_URL={tavily.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        llm.stop()
+        tavily.stop()
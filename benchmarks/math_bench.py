@@ -0,0 +1,120 @@
+"""
+Micro-benchmark of `calculate` and `matrix_operation` against their previous,
+SymPy-only implementations (kept below as `legacy_*`). Both run in-process,
+without the worker pool, so only evaluation cost is compared.
+
+Usage:
+    python benchmarks/math_bench.py [--repeat N]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sympy import Matrix, simplify
+from sympy.parsing.sympy_parser import parse_expr
+
+from tools.synbolic_math import calculate, matrix_operation
+
+
+def legacy_preprocess_math(expr: str) -> str:
+    expr = expr.replace("^", "**")
+    expr = re.sub(r"(\d)([a-zA-Z])", r"\1*\2", expr)
+    expr = re.sub(r"(\w)(\()", r"\1*(", expr)
+    expr = re.sub(r"(\d)%", r"0.\1", expr)
+    expr = expr.replace(" ", "")
+    return expr
+
+
+def legacy_calculate(expression: str) -> str:
+    try:
+        raw_expr = legacy_preprocess_math(expression.strip())
+        if "of" in raw_expr:
+            raw_expr = raw_expr.replace("of", "*")
+        expr = parse_expr(raw_expr, evaluate=True)
+        result = simplify(expr)
+        try:
+            float_result = float(result)
+            if float_result.is_integer():
+                return str(int(float_result))
+            return f"{float_result:.6g}"
+        except:
+            return str(result)
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+def legacy_matrix_operation(
+    matrix_a: list, operation: str, matrix_b: list = None
+) -> str:
+    try:
+        A = Matrix(matrix_a)
+        if operation == "determinant":
+            return str(A.det())
+        elif operation == "inverse":
+            return str(A.inv())
+        elif operation == "transpose":
+            return str(A.T)
+        elif operation == "multiply" and matrix_b is not None:
+            B = Matrix(matrix_b)
+            return str(A * B)
+        else:
+            return "Error: Unsupported operation or missing matrix."
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+def _random_matrix(n: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [[round(rng.uniform(-10, 10), 3) for _ in range(n)] for _ in range(n)]
+
+
+CALCULATIONS = [
+    "15% of 200",
+    "(3 + 4) * 12 / 5",
+    "2^10 - 1",
+    "1/3 + 1/6",
+    "x**2 + 2*x + 1",  # symbolic: parse cache only
+]
+
+M8, M8_B = _random_matrix(8, 1), _random_matrix(8, 2)
+M30 = _random_matrix(30, 3)
+MATRICES = [
+    ("det 8x8", (M8, "determinant")),
+    ("inverse 8x8", (M8, "inverse")),
+    ("multiply 8x8", (M8, "multiply", M8_B)),
+    ("det 30x30", (M30, "determinant")),
+]
+
+
+def _best(fn, args, repeat: int) -> float:
+    return min(timeit.repeat(lambda: fn(*args), number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'case':<24}{'legacy ms':>12}{'new ms':>12}{'speedup':>10}")
+    cases = [(expr, legacy_calculate, calculate, (expr,)) for expr in CALCULATIONS]
+    cases += [
+        (label, legacy_matrix_operation, matrix_operation, call)
+        for label, call in MATRICES
+    ]
+    for label, legacy, new, call in cases:
+        before = _best(legacy, call, args.repeat)
+        after = _best(new, call, args.repeat)
+        print(
+            f"{label:<24}{before * 1000:>12.3f}{after * 1000:>12.3f}"
+            f"{before / after:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
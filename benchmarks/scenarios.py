@@ -0,0 +1,170 @@
+"""
+Scripted conversations replayed by `FakeLLMServer` in the end-to-end benchmark.
+
+Each scenario is a list of turns run in one agent thread. A turn's steps are
+what the stand-in model answers at each model call of that turn: a batch of
+tool calls (issued in parallel by the agent) or the final answer. Tool
+arguments refer to the fixture pages served by `FakeTavilyServer`.
+"""
+
+from fake_services import FIXTURE_URL
+
+
+def _page(name: str) -> str:
+    return FIXTURE_URL.format(name)
+
+
+def _calls(*calls: tuple[str, dict]) -> dict:
+    return {"tool_calls": [{"name": name, "args": args} for name, args in calls]}
+
+
+_REPORT = """## Overview
+{topic} in brief, synthesized from the sources above.
+
+## Key Features
+- First finding, with citation.
+- Second finding, with citation.
+
+## Use Cases
+Where it applies and where it does not.
+
+## Recent Developments
+What changed recently, and open limitations."""
+
+
+SCENARIOS: dict[str, dict] = {
+    "research": {
+        "description": "Multi-step research turns: search, fused search, crawl, passage lookup, report file",
+        "turns": [
+            {
+                "prompt": "What are the recent advancements in quantum computing?",
+                "steps": [
+                    _calls(("internet_search", {"query": "quantum computing recent advances"})),
+                    _calls(
+                        (
+                            "internet_search_many",
+                            {
+                                "queries": [
+                                    "quantum error correction logical qubits",
+                                    "quantum computing hardware platforms",
+                                    "quantum computing applications limitations",
+                                ]
+                            },
+                        )
+                    ),
+                    _calls(("crawl_url", {"urls": [_page("quantum-computing")]})),
+                    _calls(
+                        ("search_crawled", {"query": "logical qubit error threshold"}),
+                        ("search_crawled", {"query": "neutral atoms trapped ions"}),
+                    ),
+                    _calls(
+                        (
+                            "write_file",
+                            {
+                                "file_path": "/reports/quantum-computing.md",
+                                "content": _REPORT.format(topic="Quantum computing"),
+                            },
+                        )
+                    ),
+                    {"content": _REPORT.format(topic="Quantum computing")},
+                ],
+            },
+            {
+                "prompt": "Compare Rust and Go for backend services.",
+                "steps": [
+                    _calls(
+                        ("internet_search", {"query": "rust vs go backend performance"}),
+                        ("internet_search", {"query": "rust go concurrency memory"}),
+                    ),
+                    _calls(("crawl_url", {"urls": [_page("rust-vs-go"), _page("webassembly")]})),
+                    _calls(("search_crawled", {"query": "garbage collector latency"})),
+                    {"content": _REPORT.format(topic="Rust vs Go")},
+                ],
+            },
+        ],
+    },
+    "math": {
+        "description": "Math-heavy turns: parallel arithmetic, symbolic solving, matrices and grids",
+        "turns": [
+            {
+                "prompt": "Solve x^2 - 5x + 6 = 0, integrate x^2 sin(x) and invert a 12x12 matrix.",
+                "steps": [
+                    _calls(
+                        ("calculate", {"expression": "2^10 + 3*7 - 15% of 200"}),
+                        ("calculate", {"expression": "sqrt(2)*pi/4"}),
+                        ("solve_equation", {"equation": "x**2 - 5*x + 6 = 0"}),
+                        ("integrate_expression", {"expression": "x**2*sin(x)"}),
+                    ),
+                    _calls(
+                        (
+                            "matrix_operation",
+                            {
+                                "matrix_a": [
+                                    [float((i * 7 + j * 3) % 11 + (12 if i == j else 0)) for j in range(12)]
+                                    for i in range(12)
+                                ],
+                                "operation": "inverse",
+                            },
+                        ),
+                        ("differentiate", {"expression": "exp(x)*cos(x)**2"}),
+                    ),
+                    _calls(
+                        (
+                            "evaluate_expression_grid",
+                            {
+                                "expression": "sin(x)*exp(-y/10)",
+                                "variables": {"x": "0:6.28:400", "y": "0:20:400"},
+                            },
+                        )
+                    ),
+                    {"content": "x = 2 or x = 3; the integral and inverse are shown above."},
+                ],
+            }
+        ],
+    },
+    "crawl": {
+        "description": "Crawl-heavy turns: batch extraction, passage lookups, full-content re-reads",
+        "turns": [
+            {
+                "prompt": "Read up on databases, web frameworks and LLM serving and summarize.",
+                "steps": [
+                    _calls(
+                        (
+                            "crawl_url",
+                            {
+                                "urls": [
+                                    _page("postgres-indexing"),
+                                    _page("react-vs-svelte"),
+                                    _page("llm-inference"),
+                                    _page("webassembly"),
+                                    _page("rust-vs-go"),
+                                    "https://fixtures.bench/missing-page",
+                                ]
+                            },
+                        )
+                    ),
+                    _calls(
+                        ("search_crawled", {"query": "partial covering index"}),
+                        ("search_crawled", {"query": "virtual DOM compiler"}),
+                        ("search_crawled", {"query": "continuous batching KV cache", "k": 3}),
+                    ),
+                    _calls(
+                        (
+                            "crawl_url",
+                            {
+                                "urls": [_page("llm-inference"), _page("postgres-indexing")],
+                                "full_content": True,
+                            },
+                        )
+                    ),
+                    {"content": _REPORT.format(topic="Databases, frameworks and LLM serving")},
+                ],
+            }
+        ],
+    },
+}
+
+
+def all_turns() -> list[dict]:
+    """Return every scripted turn, for `FakeLLMServer`."""
+    return [turn for scenario in SCENARIOS.values() for turn in scenario["turns"]]
@@ -0,0 +1,21 @@
+"""
+Report cold-start costs: the import time of each heavy module in a fresh
+interpreter, and how long the lazy tool registry takes to import.
+
+Usage:
+    python benchmarks/startup_report.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.startup import measure_cold_imports
+
+
+if __name__ == "__main__":
+    print(f"{'module':<32}{'cold import s':>14}")
+    for module, seconds in measure_cold_imports().items():
+        shown = f"{seconds:.3f}" if seconds is not None else "failed"
+        print(f"{module:<32}{shown:>14}")
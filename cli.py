@@ -1,91 +1,282 @@
+import argparse
 import os
+import sys
 import uuid
 from dotenv import load_dotenv
 
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import BaseMessage, HumanMessage
-from langgraph.checkpoint.memory import InMemorySaver
+# Imported first so the startup report covers the heavy imports below
+from utils.startup import startup_timer
+
+from langchain_core.messages import HumanMessage
 from langchain_core.runnables import RunnableConfig
 from deepagents import create_deep_agent
 from deepagents.backends import FilesystemBackend
 
 from rich.console import Console
 
+from config import SANDBOX_DIR, SYSTEM_PROMPT
 from tools import __all__ as tool_lists
-from utils import print_message
+from tools.governor import format_governor_stats, governor_stats
+from tools.prefetch import format_prefetch_stats, get_prefetcher
+from utils import print_message, iterate_sync, run_sync, get_checkpointer
+from utils.agent_client import AGENT_SERVER_URL, AgentClient, AgentServerError
+from utils.batch import BATCH_PROMPT_TIMEOUT, BATCH_WORKERS, format_stats, run_batch
+from utils.compression import agent_middleware, get_compression_middleware
+from utils.llm import build_chat_model, get_llm_cache
+from utils.streaming import iter_agent_events
+from utils.tracing import TurnTracer, format_summary
+
+startup_timer.mark("imports")
 
 # Load environment variables
 load_dotenv()
 
-# Define model configuration from environment
-main_llm_base_url = os.getenv("MAIN_LLM_BASE_URL")
-main_llm_api_key = os.getenv("MAIN_LLM_API_KEY")
-main_llm_model_name = os.getenv("MAIN_LLM_MODEL_NAME")
+# Shared with main.py; wraps the model in the response cache selected by LLM_CACHE_MODE.
+# A thin client of an agent server (AGENT_SERVER_URL) needs neither it nor a checkpointer
+model = build_chat_model() if AGENT_SERVER_URL is None else None
+startup_timer.mark("model")
+
+# Process-wide, durable checkpointer selected by CHECKPOINTER
+checkpointer = get_checkpointer() if AGENT_SERVER_URL is None else None
+
 
-# Check if all required environment variables exist
-if not all([main_llm_base_url, main_llm_api_key, main_llm_model_name]):
-    raise EnvironmentError(
-        "Missing one or more required environment variables: MAIN_LLM_BASE_URL, MAIN_LLM_API_KEY, MAIN_LLM_MODEL_NAME"
+def build_agent(root_dir: str = SANDBOX_DIR, checkpointer=checkpointer):
+    """Create the research agent working in the sandbox at `root_dir`."""
+    return create_deep_agent(
+        model=model,
+        tools=tool_lists,
+        system_prompt=SYSTEM_PROMPT,
+        checkpointer=checkpointer,
+        backend=FilesystemBackend(root_dir=root_dir, virtual_mode=True),
+        middleware=agent_middleware(),
     )
 
-# Initialize the ChatOpenAI model
-model = ChatOpenAI(
-    base_url=main_llm_base_url,
-    api_key=main_llm_api_key,
-    model=main_llm_model_name,
-)
 
+def print_llm_cache_stats(console: Console):
+    """Print the LLM response cache's hit rate, if the cache is enabled."""
+    llm_cache = get_llm_cache()
+    if llm_cache is None:
+        return
+    stats = llm_cache.stats()
+    console.print(
+        f"LLM cache ({stats['mode']}): {stats['hits']} hits / {stats['misses']} misses "
+        f"({stats['hit_rate']:.0%}), {stats['entries']} entries, "
+        f"{stats['bytes'] / 1024**2:.1f} MB",
+        style="dim",
+    )
+
+
+def print_compression_stats(console: Console):
+    """Print how much the fast model condensed tool outputs, if the stage is enabled."""
+    compression = get_compression_middleware()
+    if compression is None:
+        return
+    stats = compression.stats()
+    line = (
+        f"Compression: {stats['sources']} sources in {stats['outputs']} tool outputs condensed, "
+        f"{stats['chars_saved'] / 1000:.1f}k characters saved, {stats['failures']} failures"
+    )
+    cache = stats["cache"]
+    if cache is not None:
+        line += f"; cache {cache['hits']} hits / {cache['misses']} misses ({cache['hit_rate']:.0%})"
+    console.print(line, style="dim")
+
+
+def print_dedup_stats(console: Console):
+    """Print near-duplicate filtering counters once a search or crawl has loaded the vector store."""
+    # Not imported here: it pulls in NumPy, which only searches and crawls need
+    near_duplicates = sys.modules.get("tools.near_duplicates")
+    vector_store = near_duplicates.get_vector_store() if near_duplicates else None
+    if vector_store is None:
+        return
+    stats = vector_store.stats()
+    console.print(
+        f"Near-duplicates: {stats['collapsed']} results collapsed; embeddings "
+        f"{stats['hits']} cached / {stats['misses']} computed ({stats['hit_rate']:.0%}), "
+        f"{stats['vectors']} vectors stored",
+        style="dim",
+    )
+
+
+def print_prefetch_stats(console: Console):
+    """Print the prefetch hit rate and the bytes used and wasted, if prefetching is enabled."""
+    prefetcher = get_prefetcher()
+    if prefetcher is not None:
+        console.print(format_prefetch_stats(prefetcher.stats()), style="dim")
+
+
+def print_upstream_stats(console: Console):
+    """Print request, retry and queue-wait counters of the Tavily and LLM governors."""
+    stats = governor_stats()
+    if stats:
+        console.print(format_governor_stats(stats), style="dim")
 
-system_prompt = """
-You are a meticulous research analyst. When given a topxic:
-1. Break down the query into key components and identify what needs clarification.
-2. Use the internet_search tool with precise, well-constructed queries to gather accurate, up-to-date information.
-3. Cross-check facts across multiple sources when possible.
-4. Synthesize findings into a clear, well-structured report with sections: Overview, Key Features, Use Cases, and Recent Developments.
-5. Cite key insights and avoid speculation. If information is unclear, note that as a limitation.
-Always aim for depth, accuracy, and readability.
-"""
 
-checkpointer = InMemorySaver()
-agent = create_deep_agent(
-    model=model,
-    tools=tool_lists,
-    system_prompt=system_prompt,
-    checkpointer=checkpointer,
-    backend=FilesystemBackend(root_dir="./sandbox", virtual_mode=True),
-)
+def interactive(console: Console, show_panels: bool = True, show_performance: bool = False):
+    """Chat with the agent in the terminal until the user quits."""
+    agent = build_agent()
+    startup_timer.mark("agent")
 
+    config: RunnableConfig = {"configurable": {"thread_id": uuid.uuid4()}}
+    panel_console = console if show_panels else None
 
-console = Console()
+    startup_timer.finish()
 
+    while True:
+        try:
+            # get user input and exit if needed
+            user_input = console.input("You: ")
+            if user_input.lower() in ["quit", "exit", "bye"]:
+                console.print("Goodbye!", style="bold yellow")
+                break
 
-config: RunnableConfig = {"configurable": {"thread_id": uuid.uuid4()}}
+            tracer = TurnTracer(config["configurable"]["thread_id"], user_input)
+            # astream lets the agent await parallel tool calls concurrently; per-node
+            # updates carry only new messages, so nothing is re-sent or re-printed
+            stream = iterate_sync(
+                agent.astream(
+                    {"messages": [HumanMessage(content=user_input)]},
+                    config={**config, "callbacks": [tracer]},
+                    stream_mode=["updates"],
+                )
+            )
+            for kind, msg in iter_agent_events(stream):
+                if kind in ("message", "tool_result"):
+                    print_message(console=panel_console, msg=msg)
+            summary = tracer.finish()
+            if show_performance:
+                console.print(format_summary(summary), style="dim")
+                print_llm_cache_stats(console)
+                print_compression_stats(console)
+                print_dedup_stats(console)
+                print_prefetch_stats(console)
+                print_upstream_stats(console)
 
-# Track the number of messages already printed
-printed_messages = 0
+        except KeyboardInterrupt:
+            console.print("Goodbye!", style="bold blue")
+            break
+
+
+def interactive_client(
+    console: Console, client: AgentClient, show_panels: bool = True, show_performance: bool = False
+):
+    """Chat in the terminal with turns run by the agent server."""
+    thread_id = str(uuid.uuid4())
+    panel_console = console if show_panels else None
+    console.print(f"Connected to the agent server at {client.base_url}", style="dim")
+
+    startup_timer.finish()
 
-while True:
-    try:
-        # get user input and exit if needed
-        user_input = console.input("You: ")
-        if user_input.lower() in ["quit", "exit", "bye"]:
-            console.print("Goodbye!", style="bold yellow")
+    while True:
+        try:
+            user_input = console.input("You: ")
+            if user_input.lower() in ["quit", "exit", "bye"]:
+                console.print("Goodbye!", style="bold yellow")
+                break
+
+            summary = None
+            try:
+                for kind, payload in client.stream_turn(thread_id, user_input):
+                    if kind in ("message", "tool_result"):
+                        print_message(console=panel_console, msg=payload)
+                    elif kind == "queued":
+                        console.print(f"Queued on the server (position {payload})", style="dim")
+                    elif kind == "performance":
+                        summary = payload
+            except AgentServerError as e:
+                console.print(f"Error: {e}", style="bold red")
+            if show_performance and summary is not None:
+                console.print(format_summary(summary), style="dim")
+                server_stats = client.stats()
+                turns = server_stats["turns"]
+                console.print(
+                    f"Agent server: {turns['running']}/{turns['max_concurrent']} turns running, "
+                    f"{turns['queued']} queued",
+                    style="dim",
+                )
+                if server_stats.get("prefetch"):
+                    console.print(format_prefetch_stats(server_stats["prefetch"]), style="dim")
+                if server_stats["upstream"]:
+                    console.print(format_governor_stats(server_stats["upstream"]), style="dim")
+
+        except KeyboardInterrupt:
+            console.print("Goodbye!", style="bold blue")
             break
 
-        for step in agent.stream(
-            {"messages": [HumanMessage(content=user_input)]},
-            config=config,
-            stream_mode="values",
-        ):
 
-            messages = step["messages"]
+def main():
+    parser = argparse.ArgumentParser(description="Cyber Researcher command line.")
+    parser.add_argument(
+        "--batch",
+        metavar="PROMPTS.jsonl",
+        help="Run every prompt in a JSONL file headlessly instead of chatting.",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="RESULTS.jsonl",
+        help="Where batch results are appended (default: <prompts>.results.jsonl).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=BATCH_WORKERS,
+        help=f"Prompts researched concurrently in batch mode (default: {BATCH_WORKERS}).",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=BATCH_PROMPT_TIMEOUT,
+        help="Seconds allowed per batch prompt (default: no limit).",
+    )
+    parser.add_argument(
+        "--panels",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Render messages as Rich panels (default: on when chatting, off in batch mode).",
+    )
+    parser.add_argument(
+        "--perf",
+        action="store_true",
+        help="Print where each turn's time went: model, search, crawl, math, tools.",
+    )
+    args = parser.parse_args()
+    console = Console()
+
+    if args.batch is None and AGENT_SERVER_URL is not None:
+        interactive_client(
+            console,
+            AgentClient(AGENT_SERVER_URL),
+            show_panels=args.panels is not False,
+            show_performance=args.perf,
+        )
+        return
+    if args.batch is None:
+        interactive(
+            console, show_panels=args.panels is not False, show_performance=args.perf
+        )
+        return
+    if AGENT_SERVER_URL is not None:
+        parser.error("--batch runs its agents in this process; unset AGENT_SERVER_URL")
+
+    output = args.output or os.path.splitext(args.batch)[0] + ".results.jsonl"
+    startup_timer.finish()
+    stats = run_sync(
+        run_batch(
+            args.batch,
+            output,
+            agent_factory=lambda root_dir: build_agent(root_dir, checkpointer=None),
+            workers=args.workers,
+            timeout=args.timeout,
+            console=console if args.panels else None,
+        )
+    )
+    console.print(format_stats(stats))
+    print_llm_cache_stats(console)
+    print_compression_stats(console)
+    print_dedup_stats(console)
+    print_prefetch_stats(console)
+    console.print(f"Results written to {output}", style="bold green")
 
-            for msg in messages[printed_messages:]:
-                msg: BaseMessage
-                print_message(console=console, msg=msg)
-            
-            printed_messages = len(messages)
 
-    except KeyboardInterrupt:
-        console.print("Goodbye!", style="bold blue")
-        break
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from .constants import SANDBOX_DIR, SYSTEM_PROMPT
+from .constants import SANDBOX_DIR, SYSTEM_PROMPT, CACHE_DIR
 
 
-__all__ = [SANDBOX_DIR, SYSTEM_PROMPT]
+__all__ = [SANDBOX_DIR, SYSTEM_PROMPT, CACHE_DIR]
@@ -1,13 +1,15 @@
 import os
+import time
 import uuid
 from pathlib import Path
 from dotenv import load_dotenv
 import streamlit as st
 import shutil
 
-from langchain_openai import ChatOpenAI
+# Imported first so the startup report covers the heavy imports below
+from utils.startup import startup_timer
+
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
-from langgraph.checkpoint.memory import InMemorySaver
 from langchain_core.runnables import RunnableConfig
 from deepagents import create_deep_agent
 from deepagents.backends import FilesystemBackend
@@ -15,9 +17,26 @@ from deepagents.backends import FilesystemBackend
 from rich.console import Console
 
 from tools import __all__ as tool_lists
-from utils import print_message
+from tools.sandbox_index import get_sandbox_index
+from utils import print_message, iterate_sync, get_checkpointer
+from utils.agent_client import AGENT_SERVER_URL, AgentClient, AgentServerError
+from utils.agent_server import runtime_stats
+from utils.compression import agent_middleware
+from utils.file_pager import read_page
+from utils.history import render_history
+from utils.llm import MAIN_LLM_MODEL_NAME, TEMPERATURE, build_chat_model
+from utils.streaming import (
+    STREAM_MODES,
+    IncrementalMarkdown,
+    format_tool_call,
+    format_tool_result,
+    iter_agent_events,
+)
+from utils.tracing import TurnTracer
 from config import SYSTEM_PROMPT, SANDBOX_DIR
 
+startup_timer.mark("imports")
+
 st.set_page_config(page_title="Cyber Researcher", page_icon=":robot:", layout="wide")
 st.markdown("## Cyber Researcher")
 
@@ -25,22 +44,15 @@ st.markdown("## Cyber Researcher")
 load_dotenv()
 
 
-main_llm_base_url = os.getenv("MAIN_LLM_BASE_URL")
-main_llm_api_key = os.getenv("MAIN_LLM_API_KEY")
-main_llm_model_name = os.getenv("MAIN_LLM_MODEL_NAME")
-
-if not all([main_llm_base_url, main_llm_api_key, main_llm_model_name]):
-    st.error("Missing one or more required environment variables.")
-    st.stop()
-
-temperature = os.getenv("TEMPERATURE", 0.1)
-
-model = ChatOpenAI(
-    base_url=main_llm_base_url,
-    api_key=main_llm_api_key,
-    model=main_llm_model_name,
-    temperature=temperature,
-)
+# Shared with cli.py; wraps the model in the response cache selected by LLM_CACHE_MODE.
+# As a thin client of an agent server (AGENT_SERVER_URL) the turns run there instead
+if AGENT_SERVER_URL is None:
+    try:
+        model = build_chat_model()
+    except EnvironmentError:
+        st.error("Missing one or more required environment variables.")
+        st.stop()
+startup_timer.mark("model")
 
 # system_prompt = """
 # You are a meticulous research analyst. When given a topic:
@@ -54,7 +66,8 @@ model = ChatOpenAI(
 
 system_prompt = SYSTEM_PROMPT
 
-checkpointer = InMemorySaver()
+# Process-wide, durable checkpointer selected by CHECKPOINTER
+checkpointer = get_checkpointer() if AGENT_SERVER_URL is None else None
 
 
 if "messages" not in st.session_state:
@@ -67,20 +80,22 @@ config: RunnableConfig = {"configurable": {"thread_id": st.session_state["thread
 print(f"Thread ID: {st.session_state['thread_id']}")
 
 
-# create the agent with session state
-if "agent" not in st.session_state:
+# create the agent with session state, or a client of the agent server running it
+if AGENT_SERVER_URL is not None:
+    if "agent_client" not in st.session_state:
+        st.session_state["agent_client"] = AgentClient(AGENT_SERVER_URL)
+elif "agent" not in st.session_state:
     st.session_state["agent"] = create_deep_agent(
         model=model,
         tools=tool_lists,
         system_prompt=system_prompt,
         checkpointer=checkpointer,
         backend=FilesystemBackend(root_dir=SANDBOX_DIR, virtual_mode=True),
+        middleware=agent_middleware(),
     )
+    startup_timer.mark("agent")
 
 
-if "printed_messages" not in st.session_state:
-    st.session_state["printed_messages"] = 0
-
 # ------------------------------------------
 USE_CRAWL4AI = os.getenv("USE_CRAWL4AI", "False").lower() == "true"
 
@@ -97,8 +112,8 @@ with st.sidebar:
     st.subheader("Chatbot Configuration")
     st.markdown(
         f"""
-    - **LLM Model**: `{main_llm_model_name}`
-    - **LLM Temperature**: `{temperature}`
+    - **LLM Model**: `{MAIN_LLM_MODEL_NAME}`
+    - **LLM Temperature**: `{TEMPERATURE}`
     - **Web Crawler Type**: `{web_crawler_type}`
     """
     )
@@ -108,6 +123,7 @@ with st.sidebar:
     sandbox_dir = SANDBOX_DIR
     os.makedirs(sandbox_dir, exist_ok=True)
     sandbox_dir = Path(SANDBOX_DIR)
+    sandbox_index = get_sandbox_index()
 
     uploaded_file = st.file_uploader(
         "Choose a file to upload",
@@ -126,6 +142,7 @@ with st.sidebar:
             try:
                 with open(upload_dest, "wb") as f:
                     f.write(uploaded_file.getbuffer())
+                sandbox_index.refresh(force=True)
                 st.toast(f"Uploaded: `{uploaded_file.name}`")
                 st.session_state["uploaded_file_name"] = uploaded_file.name
                 st.rerun()
@@ -136,30 +153,32 @@ with st.sidebar:
 
     if os.path.exists(sandbox_dir):
 
-        files = [
-            f.relative_to(sandbox_dir) for f in sandbox_dir.rglob("*") if f.is_file()
-        ]
+        # Listed from the incremental sandbox index, which skips internal
+        # dot-directories such as .index and only re-reads changed files
+        files = sandbox_index.list_files()
 
         if files:
-            selected_file = st.selectbox(
-                "Choose a file to view",
-                options=files,
-                key="selected_sandbox_file",
-                width="stretch",
+            file_query = st.text_input(
+                "Search files", key="sandbox_file_query", placeholder="Full-text search"
             )
-            if st.button("Show File", key="show_file_btn", width="stretch"):
-                file_path = os.path.join(sandbox_dir, selected_file)
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        content = f.read()
-
-                    st.session_state["messages"].append(
-                        AIMessage(content=f"### File: `{selected_file}`\n\n" + content)
-                    )
-
-                    # st.rerun()
-                except Exception as e:
-                    st.error(f"Could not read file: {e}")
+            if file_query:
+                hits = sandbox_index.search(file_query, k=20)
+                for hit in hits[:5]:
+                    st.caption(f"`{hit['path']}` (line {hit['line']}): {hit['snippet']}")
+                files = list(dict.fromkeys(hit["path"] for hit in hits))
+                if not files:
+                    st.caption("No matching files.")
+
+            if files:
+                selected_file = st.selectbox(
+                    "Choose a file to view",
+                    options=files,
+                    key="selected_sandbox_file",
+                    width="stretch",
+                )
+                if st.button("Show File", key="show_file_btn", width="stretch"):
+                    # Shown page by page in the viewer, not added to the chat history
+                    st.session_state["file_viewer"] = {"path": selected_file, "page": 0}
 
             if st.button("Clear Sandbox", width="stretch"):
                 sandbox_dir = Path(SANDBOX_DIR)
@@ -167,6 +186,7 @@ with st.sidebar:
                     if sandbox_dir.exists():
                         shutil.rmtree(sandbox_dir)
                     sandbox_dir.mkdir(exist_ok=True)
+                    sandbox_index.refresh(force=True)
                     st.success("Sandbox cleared successfully.")
                     st.rerun()
                 except Exception as e:
@@ -180,24 +200,146 @@ with st.sidebar:
     st.divider()
 
     if st.button("Start a New Session", width="stretch"):
+        # Free the finished thread's checkpoints instead of keeping them forever
+        if AGENT_SERVER_URL is None:
+            checkpointer.delete_thread(st.session_state["thread_id"])
+        else:
+            try:
+                st.session_state["agent_client"].delete_thread(st.session_state["thread_id"])
+            except AgentServerError as e:
+                print(f"Failed to delete thread {st.session_state['thread_id']}: {e}")
         st.session_state["messages"] = []
-        st.session_state["printed_messages"] = 0
+        st.session_state.pop("history_window", None)
+        st.session_state.pop("turn_performance", None)
         st.session_state["thread_id"] = str(uuid.uuid4())
-        st.session_state["agent"] = create_deep_agent(
-            model=model,
-            tools=tool_lists,
-            system_prompt=system_prompt,
-            checkpointer=checkpointer,
-            backend=FilesystemBackend(root_dir=SANDBOX_DIR, virtual_mode=True),
-        )
+        if AGENT_SERVER_URL is None:
+            st.session_state["agent"] = create_deep_agent(
+                model=model,
+                tools=tool_lists,
+                system_prompt=system_prompt,
+                checkpointer=checkpointer,
+                backend=FilesystemBackend(root_dir=SANDBOX_DIR, virtual_mode=True),
+                middleware=agent_middleware(),
+            )
         st.rerun()
 
     st.caption("Session ID: `" + st.session_state["thread_id"][:16] + "...`")
 
-# show the history messages
-for msg in st.session_state["messages"]:
-    with st.chat_message("user" if isinstance(msg, HumanMessage) else "assistant"):
-        st.markdown(msg.content)
+    # Counters of the process running the turns: this one, or the agent server
+    if AGENT_SERVER_URL is None:
+        runtime = runtime_stats(checkpointer)
+    else:
+        try:
+            runtime = st.session_state["agent_client"].stats()
+        except AgentServerError as e:
+            runtime = {}
+            st.caption(f"Agent server: {e}")
+        if runtime:
+            turns = runtime["turns"]
+            st.caption(
+                f"Agent server: {turns['running']}/{turns['max_concurrent']} turns running, "
+                f"{turns['queued']} queued, {turns['completed']} completed, "
+                f"{turns['failed']} failed"
+            )
+
+    checkpoint_metrics = runtime.get("checkpointer")
+    if checkpoint_metrics is not None:
+        checkpoint_bytes = checkpoint_metrics.get(
+            "disk_bytes", checkpoint_metrics.get("memory_bytes", 0)
+        )
+        st.caption(
+            f"Checkpoints ({checkpoint_metrics['backend']}): "
+            f"{checkpoint_metrics['threads']} threads, "
+            f"{checkpoint_metrics['checkpoints']} checkpoints, "
+            f"{checkpoint_bytes / 1024**2:.1f} MB"
+        )
+
+    llm_cache_stats = runtime.get("llm_cache")
+    if llm_cache_stats is not None:
+        st.caption(
+            f"LLM cache ({llm_cache_stats['mode']}): "
+            f"{llm_cache_stats['hits']} hits / {llm_cache_stats['misses']} misses "
+            f"({llm_cache_stats['hit_rate']:.0%}), {llm_cache_stats['entries']} entries, "
+            f"{llm_cache_stats['bytes'] / 1024**2:.1f} MB"
+        )
+
+    compression_stats = runtime.get("compression")
+    if compression_stats is not None:
+        st.caption(
+            f"Compression: {compression_stats['sources']} sources condensed, "
+            f"{compression_stats['chars_saved'] / 1000:.1f}k characters saved"
+            + (
+                f", cache hit rate {compression_stats['cache']['hit_rate']:.0%}"
+                if compression_stats["cache"] is not None
+                else ""
+            )
+        )
+
+    dedup_stats = runtime.get("near_duplicates")
+    if dedup_stats is not None:
+        st.caption(
+            f"Near-duplicates: {dedup_stats['collapsed']} results collapsed, "
+            f"embedding cache hit rate {dedup_stats['hit_rate']:.0%}"
+        )
+
+    prefetch_stats = runtime.get("prefetch")
+    if prefetch_stats is not None:
+        st.caption(
+            f"Prefetch: {prefetch_stats['hit_rate']:.0%} of crawled pages ready, "
+            f"{prefetch_stats['used_bytes'] / 1024:.0f} KB used, "
+            f"{prefetch_stats['wasted_bytes'] / 1024:.0f} KB wasted"
+        )
+
+    # Shared by every session of that process
+    for upstream, upstream_stats in runtime.get("upstream", {}).items():
+        st.caption(
+            f"{upstream} API: {upstream_stats['requests']} requests, "
+            f"{upstream_stats['retries']} retries, "
+            f"avg queue {upstream_stats['avg_queue_wait_s'] * 1000:.0f} ms, "
+            f"{upstream_stats['in_flight']}/{upstream_stats['max_in_flight']} in flight"
+        )
+
+    st.divider()
+    st.subheader("Performance")
+    # Filled at the end of the script, so it shows the turn that just finished
+    performance_panel = st.container()
+
+# File viewer: one page of the selected sandbox file at a time
+if st.session_state.get("file_viewer"):
+    viewer = st.session_state["file_viewer"]
+    try:
+        file_path = os.path.join(SANDBOX_DIR, viewer["path"])
+        text, pages = read_page(file_path, viewer["page"])
+    except (OSError, ValueError) as e:
+        st.error(f"Could not read file: {e}")
+        st.session_state["file_viewer"] = None
+    else:
+        with st.expander(f"File: `{viewer['path']}`", expanded=True):
+            prev_col, page_col, next_col, close_col = st.columns([1, 2, 1, 1])
+            if prev_col.button(
+                "Previous", key="viewer_prev", disabled=viewer["page"] <= 0, width="stretch"
+            ):
+                viewer["page"] -= 1
+                st.rerun()
+            page_col.caption(f"Page {min(viewer['page'], pages - 1) + 1} of {pages}")
+            if next_col.button(
+                "Next",
+                key="viewer_next",
+                disabled=viewer["page"] >= pages - 1,
+                width="stretch",
+            ):
+                viewer["page"] += 1
+                st.rerun()
+            if close_col.button("Close", key="viewer_close", width="stretch"):
+                st.session_state["file_viewer"] = None
+                st.rerun()
+            if viewer["path"].endswith(".md"):
+                st.markdown(text)
+            else:
+                st.code(text, language=None)
+
+# show the history messages: a window over the newest ones, tool steps on demand
+render_history(st.session_state["messages"])
 
 
 # if prompt := st.chat_input("Ask me anything about a topic..."):
@@ -240,46 +382,146 @@ for msg in st.session_state["messages"]:
 
 
 if prompt := st.chat_input("Ask me anything about a topic..."):
-    human_msg = HumanMessage(content=prompt)
+    human_msg = HumanMessage(content=prompt, id=str(uuid.uuid4()))
     st.session_state["messages"].append(human_msg)
     console = Console()
+    print_message(console=console, msg=human_msg)
     with st.chat_message("user"):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
         with st.spinner("Thinking..."):
-            response_container = st.empty()
-            full_response = ""
+            latency_caption = st.empty()
+            transcript = IncrementalMarkdown(st.container())
+            started = time.perf_counter()
+            first_token_at = None
+            # The agent server traces its turns and sends the summary at the end
+            tracer = (
+                TurnTracer(st.session_state["thread_id"], prompt)
+                if AGENT_SERVER_URL is None
+                else None
+            )
+            turn_error = None
+            performance = None
 
             try:
-                for step in st.session_state["agent"].stream(
-                    {"messages": [human_msg]},
-                    config=config,
-                    stream_mode="values",
-                ):
-                    messages: list[BaseMessage] = step["messages"]
-
-                    for msg in messages[st.session_state["printed_messages"] :]:
-                        msg: BaseMessage
-
-                        print_message(console=console, msg=msg)
-
-                        if isinstance(msg, HumanMessage):
-                            continue
-                        elif isinstance(msg, AIMessage):
-                            if msg.tool_calls:
-                                for tool_call in msg.tool_calls:
-                                    tool_name = tool_call["name"]
-                                    tool_args = tool_call["args"]
-                                    full_response += f"\n\n**Using Tool:** `{tool_name}` with `{tool_args}`"
-                            if msg.content:
-                                full_response += "\n\n" + msg.content
-
-                    st.session_state["printed_messages"] = len(messages)
-                    response_container.markdown(full_response)
-
-                ai_msg = AIMessage(content=full_response)
+                if AGENT_SERVER_URL is None:
+                    # Token deltas plus per-node updates; nothing already shown is re-sent.
+                    # astream lets the agent await parallel tool calls concurrently
+                    events = iter_agent_events(
+                        iterate_sync(
+                            st.session_state["agent"].astream(
+                                {"messages": [human_msg]},
+                                config={**config, "callbacks": [tracer]},
+                                stream_mode=STREAM_MODES,
+                            )
+                        )
+                    )
+                else:
+                    events = st.session_state["agent_client"].stream_turn(
+                        st.session_state["thread_id"], prompt
+                    )
+                for kind, payload in events:
+                    if kind == "token":
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter() - started
+                            latency_caption.caption(
+                                f"First token after {first_token_at:.2f} s"
+                            )
+                        transcript.append(payload)
+                    elif kind == "message":
+                        print_message(console=console, msg=payload)
+                        transcript.end_segment()
+                    elif kind == "tool_call":
+                        transcript.add_block(format_tool_call(payload))
+                    elif kind == "tool_result":
+                        print_message(console=console, msg=payload)
+                        transcript.add_block(format_tool_result(payload))
+                    elif kind == "queued":
+                        latency_caption.caption(
+                            f"Waiting for a free agent (position {payload} in the queue)"
+                        )
+                    elif kind == "performance":
+                        performance = payload
+
+                transcript.end_segment()
+                total = time.perf_counter() - started
+                latency_caption.caption(
+                    f"First token after {first_token_at:.2f} s · completed in {total:.2f} s"
+                    if first_token_at is not None
+                    else f"Completed in {total:.2f} s"
+                )
+
+                ai_msg = AIMessage(content=transcript.text, id=str(uuid.uuid4()))
                 st.session_state["messages"].append(ai_msg)
 
             except Exception as e:
+                turn_error = f"{type(e).__name__}: {e}"
                 st.error(f"Error: {str(e)}")
+
+            st.session_state["turn_performance"] = (
+                tracer.finish(error=turn_error) if tracer is not None else performance
+            )
+
+with performance_panel:
+    performance = st.session_state.get("turn_performance")
+    if performance is None:
+        st.caption("Timings of the last turn appear here.")
+    else:
+        st.caption(
+            f"Last turn: {performance['total_s']:.1f} s · "
+            f"{performance['llm']['calls']} model calls "
+            f"({performance['llm'].get('cache_hits', 0)} cached) · "
+            f"{performance['tools']['calls']} tool calls · "
+            f"{performance['tools']['cache_hits']} cache hits · "
+            f"overhead {performance['overhead_s']:.1f} s"
+        )
+        upstream = performance.get("upstream") or {}
+        if upstream.get("queue_wait_s") or upstream.get("retries"):
+            st.caption(
+                f"API rate limiting: {upstream['queue_wait_s']:.1f} s queued, "
+                f"{upstream['retries']} retries"
+            )
+        steps = [
+            {
+                "step": f"{index:>2}. {step['name']}",
+                "category": step["category"],
+                "start": step["start_s"],
+                "end": step["start_s"] + step["duration_s"],
+            }
+            for index, step in enumerate(performance["steps"], start=1)
+        ]
+        if steps:
+            st.vega_lite_chart(
+                {
+                    "data": {"values": steps},
+                    "mark": {"type": "bar", "cornerRadius": 2},
+                    "encoding": {
+                        "y": {"field": "step", "type": "nominal", "sort": None, "title": None},
+                        "x": {"field": "start", "type": "quantitative", "title": "seconds"},
+                        "x2": {"field": "end"},
+                        "color": {"field": "category", "type": "nominal"},
+                        "tooltip": [
+                            {"field": "step"},
+                            {"field": "start", "format": ".2f"},
+                            {"field": "end", "format": ".2f"},
+                        ],
+                    },
+                    "height": min(18 * len(steps), 360),
+                },
+                width="stretch",
+            )
+            st.dataframe(
+                [
+                    {
+                        "step": step["name"],
+                        "seconds": step["duration_s"],
+                        "at": step["start_s"],
+                        "error": bool(step["error"]),
+                    }
+                    for step in performance["slowest"]
+                ],
+                hide_index=True,
+            )
+
+startup_timer.finish("first render")
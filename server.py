@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import signal
+from dotenv import load_dotenv
+
+# Imported first so the startup report covers the heavy imports below
+from utils.startup import startup_timer
+
+import uvicorn
+from deepagents import create_deep_agent
+from deepagents.backends import FilesystemBackend
+
+from config import SANDBOX_DIR, SYSTEM_PROMPT
+from tools import __all__ as tool_lists
+from utils import get_checkpointer, get_event_loop
+from utils.agent_server import (
+    AGENT_SERVER_HOST,
+    AGENT_SERVER_MAX_CONCURRENT_TURNS,
+    AGENT_SERVER_MAX_QUEUED_TURNS,
+    AGENT_SERVER_PORT,
+    AgentRuntime,
+    create_app,
+)
+from utils.compression import agent_middleware
+from utils.llm import build_chat_model
+
+startup_timer.mark("imports")
+
+# Load environment variables
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cyber Researcher agent server: one agent runtime shared by many clients."
+    )
+    parser.add_argument("--host", default=AGENT_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=AGENT_SERVER_PORT)
+    parser.add_argument(
+        "--max-concurrent",
+        type=int,
+        default=AGENT_SERVER_MAX_CONCURRENT_TURNS,
+        help=f"Turns run at once (default: {AGENT_SERVER_MAX_CONCURRENT_TURNS}).",
+    )
+    parser.add_argument(
+        "--max-queued",
+        type=int,
+        default=AGENT_SERVER_MAX_QUEUED_TURNS,
+        help=f"Turns allowed to wait for a slot (default: {AGENT_SERVER_MAX_QUEUED_TURNS}).",
+    )
+    args = parser.parse_args()
+
+    # Built once and shared by every thread: model clients, tools and checkpointer
+    model = build_chat_model()
+    startup_timer.mark("model")
+    checkpointer = get_checkpointer()
+    agent = create_deep_agent(
+        model=model,
+        tools=tool_lists,
+        system_prompt=SYSTEM_PROMPT,
+        checkpointer=checkpointer,
+        backend=FilesystemBackend(root_dir=SANDBOX_DIR, virtual_mode=True),
+        middleware=agent_middleware(),
+    )
+    startup_timer.mark("agent")
+
+    runtime = AgentRuntime(
+        agent, max_concurrent=args.max_concurrent, max_queued=args.max_queued
+    )
+    server = uvicorn.Server(
+        uvicorn.Config(create_app(runtime, checkpointer), host=args.host, port=args.port)
+    )
+    startup_timer.finish()
+
+    # Served on the shared background loop, where the async Tavily and model
+    # clients (and their connection pools) already live
+    future = asyncio.run_coroutine_threadsafe(server.serve(), get_event_loop())
+    signal.signal(signal.SIGTERM, lambda signum, frame: setattr(server, "should_exit", True))
+    try:
+        future.result()
+    except KeyboardInterrupt:
+        server.should_exit = True
+        future.result()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import os
+import tempfile
+
+# The app reads its settings from the environment at import time: point every
+# cache and index at a scratch directory and keep network-backed features off,
+# so the suite needs no API keys, no network and leaves the checkout untouched
+_scratch = tempfile.mkdtemp(prefix="cyberresearch-tests-")
+os.environ.update(
+    TAVILY_API_KEY="test",
+    CACHE_DIR=os.path.join(_scratch, "cache"),
+    PASSAGE_INDEX_PATH=os.path.join(_scratch, "index", "passages.sqlite"),
+    SANDBOX_INDEX_PATH=os.path.join(_scratch, "index", "files.sqlite"),
+    SEARCH_CACHE_MODE="readwrite",
+    LLM_CACHE_MODE="off",
+    PAGE_CACHE_ENABLED="False",
+    COMPRESSION_ENABLED="False",
+    PREFETCH_ENABLED="False",
+)
@@ -0,0 +1,63 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("crawl4ai")
+
+from tools import crawler_pool as crawler_pool_module
+from tools.crawler_pool import CrawlerPool
+
+
+class FakeCrawler:
+    def __init__(self, config=None):
+        self.ready = False
+
+    async def start(self):
+        self.ready = True
+
+    async def close(self):
+        self.ready = False
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(crawler_pool_module, "AsyncWebCrawler", FakeCrawler)
+    pool = CrawlerPool(size=1, max_pages=3, tabs=2)
+    yield pool
+    pool.shutdown()
+
+
+def test_stale_browser_takes_no_new_pages_under_steady_load(pool):
+    served = Counter()
+
+    def crawl(seconds):
+        async def fn(crawler):
+            assert crawler.ready
+            served[crawler] += 1
+            await asyncio.sleep(seconds)
+
+        return fn
+
+    async def load():
+        # Staggered pages keep one tab busy whenever the other finishes
+        await asyncio.gather(*(pool.with_crawler(crawl(0.01 + 0.007 * (i % 3))) for i in range(20)))
+
+    pool.run_coroutine(load()).result(timeout=10)
+    assert sum(served.values()) == 20
+    # Only pages already in flight when the limit is reached may exceed it
+    assert max(served.values()) <= pool.max_pages + pool.tabs - 1
+    assert len(served) >= 20 // (pool.max_pages + pool.tabs - 1)
+
+
+def test_failed_crawl_on_a_healthy_browser_keeps_it(pool):
+    crawlers = []
+
+    async def fail(crawler):
+        crawlers.append(crawler)
+        raise ValueError("page failed")
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            pool.run(fail)
+    assert crawlers[0] is crawlers[1]
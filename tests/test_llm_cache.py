@@ -0,0 +1,94 @@
+import pytest
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+
+from benchmarks.fake_services import FakeLLMServer
+from utils.llm import LLMResponseCache
+
+PROMPT = "What is the capital of France?"
+
+
+@pytest.fixture
+def server():
+    server = FakeLLMServer([{"prompt": PROMPT, "steps": [{"content": "Paris."}]}]).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "llm_cache.sqlite")
+
+
+def _model(cache, base_url="http://127.0.0.1:9/v1", api_key="other-key", **kwargs):
+    # The default endpoint refuses connections: a replayed call must not need it
+    settings = {"model": "fake", "temperature": 0, "max_retries": 0, "timeout": 5, **kwargs}
+    return ChatOpenAI(base_url=base_url, api_key=api_key, cache=cache, **settings)
+
+
+def _conversation():
+    # Fresh message ids every time, as in a new session
+    return [SystemMessage(content="Be brief."), HumanMessage(content=PROMPT)]
+
+
+def _requests(server) -> int:
+    return sum(server.requests.values())
+
+
+def test_recorded_answer_replays_against_another_endpoint(server, cache_path):
+    recorder = _model(LLMResponseCache(cache_path, mode="record"), server.url + "/v1", "key")
+    assert recorder.invoke(_conversation()).content == "Paris."
+    # Record mode always calls the model
+    assert recorder.invoke(_conversation()).content == "Paris."
+    assert _requests(server) == 2
+
+    replayed = _model(LLMResponseCache(cache_path, mode="replay")).invoke(_conversation())
+    assert replayed.content == "Paris."
+    assert _requests(server) == 2
+
+
+def test_replay_miss_raises_lookup_error(cache_path):
+    model = _model(LLMResponseCache(cache_path, mode="replay"))
+    with pytest.raises(LookupError, match="No recorded LLM response"):
+        model.invoke(_conversation())
+
+
+def test_readwrite_serves_identical_requests_from_the_cache(server, cache_path):
+    cache = LLMResponseCache(cache_path, mode="readwrite")
+    model = _model(cache, server.url + "/v1", "key")
+    model.invoke(_conversation())
+    model.invoke(_conversation())
+    assert _requests(server) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def _key(model, messages) -> str:
+    # The prompt and model string LangChain hands to the cache
+    kwargs = getattr(model, "kwargs", {})
+    model = getattr(model, "bound", model)
+    return LLMResponseCache.make_key(dumps(messages), model._get_llm_string(**kwargs))
+
+
+def test_key_ignores_connection_settings_and_bookkeeping():
+    base = _key(_model(None, "http://a/v1", "a"), _conversation())
+    assert _key(_model(None, "http://b/v1", "b", default_headers={"x": "1"}), _conversation()) == base
+
+    answered = [*_conversation(), AIMessage(content="Paris.", id="run-1", usage_metadata={
+        "input_tokens": 10, "output_tokens": 2, "total_tokens": 12,
+    })]
+    replayed = [*_conversation(), AIMessage(content="Paris.", id="run-2")]
+    assert _key(_model(None), answered) == _key(_model(None), replayed)
+
+
+def test_key_changes_with_what_the_model_sees():
+    base = _key(_model(None), _conversation())
+    assert _key(_model(None, temperature=0.5), _conversation()) != base
+    assert _key(_model(None, model="other"), _conversation()) != base
+    assert _key(_model(None), [HumanMessage(content="Another question")]) != base
+
+    def lookup(city: str) -> str:
+        """Look up a city."""
+        return city
+
+    assert _key(_model(None).bind_tools([lookup]), _conversation()) != base
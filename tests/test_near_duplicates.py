@@ -0,0 +1,158 @@
+import os
+
+import numpy as np
+import pytest
+
+from langchain_core.runnables import RunnableLambda
+
+from tools import near_duplicates
+from tools.near_duplicates import VectorStore, collapse_near_duplicates, local_embeddings
+
+ARTICLE = (
+    "Researchers disclosed a remote code execution flaw in the widely used image "
+    "parsing library, urging administrators to upgrade to the patched release today."
+)
+OTHER = "The city council approved a new budget for public parks and libraries on Monday."
+
+
+def _text(item):
+    return item.get("content", "")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return VectorStore(directory=str(tmp_path / "embeddings"))
+
+
+def test_local_embeddings_separate_near_duplicates_from_unrelated_texts():
+    vectors = local_embeddings([ARTICLE, ARTICLE + " Updated.", OTHER, ""])
+    assert vectors.shape == (4, 1024) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1.0)
+    assert vectors[0] @ vectors[1] >= 0.95
+    assert abs(vectors[0] @ vectors[2]) < 0.3
+    assert not vectors[3].any()
+    assert np.array_equal(local_embeddings([ARTICLE]), local_embeddings([ARTICLE]))
+
+
+def test_duplicates_in_one_list_are_folded_into_the_first(store):
+    items = [
+        {"url": "https://a.example/post", "content": ARTICLE},
+        {"url": "https://b.example/mirror", "content": ARTICLE},
+        {"url": "https://c.example/news", "content": OTHER},
+    ]
+    result = store.collapse(items, "search", _text, "t1")
+    assert [item["url"] for item in result] == ["https://a.example/post", "https://c.example/news"]
+    assert result[0]["duplicates"] == ["https://b.example/mirror"]
+    assert store.stats()["collapsed"] == 1
+
+
+def test_duplicates_of_earlier_calls_become_stubs(store):
+    store.collapse([{"url": "https://a.example/post", "content": ARTICLE}], "crawl", _text, "t1")
+    result = store.collapse(
+        [{"url": "https://b.example/mirror", "title": "Mirror", "content": ARTICLE}],
+        "crawl",
+        _text,
+        "t1",
+    )
+    assert result == [
+        {
+            "url": "https://b.example/mirror",
+            "title": "Mirror",
+            "duplicate_of": "https://a.example/post",
+            "similarity": 1.0,
+        }
+    ]
+    # Each kind is compared with its own history
+    mirror = [{"url": "https://b.example/mirror", "content": ARTICLE}]
+    result = store.collapse(mirror, "search", _text, "t1")
+    assert "duplicate_of" not in result[0]
+
+
+def test_each_thread_gets_its_own_copy(store):
+    store.collapse([{"url": "https://a.example/post", "content": ARTICLE}], "crawl", _text, "t1")
+    mirror = [{"url": "https://b.example/mirror", "content": ARTICLE}]
+    assert store.collapse(mirror, "crawl", _text, "t2") == mirror
+    # ... including a new session on the same store
+    reloaded = VectorStore(directory=store.directory)
+    assert reloaded.collapse(mirror, "crawl", _text, "t3") == mirror
+    assert reloaded.collapse(mirror, "crawl", _text, "t1")[0]["duplicate_of"] == "https://a.example/post"
+
+
+def test_without_a_thread_only_the_list_itself_is_collapsed(store):
+    store.collapse([{"url": "https://a.example/post", "content": ARTICLE}], "crawl", _text)
+    mirror = [{"url": "https://b.example/mirror", "content": ARTICLE}]
+    assert store.collapse(mirror, "crawl", _text) == mirror
+    assert store.stats()["documents"] == 0
+
+
+def test_collapse_near_duplicates_uses_the_thread_of_the_agent_run(store, monkeypatch):
+    monkeypatch.setattr(near_duplicates, "get_vector_store", lambda: store)
+    crawl = RunnableLambda(
+        lambda url: collapse_near_duplicates(
+            {"results": [{"url": url, "raw_content": ARTICLE}]}, "crawl"
+        )
+    )
+    crawl.invoke("https://a.example/post", {"configurable": {"thread_id": "t1"}})
+    other = crawl.invoke("https://b.example/mirror", {"configurable": {"thread_id": "t2"}})
+    assert "duplicate_of" not in other["results"][0]
+    same = crawl.invoke("https://b.example/mirror", {"configurable": {"thread_id": "t1"}})
+    assert same["results"][0]["duplicate_of"] == "https://a.example/post"
+
+
+def test_same_canonical_url_is_never_a_duplicate(store):
+    items = [
+        {"url": "https://a.example/post", "content": ARTICLE},
+        {"url": "https://a.example/post?utm_source=feed", "content": ARTICLE},
+    ]
+    assert store.collapse(items, "search", _text, "t1") == items
+    again = [{"url": "https://a.example/post#comments", "content": ARTICLE}]
+    assert store.collapse(again, "search", _text, "t1") == again
+    assert store.stats()["collapsed"] == 0
+
+
+def test_items_without_text_or_url_are_kept(store):
+    items = [{"url": "https://a.example/post", "content": ""}, {"content": ARTICLE}]
+    assert store.collapse(items, "search", _text, "t1") == items
+    assert store.stats()["vectors"] == 0
+
+
+def test_store_appends_to_its_log_and_reloads(store):
+    store.collapse([{"url": "https://a.example/post", "content": ARTICLE}], "search", _text, "t1")
+    vectors_size = os.path.getsize(store._vectors_path)
+    store.collapse([{"url": "https://c.example/news", "content": OTHER}], "search", _text, "t1")
+    # Only the new row is written
+    assert os.path.getsize(store._vectors_path) == vectors_size + 1024 * 4
+    with open(store._index_path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 1 + 4
+
+    reloaded = VectorStore(directory=store.directory)
+    assert reloaded.stats()["vectors"] == 2 and reloaded.stats()["documents"] == 2
+    mirror = [{"url": "https://b.example/mirror", "content": ARTICLE}]
+    result = reloaded.collapse(mirror, "search", _text, "t1")
+    assert result[0]["duplicate_of"] == "https://a.example/post"
+    assert reloaded.stats()["misses"] == 0
+
+
+def test_oldest_vectors_are_dropped_and_the_log_compacted(tmp_path):
+    store = VectorStore(directory=str(tmp_path / "embeddings"), max_vectors=2)
+    for i in range(6):
+        content = " ".join(f"topic{i} word{j}" for j in range(10))
+        store.collapse([{"url": f"https://example.com/{i}", "content": content}], "search", _text, "t1")
+    assert store.stats()["vectors"] == 2 and store.stats()["documents"] == 2
+    assert store.stats()["collapsed"] == 0
+    with open(store._index_path, encoding="utf-8") as f:
+        assert len(f.readlines()) - 1 <= 2 * 4
+    reloaded = VectorStore(directory=store.directory, max_vectors=2)
+    assert reloaded.stats()["vectors"] == 2
+    assert set(reloaded._documents["t1/search"]) == {"https://example.com/4", "https://example.com/5"}
+
+
+def test_an_interrupted_append_is_recovered(store):
+    store.collapse([{"url": "https://a.example/post", "content": ARTICLE}], "search", _text, "t1")
+    with open(store._index_path, "a", encoding="utf-8") as f:
+        f.write('{"key": "cut sh')
+    reloaded = VectorStore(directory=store.directory)
+    assert reloaded.stats()["vectors"] == 1
+    reloaded.collapse([{"url": "https://c.example/news", "content": OTHER}], "search", _text, "t1")
+    stats = VectorStore(directory=store.directory).stats()
+    assert stats["vectors"] == 2 and stats["documents"] == 2
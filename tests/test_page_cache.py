@@ -0,0 +1,112 @@
+import threading
+import time
+import zlib
+
+import pytest
+
+from tools import page_cache as page_cache_module
+from tools import web_search
+from tools.page_cache import PageCache, canonicalize_url
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PageCache(str(tmp_path / "pages.sqlite"))
+
+
+def test_canonicalize_url_drops_only_tracking_noise():
+    assert canonicalize_url("HTTPS://Example.com:443/a/?utm_source=x&b=2&a=1#top") == (
+        "https://example.com/a?a=1&b=2"
+    )
+    # Parameters and hosts that can select different content are kept
+    assert canonicalize_url("https://github.com/o/r?ref=dev") != canonicalize_url(
+        "https://github.com/o/r?ref=main"
+    )
+    assert canonicalize_url("https://www.example.com/") != canonicalize_url("https://example.com/")
+
+
+def test_stale_page_without_validators_is_a_miss_without_a_request(cache, monkeypatch):
+    cache.fresh_for = 0
+    cache.put("https://example.com/a", "page")
+    monkeypatch.setattr(
+        page_cache_module.httpx, "head", lambda *a, **k: pytest.fail("no validators to send")
+    )
+    time.sleep(0.01)
+    assert cache.get("https://example.com/a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_stale_pages_are_revalidated_concurrently(cache, monkeypatch):
+    cache.fresh_for = 0
+    urls = [f"https://example.com/{i}" for i in range(4)]
+    for url in urls:
+        cache.put(url, f"page {url}", etag='"v1"')
+    running, peak = 0, 0
+    lock = threading.Lock()
+
+    def revalidate(url, etag, last_modified):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return url != urls[-1], etag, last_modified
+
+    monkeypatch.setattr(cache, "_revalidate", revalidate)
+    time.sleep(0.01)
+    contents = cache.get_many(urls)
+    assert contents == [f"page {url}" for url in urls[:-1]] + [None]
+    assert peak > 1
+    assert cache.stats()["revalidated"] == 3 and cache.stats()["misses"] == 1
+
+
+def test_changed_page_is_dropped_and_its_new_validators_await_the_new_copy(cache, monkeypatch):
+    cache.fresh_for = 0
+    cache.put("https://example.com/a", "old page", etag='"v1"')
+    sent = []
+
+    def revalidate(url, etag, last_modified):
+        sent.append(etag)
+        return etag == '"v2"', '"v2"', None
+
+    monkeypatch.setattr(cache, "_revalidate", revalidate)
+    time.sleep(0.01)
+    assert cache.get("https://example.com/a") is None
+    # Re-extraction failed: the outdated copy is never served again
+    time.sleep(0.01)
+    assert cache.get("https://example.com/a") is None
+    assert sent == ['"v1"']
+
+    cache.put("https://example.com/a", "new page")
+    time.sleep(0.01)
+    assert cache.get("https://example.com/a") == "new page"
+    assert sent == ['"v1"', '"v2"']
+
+
+def test_oldest_pages_are_evicted_beyond_max_bytes(cache):
+    cache.max_bytes = len(zlib.compress(b"new page"))
+    cache.put("https://example.com/old", "old page")
+    time.sleep(0.01)
+    cache.put("https://example.com/new", "new page")
+    assert cache.stats()["entries"] == 1
+    assert cache.get("https://example.com/new") == "new page"
+
+
+def test_advanced_extraction_bypasses_the_page_cache(cache, monkeypatch):
+    monkeypatch.setattr(page_cache_module, "get_page_cache", lambda: cache)
+    cache.put("https://example.com/a", "basic page")
+    depths = []
+
+    class _Tavily:
+        def extract(self, urls, include_images, format, extract_depth):
+            depths.append(extract_depth)
+            return {"results": [{"url": url, "raw_content": "advanced page"} for url in urls]}
+
+    monkeypatch.setattr(web_search, "tavily_client", _Tavily())
+    result = web_search.crawl_url("https://example.com/a", extract_depth="advanced", full_content=True)
+    assert depths == ["advanced"]
+    assert result["results"][0]["raw_content"] == "advanced page"
+    # ... and is not stored as the basic-depth copy
+    assert cache.get("https://example.com/a") == "basic page"
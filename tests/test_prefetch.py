@@ -0,0 +1,22 @@
+from tools.prefetch import Prefetcher
+from tools.registry import track_cache_lookups
+
+
+def _fetch(urls):
+    return {"results": [{"url": url, "raw_content": f"page {url}"} for url in urls]}
+
+
+def test_take_claims_prefetched_pages_and_reports_hits_and_misses():
+    prefetcher = Prefetcher(fetch=_fetch)
+    prefetcher.schedule(["https://example.com/a?utm_source=feed"])
+    lookups = track_cache_lookups()
+    pages, missing = prefetcher.take(["https://example.com/a", "https://example.com/b"])
+    # Under the URL asked for, with the content fetched for the scheduled spelling
+    assert pages == [
+        {"url": "https://example.com/a", "raw_content": "page https://example.com/a?utm_source=feed"}
+    ]
+    assert missing == ["https://example.com/b"]
+    assert lookups == {"hits": 1, "misses": 1}
+    # A page is handed out once
+    assert prefetcher.take(["https://example.com/a"]) == ([], ["https://example.com/a"])
+    assert prefetcher.stats()["hits"] == 1 and prefetcher.stats()["misses"] == 2
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import pytest
+
+from tools import web_search
+from tools.search_cache import SearchCache, normalize_query
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "search_cache.sqlite")
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """Fail the test if a search reaches Tavily."""
+
+    class _NoNetwork:
+        def search(self, *args, **kwargs):
+            raise AssertionError("replay mode must not call Tavily")
+
+    monkeypatch.setattr(web_search, "tavily_client", _NoNetwork())
+    monkeypatch.setattr(web_search, "async_tavily_client", _NoNetwork())
+
+
+def _use_cache(monkeypatch, cache: SearchCache):
+    monkeypatch.setattr(web_search, "get_search_cache", lambda: cache)
+
+
+RESPONSE = {"query": "rust vs go", "results": [{"url": "https://example.com/a", "content": "A"}]}
+
+
+def test_normalize_query_ignores_case_and_punctuation_but_not_order():
+    assert normalize_query("Rust vs. Go?") == normalize_query("rust  VS go")
+    assert normalize_query("Ｒｕｓｔ vs go") == normalize_query("rust vs go")
+    assert normalize_query("rust vs go") != normalize_query("rust vs zig")
+    # Reordered or repeated words can ask something else
+    assert normalize_query("python to rust migration") != normalize_query("rust to python migration")
+    assert normalize_query("X not Y") != normalize_query("Y not X")
+    assert normalize_query("go go") != normalize_query("go")
+
+
+def test_readwrite_round_trip_and_expiry(cache_path):
+    cache = SearchCache(cache_path)
+    cache.put("rust vs go", 5, RESPONSE)
+    assert cache.get("Rust vs Go", 5) == RESPONSE
+    # max_results is part of the key
+    assert cache.get("rust vs go", 10) is None
+
+    cache.put("expired", 5, RESPONSE, ttl=-1)
+    assert cache.get("expired", 5) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_replay_serves_recordings_regardless_of_age(cache_path):
+    recorder = SearchCache(cache_path)
+    recorder.put("rust vs go", 5, RESPONSE, ttl=0.01)
+    time.sleep(0.02)
+    assert recorder.get("rust vs go", 5) is None
+
+    replay = SearchCache(cache_path, replay=True)
+    assert replay.get("rust vs go", 5) == RESPONSE
+    # Recordings are read-only during replay
+    replay.put("new query", 5, RESPONSE)
+    assert SearchCache(cache_path).get("new query", 5) is None
+
+
+def test_replayed_search_does_not_touch_the_network(cache_path, monkeypatch, offline):
+    SearchCache(cache_path).put("rust vs go", 5, RESPONSE)
+    _use_cache(monkeypatch, SearchCache(cache_path, replay=True))
+
+    assert web_search._search("Rust vs. Go", 5) == RESPONSE
+    assert asyncio.run(web_search._asearch("rust vs go", 5)) == RESPONSE
+
+
+def test_replay_miss_raises_lookup_error(cache_path, monkeypatch, offline):
+    _use_cache(monkeypatch, SearchCache(cache_path, replay=True))
+
+    with pytest.raises(LookupError, match="No recorded search results"):
+        web_search._search("never recorded", 5)
+    with pytest.raises(LookupError):
+        asyncio.run(web_search._asearch("never recorded", 5))
+
+
+def test_readwrite_miss_records_the_live_response(cache_path, monkeypatch):
+    calls = []
+
+    class _Tavily:
+        def search(self, query, max_results):
+            calls.append(query)
+            return RESPONSE
+
+    monkeypatch.setattr(web_search, "tavily_client", _Tavily())
+    _use_cache(monkeypatch, SearchCache(cache_path))
+
+    assert web_search._search("rust vs go", 5) == RESPONSE
+    assert web_search._search("rust vs go", 5) == RESPONSE
+    assert calls == ["rust vs go"]
@@ -0,0 +1,27 @@
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+
+from utils.streaming import iter_agent_events
+
+
+def test_tokens_of_tagged_model_calls_are_not_streamed():
+    stream = [
+        ("messages", (AIMessageChunk(content="Par"), {"tags": []})),
+        ("messages", (AIMessageChunk(content="- condensed fact"), {"tags": ["compression", "nostream"]})),
+        ("messages", (AIMessageChunk(content="hidden"), {"tags": ["nostream"]})),
+        ("messages", (AIMessageChunk(content="is."), {})),
+    ]
+    assert [payload for kind, payload in iter_agent_events(stream)] == ["Par", "is."]
+
+
+def test_updates_yield_messages_tool_calls_and_results():
+    call = {"name": "internet_search", "args": {"query": "x"}, "id": "1", "type": "tool_call"}
+    answer = AIMessage(content="", tool_calls=[call])
+    result = ToolMessage(content="{}", tool_call_id="1", name="internet_search")
+    stream = [
+        ("updates", {"model": {"messages": [answer]}}),
+        ("updates", {"tools": {"messages": [result]}}),
+        ("updates", {"middleware": None}),
+    ]
+    events = list(iter_agent_events(stream))
+    assert [kind for kind, _ in events] == ["message", "tool_call", "tool_result"]
+    assert events[1][1]["name"] == "internet_search"
@@ -1,34 +1,240 @@
-from .synbolic_math import (
-    differentiate,
-    integrate_expression,
-    solve_equation,
-    matrix_operation,
-    preprocess_math,
-    calculate,
-)
-from .date_time import (
-    get_current_datetime,
-    get_current_timestamp,
-    convert_timestamp_to_datetime,
-)
-from .web_search import internet_search
 from dotenv import load_dotenv
 import os
 
+from .registry import lazy_tool, load_times
+from .search_cache import SEARCH_CACHE_MODE
+
 load_dotenv()
 USE_CRAWL4AI = os.getenv("USE_CRAWL4AI", "False").lower() == "true"
 
+# Check if TAVILY_API_KEY exists; replaying recorded searches needs no key
+if not os.environ.get("TAVILY_API_KEY") and SEARCH_CACHE_MODE != "replay":
+    raise ValueError("TAVILY_API_KEY is missing. Please set it in your .env file.")
+
+# The functions below are light stubs: they give the agent each tool's name,
+# signature and description, while the implementing module (SymPy, Tavily,
+# Crawl4AI, ...) is only imported the first time the tool is called.
+# Network-bound tools carry both a sync and an async implementation, so an agent
+# driven with `astream` runs several of them concurrently on one event loop.
+# Potentially runaway SymPy calls run in a sandboxed worker process pool.
+
+
+@lazy_tool("web_search", async_attr="ainternet_search")
+def internet_search(
+    query: str,
+    max_results: int = 5,
+):
+    """Run a web search with improved query understanding"""
+
+
+@lazy_tool("web_search", async_attr="ainternet_search_many")
+def internet_search_many(
+    queries: list[str],
+    max_results: int = 5,
+    max_total: int = 10,
+) -> dict:
+    """
+    Run several phrasings of a search at once and return one fused, deduplicated ranking.
+
+    Args:
+        queries: Search queries to run concurrently.
+        max_results: Results fetched per query.
+        max_total: Maximum number of fused results returned.
+
+    Returns:
+        Dictionary with fused 'results' (each with per-query 'provenance') and 'failed_queries'.
+    """
+
+
 if USE_CRAWL4AI:
-    from .web_crawler import crawl_url
+
+    @lazy_tool("web_crawler", async_attr="acrawl_url")
+    def crawl_url(
+        urls: list[str] | str,
+        headless: bool = True,
+        verbose: bool = False,
+        full_content: bool = False,
+    ) -> dict:
+        """
+        Crawl one or more URLs concurrently and return a short summary of each page.
+
+        The full text is indexed locally; read it with search_crawled. A page
+        repeating one already returned only names it under 'duplicate_of'.
+
+        Args:
+            urls: A single URL or list of URLs to crawl.
+            headless (bool): Whether to run browser in headless mode. Default is True.
+            verbose (bool): Whether to enable verbose logging. Default is False.
+            full_content (bool): Return the full page bodies instead of summaries.
+
+        Returns:
+            Dictionary containing crawled 'results' and 'failed_results'.
+        """
+
     print("Using Crawl4AI for web crawling")
 else:
-    from .web_search import crawl_url
+
+    @lazy_tool("web_search", async_attr="acrawl_url")
+    def crawl_url(
+        urls: list[str] | str,
+        format: str = "markdown",
+        extract_depth: str = "basic",
+        full_content: bool = False,
+    ) -> dict:
+        """
+        Extract one or more URLs using Tavily's extraction API and return a short
+        summary of each page. The full text is indexed locally; read it with
+        search_crawled. A page repeating one already returned only names it
+        under 'duplicate_of'.
+
+        Args:
+            urls: A single URL or list of URLs to extract content from.
+            format: Output format - 'markdown' (default) or 'text'.
+            extract_depth: How deeply to extract - 'basic' or 'advanced' (default).
+            full_content: Return the full page bodies instead of summaries.
+
+        Returns:
+            Dictionary containing extracted 'results' and 'failed_results'.
+        """
+
     print("Using Tavily for web crawling")
 
 
+@lazy_tool("passage_index", async_attr="asearch_crawled")
+def search_crawled(query: str, k: int = 5, url: str | None = None) -> dict:
+    """
+    Search the pages crawled so far and return only the most relevant passages.
+
+    Args:
+        query: What you are looking for, in plain words.
+        k: Number of passages to return (at most 20).
+        url: Optionally restrict the search to one crawled page.
+
+    Returns:
+        Dictionary with ranked 'results' (url, heading, passage, score).
+    """
+
+
+@lazy_tool("sandbox_index", async_attr="asearch_files")
+def search_files(query: str, k: int = 10) -> dict:
+    """
+    Full-text search over the files in your workspace (notes, reports, uploads).
+
+    Args:
+        query: What you are looking for, in plain words.
+        k: Number of matches to return (at most 50).
+
+    Returns:
+        Dictionary with ranked 'results' (path, line, snippet, score); read a
+        match with read_file starting at its line.
+    """
+
+
+@lazy_tool("date_time")
+def get_current_datetime(output_format: str = "%Y-%m-%d %H:%M:%S") -> str:
+    """
+    Get the current date and time as a formatted string.
+    Args:
+        output_format (str): The datetime format string. Default is "%Y-%m-%d %H:%M:%S".
+    Returns:
+        str: Formatted current datetime string.
+    """
+
+
+@lazy_tool("date_time")
+def get_current_timestamp() -> float:
+    """
+    Get the current Unix timestamp in seconds.
+    Returns:
+        float: Current timestamp.
+    """
+
+
+@lazy_tool("date_time")
+def convert_timestamp_to_datetime(
+    timestamp: float, output_format: str = "%Y-%m-%d %H:%M:%S"
+) -> str:
+    """
+    Convert a Unix timestamp to a formatted datetime string.
+    Args:
+        timestamp (float): Unix timestamp in seconds.
+        output_format (str): The format for the output string.
+    Returns:
+        str: Formatted datetime string.
+    """
+
+
+@lazy_tool("synbolic_math")
+def differentiate(expression: str, variable: str = "x") -> str:
+    """
+    Compute derivative of expression w.r.t. variable.
+    Example: "x**3 + 2*x", "x" → "3*x**2 + 2"
+    """
+
+
+@lazy_tool("math_pool", async_attr="aintegrate_expression")
+def integrate_expression(expression: str, variable: str = "x") -> str:
+    """
+    Compute indefinite integral.
+    Example: "3*x**2", "x" → "x**3"
+    """
+
+
+@lazy_tool("math_pool", async_attr="asolve_equation")
+def solve_equation(equation: str) -> str:
+    """
+    Solve algebraic equation. Example: "x**2 - 4 = 0" → [2, -2]
+    """
+
+
+@lazy_tool("math_pool", async_attr="amatrix_operation")
+def matrix_operation(
+    matrix_a: list, operation: str, matrix_b: list = None, exact: bool = False
+) -> str:
+    """
+    Perform matrix operations: 'determinant', 'inverse', 'transpose', 'multiply'
+    matrix_a and matrix_b are list of lists, e.g., [[1,2],[3,4]]
+    Numeric matrices are computed in floating point; set exact=True for exact
+    (fractional/symbolic) results.
+    """
+
+
+@lazy_tool("math_pool", async_attr="aevaluate_expression_grid")
+def evaluate_expression_grid(
+    expression: str,
+    variables: dict[str, list[float] | str],
+    points: int = 50,
+    max_rows: int = 20,
+) -> str:
+    """
+    Evaluate an expression over a grid of values in one vectorized pass.
+    variables maps each variable to a list of values or a "start:stop[:num]"
+    range (num defaults to points); several variables form a full grid.
+    Returns summary statistics (min, max, mean, ...) and a table down-sampled
+    to at most max_rows rows.
+    Example: "sin(x)*exp(-x/5)", {"x": "0:10:101"}
+    """
+
+
+@lazy_tool("synbolic_math")
+def preprocess_math(expr: str) -> str:
+    """Convert common math expressions to Python/sympy syntax"""
+
+
+@lazy_tool("math_pool", async_attr="acalculate")
+def calculate(expression: str) -> str:
+    """
+    Safely evaluate basic and advanced math expressions using sympy.
+    Supports: +, -, *, /, **, %, parentheses, variables, functions (sin, log, etc.)
+    """
+
+
 __all__ = [
     internet_search,
+    internet_search_many,
     crawl_url,
+    search_crawled,
+    search_files,
     get_current_datetime,
     get_current_timestamp,
     convert_timestamp_to_datetime,
@@ -36,6 +242,7 @@ __all__ = [
     integrate_expression,
     solve_equation,
     matrix_operation,
+    evaluate_expression_grid,
     preprocess_math,
     calculate,
 ]
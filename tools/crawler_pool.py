@@ -0,0 +1,268 @@
+import asyncio
+import atexit
+import os
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, TypeVar
+
+from dotenv import load_dotenv
+from crawl4ai import AsyncWebCrawler, BrowserConfig
+
+load_dotenv()
+
+T = TypeVar("T")
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36"
+
+POOL_SIZE = int(os.getenv("CRAWL4AI_POOL_SIZE", "2"))
+MAX_PAGES_PER_BROWSER = int(os.getenv("CRAWL4AI_MAX_PAGES_PER_BROWSER", "50"))
+TABS_PER_BROWSER = int(os.getenv("CRAWL4AI_TABS_PER_BROWSER", "4"))
+CRAWL_TIMEOUT = float(os.getenv("CRAWL4AI_TIMEOUT", "60"))
+
+
+class _PooledCrawler:
+    """A pool slot holding one warm browser, its open tabs and the number of pages it has served."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.crawler: AsyncWebCrawler | None = None
+        self.pages = 0
+        self.active = 0
+        self.stale = False
+        # Tabs withheld from the idle queue until a stale browser is recycled
+        self.parked = 0
+        self.lock = asyncio.Lock()
+
+
+class CrawlerPool:
+    """
+    A long-lived pool of warm Crawl4AI browsers driven by a dedicated event-loop thread.
+
+    Browsers are launched once and lent out to callers, each browser serving up
+    to `tabs` pages at a time. A browser is recycled after it has served
+    `max_pages` pages, or when it fails a health check, e.g. after a crash. A
+    browser due for recycling takes no new pages: its tabs are held back until
+    the pages it is serving finish, then it is relaunched. A crawl that raises
+    or times out only gives up its own tab; the other tabs of that browser
+    carry on.
+
+    Args:
+        size (int): Number of warm browsers kept in the pool.
+        max_pages (int): Pages served by a browser before it is relaunched.
+        tabs (int): Concurrent pages a single browser may serve.
+        headless (bool): Whether to run browsers in headless mode.
+        verbose (bool): Whether to enable verbose Crawl4AI logging.
+    """
+
+    def __init__(
+        self,
+        size: int = POOL_SIZE,
+        max_pages: int = MAX_PAGES_PER_BROWSER,
+        tabs: int = TABS_PER_BROWSER,
+        headless: bool = True,
+        verbose: bool = False,
+    ):
+        self.size = max(1, size)
+        self.max_pages = max(1, max_pages)
+        self.tabs = max(1, tabs)
+        self.headless = headless
+        self.verbose = verbose
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="crawl4ai-pool", daemon=True
+        )
+        self._idle: asyncio.Queue[_PooledCrawler] | None = None
+        self._slots: list[_PooledCrawler] = []
+        self._closed = False
+
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._warm_up(), self._loop).result()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The event loop that owns the pooled browsers."""
+        return self._loop
+
+    def _browser_config(self) -> BrowserConfig:
+        return BrowserConfig(
+            headless=self.headless,
+            verbose=self.verbose,
+            user_agent=USER_AGENT,
+        )
+
+    async def _launch(self, slot: _PooledCrawler):
+        crawler = AsyncWebCrawler(config=self._browser_config())
+        await crawler.start()
+        slot.crawler = crawler
+        slot.pages = 0
+        slot.stale = False
+
+    async def _retire(self, slot: _PooledCrawler):
+        crawler, slot.crawler = slot.crawler, None
+        slot.pages = 0
+        if crawler is not None:
+            try:
+                await crawler.close()
+            except Exception:
+                pass
+
+    async def _warm_up(self):
+        # Queue and locks must be created on the pool's own loop.
+        self._idle = asyncio.Queue()
+        self._slots = [_PooledCrawler(i) for i in range(self.size)]
+        results = await asyncio.gather(
+            *(self._launch(slot) for slot in self._slots), return_exceptions=True
+        )
+        for slot, result in zip(self._slots, results):
+            if isinstance(result, Exception):
+                # Leave the slot empty; it is launched again on first borrow.
+                slot.crawler = None
+            for _ in range(self.tabs):
+                self._idle.put_nowait(slot)
+
+    @staticmethod
+    def _is_healthy(slot: _PooledCrawler) -> bool:
+        crawler = slot.crawler
+        if crawler is None or not getattr(crawler, "ready", False):
+            return False
+        strategy = getattr(crawler, "crawler_strategy", None)
+        manager = getattr(strategy, "browser_manager", None)
+        browser = getattr(manager, "browser", None)
+        if browser is not None and hasattr(browser, "is_connected"):
+            return browser.is_connected()
+        return True
+
+    async def _borrow(self) -> _PooledCrawler:
+        while True:
+            slot = await self._idle.get()
+            try:
+                async with slot.lock:
+                    if slot.stale and slot.active > 0:
+                        # Handed back by `_release` once the browser is recycled
+                        slot.parked += 1
+                        continue
+                    # An unhealthy browser is relaunched even if other tabs hold it;
+                    # their pages are failing anyway.
+                    if slot.stale or not self._is_healthy(slot):
+                        await self._retire(slot)
+                        await self._launch(slot)
+            except BaseException:
+                self._idle.put_nowait(slot)
+                raise
+            slot.active += 1
+            return slot
+
+    async def _release(self, slot: _PooledCrawler, crashed: bool = False):
+        slot.active -= 1
+        slot.pages += 1
+        if crashed or slot.pages >= self.max_pages:
+            slot.stale = True
+        if slot.stale and slot.active > 0:
+            # The last page to finish recycles the browser and returns this tab
+            slot.parked += 1
+            return
+        if slot.stale:
+            async with slot.lock:
+                # A borrower may have relaunched it while the lock was awaited
+                if slot.stale:
+                    await self._retire(slot)
+                    if not self._closed:
+                        try:
+                            await self._launch(slot)
+                        except Exception:
+                            slot.crawler = None
+        tabs, slot.parked = slot.parked + 1, 0
+        for _ in range(tabs):
+            self._idle.put_nowait(slot)
+
+    async def with_crawler(self, fn: Callable[[AsyncWebCrawler], Awaitable[T]]) -> T:
+        """Await `fn(crawler)` with a borrowed browser. Must be awaited on the pool's loop."""
+        slot = await self._borrow()
+        crashed = False
+        try:
+            return await fn(slot.crawler)
+        except BaseException:
+            # Crawl4AI closes the failed page itself; the browser, and the
+            # crawls in its other tabs, are only torn down if it died
+            crashed = not self._is_healthy(slot)
+            raise
+        finally:
+            await self._release(slot, crashed=crashed)
+
+    def submit(self, fn: Callable[[AsyncWebCrawler], Awaitable[T]]) -> Future:
+        """
+        Schedule `fn(crawler)` on the pool's loop with a borrowed browser.
+
+        Args:
+            fn: Coroutine function receiving an `AsyncWebCrawler`.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the coroutine's result.
+        """
+        return self.run_coroutine(self.with_crawler(fn))
+
+    def run_coroutine(self, coro: Awaitable[T]) -> Future:
+        """Schedule an arbitrary coroutine on the pool's loop, e.g. one that calls `with_crawler` many times."""
+        if self._closed:
+            raise RuntimeError("Crawler pool has been shut down.")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(
+        self,
+        fn: Callable[[AsyncWebCrawler], Awaitable[T]],
+        timeout: float | None = CRAWL_TIMEOUT,
+    ) -> T:
+        """Synchronously run `fn(crawler)` on a borrowed browser and wait for it."""
+        future = self.submit(fn)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def shutdown(self, timeout: float = 30):
+        """Close every pooled browser and stop the event-loop thread."""
+        if self._closed:
+            return
+        self._closed = True
+
+        async def _close_all():
+            await asyncio.gather(
+                *(self._retire(slot) for slot in self._slots), return_exceptions=True
+            )
+
+        try:
+            asyncio.run_coroutine_threadsafe(_close_all(), self._loop).result(timeout)
+        except Exception:
+            pass
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+
+
+_pools: dict[tuple[bool, bool], CrawlerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_crawler_pool(headless: bool = True, verbose: bool = False) -> CrawlerPool:
+    """Return the process-wide crawler pool for the given browser settings, starting it on first use."""
+    key = (headless, verbose)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = CrawlerPool(headless=headless, verbose=verbose)
+            _pools[key] = pool
+        return pool
+
+
+def shutdown_crawler_pools():
+    """Shut down every crawler pool. Registered with `atexit`; safe to call more than once."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
+
+
+atexit.register(shutdown_crawler_pools)
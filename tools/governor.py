@@ -0,0 +1,507 @@
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+import requests
+from dotenv import load_dotenv
+
+from .registry import record_upstream_call
+
+load_dotenv()
+
+# Every upstream (Tavily, the LLM endpoints) gets its own governor, configured
+# with <NAME>_RATE_LIMIT (requests per second, 0 for no limit),
+# <NAME>_RATE_BURST (requests allowed at once after an idle period) and
+# <NAME>_MAX_IN_FLIGHT (concurrent requests, responses still streaming included).
+DEFAULT_MAX_IN_FLIGHT = 8
+
+# Retries of rate-limited (429), unavailable (502/503/504) and unreachable
+# upstreams: exponential backoff with full jitter, or the upstream's Retry-After
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "120"))
+
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+def retry_after(headers) -> float | None:
+    """Seconds the upstream asked us to wait (Retry-After / retry-after-ms), if any."""
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _Slots:
+    """
+    Counting semaphore shared by threads and event-loop tasks.
+
+    Waiters are served in arrival order; a released slot is handed straight to
+    the next waiter, so a burst of new requests cannot overtake queued ones.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        self._lock = threading.Lock()
+        self._waiters = deque()
+
+    def acquire(self):
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return
+            granted = threading.Event()
+            self._waiters.append(granted)
+        granted.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return
+            granted = loop.create_future()
+            self._waiters.append((loop, granted))
+        try:
+            await granted
+        except asyncio.CancelledError:
+            with self._lock:
+                if (loop, granted) in self._waiters:
+                    self._waiters.remove((loop, granted))
+                    raise
+            # The slot was handed over as the task was cancelled: pass it on
+            if granted.done() and not granted.cancelled():
+                self.release()
+            raise
+
+    def _grant(self, granted: asyncio.Future):
+        if granted.cancelled():
+            self.release()
+        else:
+            granted.set_result(None)
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self.active -= 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            loop, granted = waiter
+            loop.call_soon_threadsafe(self._grant, granted)
+
+
+class Governor:
+    """
+    Admission control for one upstream API: a token-bucket rate limit, a cap on
+    requests in flight, and retry with backoff shared by every client of it.
+
+    A 429 with Retry-After pauses all requests to the upstream, not just the
+    one that was rejected.
+
+    Args:
+        name (str): Upstream name, used in metrics.
+        rate (float): Requests per second; 0 disables the rate limit.
+        burst (int): Bucket size, i.e. requests allowed back to back.
+        max_in_flight (int): Concurrent requests allowed.
+        max_retries (int): Retries of a failed request before giving up.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = 0.0,
+        burst: int = 1,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        max_retries: int = HTTP_MAX_RETRIES,
+    ):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_retries = max_retries
+        self._slots = _Slots(max_in_flight)
+        self.max_in_flight = self._slots.limit
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._metrics = {
+            "requests": 0,
+            "retries": 0,
+            "throttled": 0,
+            "failures": 0,
+            "queue_wait_s": 0.0,
+            "max_queue_wait_s": 0.0,
+            "backoff_s": 0.0,
+            "peak_in_flight": 0,
+        }
+
+    def _reserve(self) -> float:
+        """Take a token and return how long to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self._paused_until - now)
+            if self.rate > 0:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                # Tokens may go negative: later callers queue behind earlier ones
+                self._tokens -= 1
+                if self._tokens < 0:
+                    delay = max(delay, -self._tokens / self.rate)
+            return delay
+
+    def _admitted(self, started: float) -> float:
+        waited = time.monotonic() - started
+        with self._lock:
+            metrics = self._metrics
+            metrics["requests"] += 1
+            metrics["queue_wait_s"] += waited
+            metrics["max_queue_wait_s"] = max(metrics["max_queue_wait_s"], waited)
+            metrics["peak_in_flight"] = max(metrics["peak_in_flight"], self._slots.active)
+        return waited
+
+    def acquire(self) -> float:
+        """Block until a request may be sent; returns the seconds spent waiting."""
+        started = time.monotonic()
+        self._slots.acquire()
+        try:
+            delay = self._reserve()
+            if delay:
+                time.sleep(delay)
+        except BaseException:
+            self._slots.release()
+            raise
+        return self._admitted(started)
+
+    async def aacquire(self) -> float:
+        """Async version of `acquire`."""
+        started = time.monotonic()
+        await self._slots.aacquire()
+        try:
+            delay = self._reserve()
+            if delay:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._slots.release()
+            raise
+        return self._admitted(started)
+
+    def release(self):
+        self._slots.release()
+
+    def backoff(self, attempt: int, status: int | None, headers=None) -> float | None:
+        """
+        Record a failed attempt and return the delay before retrying it, or
+        None when the request should not be retried.
+        """
+        delay = min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2**attempt)
+        delay = random.uniform(0, delay)
+        requested = retry_after(headers) if headers is not None else None
+        with self._lock:
+            self._metrics["throttled"] += status == 429
+            if attempt >= self.max_retries:
+                self._metrics["failures"] += 1
+                return None
+            if requested is not None:
+                # A little jitter keeps paused callers from retrying in lockstep
+                delay = min(requested, HTTP_BACKOFF_MAX) + random.uniform(0, HTTP_BACKOFF_BASE)
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._metrics["retries"] += 1
+            self._metrics["backoff_s"] += delay
+        return delay
+
+    def stats(self) -> dict:
+        """Return request, retry and queue-wait counters and the current load."""
+        with self._lock:
+            stats = dict(self._metrics)
+        requests_sent = stats["requests"]
+        stats["avg_queue_wait_s"] = stats["queue_wait_s"] / requests_sent if requests_sent else 0.0
+        stats["in_flight"] = self._slots.active
+        stats["max_in_flight"] = self.max_in_flight
+        stats["rate"] = self.rate
+        return stats
+
+
+_governors: dict[str, Governor] = {}
+_clients: dict[tuple[str, str], object] = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(name: str) -> Governor:
+    """Return the process-wide governor of an upstream, configured from `<NAME>_*` variables."""
+    with _governors_lock:
+        governor = _governors.get(name)
+        if governor is None:
+            prefix = name.upper()
+            governor = _governors[name] = Governor(
+                name,
+                rate=float(os.getenv(f"{prefix}_RATE_LIMIT", "0")),
+                burst=int(os.getenv(f"{prefix}_RATE_BURST", "1")),
+                max_in_flight=int(
+                    os.getenv(f"{prefix}_MAX_IN_FLIGHT", str(DEFAULT_MAX_IN_FLIGHT))
+                ),
+            )
+        return governor
+
+
+def governor_stats() -> dict[str, dict]:
+    """Return `Governor.stats` of every upstream used so far."""
+    with _governors_lock:
+        governors = list(_governors.values())
+    return {governor.name: governor.stats() for governor in governors}
+
+
+def format_governor_stats(stats: dict[str, dict]) -> str:
+    """Render `governor_stats` as one line per upstream."""
+    return "\n".join(
+        f"{name}: {upstream['requests']} requests, {upstream['retries']} retries "
+        f"({upstream['throttled']} rate-limited, {upstream['failures']} gave up), "
+        f"queued {upstream['queue_wait_s']:.2f} s "
+        f"(avg {upstream['avg_queue_wait_s'] * 1000:.0f} ms, max {upstream['max_queue_wait_s']:.2f} s), "
+        f"peak {upstream['peak_in_flight']}/{upstream['max_in_flight']} in flight"
+        for name, upstream in stats.items()
+    )
+
+
+_RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+def _release_once(governor: Governor):
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            governor.release()
+
+    return release
+
+
+class GovernedTransport(httpx.BaseTransport):
+    """httpx transport that sends every request through a `Governor`, retrying on its behalf."""
+
+    def __init__(self, governor: Governor, transport: httpx.BaseTransport):
+        self.governor = governor
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        attempt, waited = 0, 0.0
+        while True:
+            waited += self.governor.acquire()
+            release = _release_once(self.governor)
+            try:
+                response = self._transport.handle_request(request)
+            except _RETRY_ERRORS:
+                release()
+                delay = self.governor.backoff(attempt, None)
+                if delay is None:
+                    record_upstream_call(waited, attempt)
+                    raise
+            except BaseException:
+                release()
+                raise
+            else:
+                delay = None
+                if response.status_code in RETRY_STATUSES:
+                    delay = self.governor.backoff(attempt, response.status_code, response.headers)
+                if delay is None:
+                    record_upstream_call(waited, attempt)
+                    # The slot is held until the body is read, streamed answers included
+                    return httpx.Response(
+                        response.status_code,
+                        headers=response.headers,
+                        stream=_ReleasingStream(response.stream, release),
+                        extensions=response.extensions,
+                    )
+                response.close()
+                release()
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncGovernedTransport(httpx.AsyncBaseTransport):
+    """Async version of `GovernedTransport`."""
+
+    def __init__(self, governor: Governor, transport: httpx.AsyncBaseTransport):
+        self.governor = governor
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attempt, waited = 0, 0.0
+        while True:
+            waited += await self.governor.aacquire()
+            release = _release_once(self.governor)
+            try:
+                response = await self._transport.handle_async_request(request)
+            except _RETRY_ERRORS:
+                release()
+                delay = self.governor.backoff(attempt, None)
+                if delay is None:
+                    record_upstream_call(waited, attempt)
+                    raise
+            except BaseException:
+                release()
+                raise
+            else:
+                delay = None
+                if response.status_code in RETRY_STATUSES:
+                    delay = self.governor.backoff(attempt, response.status_code, response.headers)
+                if delay is None:
+                    record_upstream_call(waited, attempt)
+                    return httpx.Response(
+                        response.status_code,
+                        headers=response.headers,
+                        stream=_AsyncReleasingStream(response.stream, release),
+                        extensions=response.extensions,
+                    )
+                await response.aclose()
+                release()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class GovernedAdapter(requests.adapters.HTTPAdapter):
+    """requests adapter that sends every request through a `Governor`, retrying on its behalf."""
+
+    def __init__(self, governor: Governor, **kwargs):
+        self.governor = governor
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        attempt, waited = 0, 0.0
+        while True:
+            waited += self.governor.acquire()
+            try:
+                response = super().send(request, **kwargs)
+            except requests.exceptions.ConnectionError:
+                delay = self.governor.backoff(attempt, None)
+                if delay is None:
+                    record_upstream_call(waited, attempt)
+                    raise
+            else:
+                delay = None
+                if response.status_code in RETRY_STATUSES:
+                    delay = self.governor.backoff(attempt, response.status_code, response.headers)
+                if delay is None:
+                    record_upstream_call(waited, attempt)
+                    return response
+                response.close()
+            finally:
+                # Bodies are read before send returns unless the caller streams
+                self.governor.release()
+            time.sleep(delay)
+            attempt += 1
+
+
+def _limits(governor: Governor) -> httpx.Limits:
+    pool = governor.max_in_flight
+    return httpx.Limits(max_connections=pool, max_keepalive_connections=pool)
+
+
+def get_http_client(name: str) -> httpx.Client:
+    """Return the process-wide keep-alive httpx client of an upstream, governed by `get_governor(name)`."""
+    governor = get_governor(name)
+    with _governors_lock:
+        client = _clients.get((name, "sync"))
+        if client is None:
+            client = _clients[(name, "sync")] = httpx.Client(
+                transport=GovernedTransport(
+                    governor, httpx.HTTPTransport(limits=_limits(governor))
+                ),
+                timeout=HTTP_TIMEOUT,
+            )
+        return client
+
+
+def get_async_http_client(name: str) -> httpx.AsyncClient:
+    """
+    Async version of `get_http_client`.
+
+    The client's connections belong to the event loop that opened them, so it
+    is meant for the shared loop of `utils.aio`.
+    """
+    governor = get_governor(name)
+    with _governors_lock:
+        client = _clients.get((name, "async"))
+        if client is None:
+            client = _clients[(name, "async")] = httpx.AsyncClient(
+                transport=AsyncGovernedTransport(
+                    governor, httpx.AsyncHTTPTransport(limits=_limits(governor))
+                ),
+                timeout=HTTP_TIMEOUT,
+            )
+        return client
+
+
+def get_requests_session(name: str) -> requests.Session:
+    """Return the process-wide keep-alive requests session of an upstream, governed by `get_governor(name)`."""
+    governor = get_governor(name)
+    with _governors_lock:
+        session = _clients.get((name, "requests"))
+        if session is None:
+            pool = governor.max_in_flight
+            adapter = GovernedAdapter(governor, pool_connections=pool, pool_maxsize=pool)
+            session = _clients[(name, "requests")] = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        return session
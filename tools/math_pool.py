@@ -0,0 +1,391 @@
+import asyncio
+import atexit
+import os
+import queue
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from dotenv import load_dotenv
+
+from .numeric import fast_calculate
+
+load_dotenv()
+
+MATH_POOL_ENABLED = os.getenv("MATH_POOL_ENABLED", "True").lower() == "true"
+MATH_POOL_SIZE = int(os.getenv("MATH_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+MATH_TIMEOUT = float(os.getenv("MATH_TIMEOUT", "20"))
+MATH_MEMORY_MB = int(os.getenv("MATH_MEMORY_MB", "1024"))
+MATH_MAX_TASKS_PER_WORKER = int(os.getenv("MATH_MAX_TASKS_PER_WORKER", "200"))
+
+_POLL_INTERVAL = 0.05
+_AUTHKEY_ENV = "MATH_WORKER_AUTHKEY"
+_READY_MARKER = "MATH_WORKER_READY"
+# Longest wait for an idle worker, which covers starting a replacement
+_STARTUP_TIMEOUT = 30.0
+
+
+def _worker_main(memory_mb: int):
+    """Entry point of a worker process: apply limits, then serve calls until told to stop."""
+    # Keep numeric libraries from reserving per-thread arenas under the memory limit.
+    os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    if memory_mb > 0:
+        try:
+            import resource
+
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+
+    from tools import synbolic_math
+
+    # Tell the parent where to connect, then keep stray prints off the pipe
+    authkey = bytes.fromhex(os.environ.pop(_AUTHKEY_ENV))
+    with Listener(authkey=authkey) as listener:
+        print(f"{_READY_MARKER} {listener.address}", flush=True)
+        sys.stdout = open(os.devnull, "w")
+        # Exit rather than linger if the parent goes away before connecting
+        watchdog = threading.Timer(_STARTUP_TIMEOUT, os._exit, args=(1,))
+        watchdog.daemon = True
+        watchdog.start()
+        conn = listener.accept()
+        watchdog.cancel()
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        name, args = message
+        try:
+            result = getattr(synbolic_math, name)(*args)
+        except MemoryError:
+            result = "Error: memory limit exceeded"
+        except Exception as e:
+            result = f"Error: {str(e)}"
+        recycle = _near_memory_limit(memory_mb)
+        try:
+            conn.send((result, recycle))
+        except (EOFError, OSError):
+            return
+        if recycle:
+            return
+
+
+def _near_memory_limit(memory_mb: int) -> bool:
+    if memory_mb <= 0:
+        return False
+    try:
+        import resource
+
+        # ru_maxrss is in KiB on Linux
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return False
+    return peak_mb > 0.8 * memory_mb
+
+
+class _Worker:
+    """
+    A worker process started as `python -m tools.math_pool`.
+
+    Workers are plain interpreters rather than `multiprocessing` children, so
+    they never re-import the caller's `__main__` (cli.py runs its loop at
+    module level) and start the same way under Streamlit, the CLI or a script.
+    """
+
+    def __init__(self, memory_mb: int):
+        authkey = secrets.token_bytes(16)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env[_AUTHKEY_ENV] = authkey.hex()
+        env["PYTHONPATH"] = os.pathsep.join(
+            filter(None, [root, os.environ.get("PYTHONPATH")])
+        )
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", __name__, str(memory_mb)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            env=env,
+            cwd=root,
+        )
+        self.tasks = 0
+        self.dead = False
+        try:
+            address = self._read_address()
+            self.conn = Client(address, authkey=authkey)
+        except Exception:
+            self.process.kill()
+            raise
+
+    def _read_address(self) -> str:
+        for line in self.process.stdout:
+            if line.startswith(_READY_MARKER):
+                return line[len(_READY_MARKER) :].strip()
+        raise RuntimeError(
+            f"Math worker exited during startup (code {self.process.wait()})."
+        )
+
+    def kill(self):
+        self.dead = True
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process.stdout.close()
+        self.conn.close()
+
+    def stop(self):
+        if not self.dead:
+            try:
+                self.conn.send(None)
+                self.process.wait(1)
+            except (EOFError, OSError, subprocess.TimeoutExpired):
+                pass
+        self.kill()
+
+
+class MathWorkerPool:
+    """
+    A warm pool of worker processes that run SymPy calls under wall-clock and memory limits.
+
+    Each call is sent to an idle worker. If it exceeds `timeout` or is cancelled,
+    the worker is killed and a replacement is started in the background, so the
+    caller gets its error at once. Workers are also replaced when they near the
+    memory limit or after `max_tasks` calls.
+
+    Args:
+        size (int): Number of worker processes.
+        timeout (float): Default per-call wall-clock limit in seconds.
+        memory_mb (int): Address-space limit of each worker in MiB (0 disables it).
+        max_tasks (int): Calls served by a worker before it is replaced.
+    """
+
+    def __init__(
+        self,
+        size: int = MATH_POOL_SIZE,
+        timeout: float = MATH_TIMEOUT,
+        memory_mb: int = MATH_MEMORY_MB,
+        max_tasks: int = MATH_MAX_TASKS_PER_WORKER,
+    ):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.max_tasks = max(1, max_tasks)
+        self.timeouts = 0
+        self.recycled = 0
+
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._workers: list[_Worker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(self.size):
+            self._spawn_in_background()
+
+    def _spawn(self):
+        try:
+            worker = _Worker(self.memory_mb)
+        except Exception as e:
+            print(f"Failed to start math worker: {e}")
+            return
+        with self._lock:
+            if self._closed:
+                worker.stop()
+                return
+            self._workers.append(worker)
+        self._idle.put(worker)
+
+    def _spawn_in_background(self):
+        threading.Thread(target=self._spawn, daemon=True).start()
+
+    def _replace(self, worker: _Worker):
+        worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        self.recycled += 1
+        if not self._closed:
+            self._spawn_in_background()
+
+    def run(
+        self,
+        name: str,
+        args: tuple,
+        timeout: float | None = None,
+        cancel_event: threading.Event | None = None,
+    ) -> str:
+        """
+        Call `synbolic_math.<name>(*args)` in a worker and return its result string.
+
+        Args:
+            name: Name of the function in `synbolic_math`.
+            args: Positional arguments for it.
+            timeout: Wall-clock limit in seconds; defaults to the pool's.
+            cancel_event: When set, the call is abandoned and its worker killed.
+
+        Returns:
+            str: The function's result, or an "Error: ..." string on timeout or crash.
+        """
+        if self._closed:
+            raise RuntimeError("Math worker pool has been shut down.")
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            worker = self._idle.get(timeout=max(timeout, _STARTUP_TIMEOUT))
+        except queue.Empty:
+            return "Error: no math worker available"
+        healthy = False
+        try:
+            worker.conn.send((name, args))
+            deadline = time.monotonic() + timeout
+            while not worker.conn.poll(_POLL_INTERVAL):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise asyncio.CancelledError()
+                if time.monotonic() > deadline:
+                    self.timeouts += 1
+                    return f"Error: computation timed out after {timeout:g}s"
+            result, recycle = worker.conn.recv()
+            worker.tasks += 1
+            healthy = not recycle and worker.tasks < self.max_tasks
+            return result
+        except (EOFError, OSError):
+            return "Error: math worker crashed (memory limit exceeded?)"
+        finally:
+            if healthy:
+                self._idle.put(worker)
+            else:
+                self._replace(worker)
+
+    async def arun(self, name: str, args: tuple, timeout: float | None = None) -> str:
+        """Async version of `run`; cancelling the awaiting task kills the worker."""
+        cancel_event = threading.Event()
+        try:
+            return await asyncio.to_thread(self.run, name, args, timeout, cancel_event)
+        except asyncio.CancelledError:
+            cancel_event.set()
+            raise
+
+    def shutdown(self):
+        """Stop every worker process."""
+        self._closed = True
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop()
+
+
+_pool: MathWorkerPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_math_pool() -> MathWorkerPool:
+    """Return the process-wide math worker pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = MathWorkerPool()
+        return _pool
+
+
+def shutdown_math_pool():
+    """Stop the math worker pool. Registered with `atexit`; safe to call more than once."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+atexit.register(shutdown_math_pool)
+
+
+def _call(name: str, *args) -> str:
+    if not MATH_POOL_ENABLED:
+        from . import synbolic_math
+
+        return getattr(synbolic_math, name)(*args)
+    return get_math_pool().run(name, args)
+
+
+async def _acall(name: str, *args) -> str:
+    if not MATH_POOL_ENABLED:
+        return await asyncio.to_thread(_call, name, *args)
+    pool = await asyncio.to_thread(get_math_pool)
+    return await pool.arun(name, args)
+
+
+def solve_equation(equation: str) -> str:
+    return _call("solve_equation", equation)
+
+
+async def asolve_equation(equation: str) -> str:
+    return await _acall("solve_equation", equation)
+
+
+def integrate_expression(expression: str, variable: str = "x") -> str:
+    return _call("integrate_expression", expression, variable)
+
+
+async def aintegrate_expression(expression: str, variable: str = "x") -> str:
+    return await _acall("integrate_expression", expression, variable)
+
+
+def matrix_operation(
+    matrix_a: list, operation: str, matrix_b: list = None, exact: bool = False
+) -> str:
+    return _call("matrix_operation", matrix_a, operation, matrix_b, exact)
+
+
+async def amatrix_operation(
+    matrix_a: list, operation: str, matrix_b: list = None, exact: bool = False
+) -> str:
+    return await _acall("matrix_operation", matrix_a, operation, matrix_b, exact)
+
+
+def evaluate_expression_grid(
+    expression: str,
+    variables: dict[str, list[float] | str],
+    points: int = 50,
+    max_rows: int = 20,
+) -> str:
+    return _call("evaluate_expression_grid", expression, variables, points, max_rows)
+
+
+async def aevaluate_expression_grid(
+    expression: str,
+    variables: dict[str, list[float] | str],
+    points: int = 50,
+    max_rows: int = 20,
+) -> str:
+    return await _acall(
+        "evaluate_expression_grid", expression, variables, points, max_rows
+    )
+
+
+# Plain arithmetic is answered in-process by `fast_calculate`; only expressions
+# that need SymPy are sent to a worker.
+
+
+def calculate(expression: str) -> str:
+    result = fast_calculate(expression)
+    if result is not None:
+        return result
+    return _call("calculate", expression)
+
+
+async def acalculate(expression: str) -> str:
+    result = fast_calculate(expression)
+    if result is not None:
+        return result
+    return await _acall("calculate", expression)
+
+
+if __name__ == "__main__":
+    _worker_main(int(sys.argv[1]))
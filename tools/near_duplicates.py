@@ -0,0 +1,417 @@
+import json
+import os
+import re
+import threading
+from hashlib import blake2b, sha256
+
+import httpx
+import numpy as np
+from dotenv import load_dotenv
+from langgraph.config import get_config
+
+from config import SANDBOX_DIR
+
+from .governor import get_http_client
+from .page_cache import canonicalize_url
+from .registry import record_cache_lookup
+
+load_dotenv()
+
+# Near-duplicate search results and crawled pages (syndicated or mirrored
+# articles) are collapsed into the first copy. "api" embeds with the EMBEDDING_*
+# endpoint (dedup is off while it is not configured); "local" uses
+# `local_embeddings`, a network-free stand-in for tests and offline runs.
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "True").lower() == "true"
+DEDUP_EMBEDDINGS = os.getenv("DEDUP_EMBEDDINGS", "api").lower()
+# Cosine similarity at or above which two texts count as the same article
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.95"))
+DEDUP_STORE_DIR = os.getenv(
+    "DEDUP_STORE_DIR", os.path.join(SANDBOX_DIR, ".index", "embeddings")
+)
+# Vectors kept in the store; the oldest are dropped first
+DEDUP_MAX_VECTORS = int(os.getenv("DEDUP_MAX_VECTORS", "20000"))
+
+EMBEDDING_BASE_URL = os.getenv("EMBEDDING_BASE_URL")
+EMBEDDING_API_KEY = os.getenv("EMBEDDING_API_KEY")
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME")
+# Texts per embedding request, and characters of each text that are embedded
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_MAX_CHARS = int(os.getenv("EMBEDDING_MAX_CHARS", "8000"))
+
+LOCAL_DIMENSIONS = 1024
+
+
+def local_embeddings(texts: list[str], dimensions: int = LOCAL_DIMENSIONS) -> np.ndarray:
+    """
+    Embed texts without a model: signed feature hashing of word unigrams and bigrams.
+
+    Near-identical texts get near-identical vectors while unrelated texts are
+    close to orthogonal, which is all duplicate detection needs.
+
+    Returns:
+        np.ndarray: One L2-normalized float32 row per text.
+    """
+    vectors = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = re.findall(r"\w+", text.lower())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = int.from_bytes(blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+            vectors[row, digest % dimensions] += 1.0 if digest >> 63 else -1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def api_embeddings(texts: list[str]) -> np.ndarray:
+    """
+    Embed texts with the OpenAI-compatible EMBEDDING_* endpoint, EMBEDDING_BATCH_SIZE per request.
+
+    Returns:
+        np.ndarray: One L2-normalized float32 row per text.
+    """
+    client = get_http_client("embedding")
+    rows = []
+    for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        batch = texts[start : start + EMBEDDING_BATCH_SIZE]
+        response = client.post(
+            EMBEDDING_BASE_URL.rstrip("/") + "/embeddings",
+            headers={"Authorization": f"Bearer {EMBEDDING_API_KEY}"},
+            json={"model": EMBEDDING_MODEL_NAME, "input": batch},
+        )
+        response.raise_for_status()
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        rows.extend(item["embedding"] for item in data)
+    vectors = np.asarray(rows, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class VectorStore:
+    """
+    A NumPy-backed store of text embeddings and of the documents already
+    returned to the agent, persisted under the sandbox.
+
+    Embeddings are cached by a hash of the embedding model and the text, so a
+    text is embedded once. Documents are recorded per conversation thread and
+    kind ('search' results, 'crawl' pages) by canonical URL, and new results
+    are compared against those of their thread and against each other. Clearing
+    the sandbox clears the store too.
+
+    The store is saved as an append-only log: new vectors are appended to
+    vectors.f32 as raw float32 rows and new keys and documents to index.jsonl,
+    so a call writes only what it added. Both files are rewritten once the log
+    holds twice as many entries as the store (after dropped vectors and
+    re-recorded documents), and the log is replayed on load.
+
+    Args:
+        directory (str): Where the vectors and their index are saved.
+        embed (callable): Function embedding a list of texts into normalized rows.
+        model (str): Name of the embedding model, part of the cache key.
+        threshold (float): Cosine similarity of near-duplicates.
+        max_vectors (int): Vectors kept before the oldest are dropped.
+    """
+
+    def __init__(
+        self,
+        directory: str = DEDUP_STORE_DIR,
+        embed=local_embeddings,
+        model: str = "local",
+        threshold: float = DEDUP_THRESHOLD,
+        max_vectors: int = DEDUP_MAX_VECTORS,
+    ):
+        self.directory = directory
+        self.embed = embed
+        self.model = model
+        self.threshold = threshold
+        self.max_vectors = max_vectors
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._vectors: np.ndarray | None = None
+        self._keys: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._documents: dict[str, dict[str, str]] = {}
+        # Entries in the log on disk, and whether it can be appended to as is
+        self._logged = 0
+        self._synced = False
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.directory, "vectors.f32")
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, "index.jsonl")
+
+    def _load(self):
+        # Start over if the sandbox (and with it the store) was cleared
+        if self._loaded and os.path.exists(self._index_path):
+            return
+        self._reset()
+        self._loaded = True
+        entries, complete = [], True
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # An append cut short; the next write rewrites the log
+                        complete = False
+                        break
+            vectors = np.fromfile(self._vectors_path, dtype=np.float32)
+        except (OSError, ValueError):
+            return
+        if header.get("model") != self.model:
+            return
+        keys, documents = [], {}
+        for entry in entries:
+            if "url" in entry:
+                if entry.get("scope"):
+                    documents.setdefault(entry["scope"], {})[entry["url"]] = entry["key"]
+            else:
+                keys.append(entry["key"])
+        dimensions = header.get("dimensions") or 0
+        if len(vectors) < len(keys) * dimensions or (keys and not dimensions):
+            return
+        if keys:
+            self._vectors = vectors[: len(keys) * dimensions].reshape(len(keys), dimensions)
+        self._keys = keys
+        self._documents = documents
+        self._trim()
+        self._logged = len(entries)
+        self._synced = complete and len(vectors) == len(keys) * dimensions
+
+    def _rewrite(self):
+        entries = [{"key": key} for key in self._keys] + [
+            {"scope": scope, "url": url, "key": key}
+            for scope, documents in self._documents.items()
+            for url, key in documents.items()
+        ]
+        vectors = self._vectors if self._vectors is not None else np.zeros((0, 0), np.float32)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._vectors_path + ".tmp", "wb") as f:
+            vectors.tofile(f)
+        with open(self._index_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(json.dumps({"model": self.model, "dimensions": vectors.shape[1]}) + "\n")
+            f.writelines(json.dumps(entry) + "\n" for entry in entries)
+        # Vectors without an index are ignored: a crash in between empties the store
+        if os.path.exists(self._index_path):
+            os.remove(self._index_path)
+        os.replace(self._vectors_path + ".tmp", self._vectors_path)
+        os.replace(self._index_path + ".tmp", self._index_path)
+        self._logged = len(entries)
+        self._synced = True
+
+    def _append(self, entries: list[dict], vectors: np.ndarray | None = None):
+        live = len(self._keys) + sum(len(documents) for documents in self._documents.values())
+        if (
+            not self._synced
+            or self._logged + len(entries) > 2 * live
+            or not os.path.exists(self._index_path)
+        ):
+            self._rewrite()
+            return
+        if vectors is not None:
+            with open(self._vectors_path, "ab") as f:
+                vectors.astype(np.float32).tofile(f)
+        with open(self._index_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in entries)
+        self._logged += len(entries)
+
+    def _key(self, text: str) -> str:
+        return sha256(f"{self.model}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _trim(self):
+        overflow = len(self._keys) - self.max_vectors
+        if overflow > 0:
+            dropped = set(self._keys[:overflow])
+            self._vectors = self._vectors[overflow:]
+            self._keys = self._keys[overflow:]
+            for documents in self._documents.values():
+                for url in [url for url, key in documents.items() if key in dropped]:
+                    del documents[url]
+        self._rows = {key: row for row, key in enumerate(self._keys)}
+
+    def _add(self, keys: list[str], vectors: np.ndarray):
+        vectors = vectors.astype(np.float32)
+        self._vectors = vectors if self._vectors is None else np.vstack([self._vectors, vectors])
+        self._keys.extend(keys)
+        self._trim()
+        self._append([{"key": key} for key in keys], vectors)
+
+    def vectors(self, texts: list[str]) -> tuple[list[str], np.ndarray]:
+        """Return the cache keys and embeddings of texts, embedding only the uncached ones in one batched call."""
+        texts = [text[:EMBEDDING_MAX_CHARS] for text in texts]
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            self._load()
+            missing = list(dict.fromkeys(k for k in keys if k not in self._rows))
+        hits = len(keys) - len(missing)
+        self.hits += hits
+        self.misses += len(missing)
+        record_cache_lookup(hits=hits, misses=len(missing))
+        if missing:
+            text_of = dict(zip(keys, texts))
+            embedded = self.embed([text_of[key] for key in missing])
+            with self._lock:
+                self._load()
+                fresh = [(k, v) for k, v in zip(missing, embedded) if k not in self._rows]
+                if fresh:
+                    self._add([k for k, _ in fresh], np.stack([v for _, v in fresh]))
+        with self._lock:
+            return keys, self._vectors[[self._rows[key] for key in keys]]
+
+    def collapse(
+        self, items: list[dict], kind: str, text_of, thread_id: str | None = None
+    ) -> list[dict]:
+        """
+        Collapse near-duplicates in `items`, keeping the first copy of each article.
+
+        An item matching an earlier item of the same list is folded into it (its
+        URL is listed under the kept item's 'duplicates'). An item matching a
+        document returned to the same thread by an earlier call is replaced by a
+        stub naming it. Items with the same canonical URL are never treated as
+        duplicates.
+
+        Args:
+            items: Results in rank order.
+            kind: 'search' or 'crawl'; each kind is compared with its own history.
+            text_of: Function returning the text of an item to compare, or "".
+            thread_id: Conversation the results are returned to. Without one,
+                only duplicates within `items` are collapsed.
+
+        Returns:
+            list[dict]: The items left, in order.
+        """
+        candidates = [(item, text_of(item)) for item in items]
+        candidates = [(item, text) for item, text in candidates if text and item.get("url")]
+        if not candidates:
+            return items
+        keys, vectors = self.vectors([text for _, text in candidates])
+        row_of = {id(item): row for row, (item, _) in enumerate(candidates)}
+        scope = f"{thread_id}/{kind}" if thread_id is not None else None
+        with self._lock:
+            documents = self._documents.get(scope, {}) if scope else {}
+            history = [
+                (url, self._rows[key]) for url, key in documents.items() if key in self._rows
+            ]
+            history_vectors = self._vectors[[row for _, row in history]] if history else None
+        kept, kept_rows, result, recorded = [], [], [], {}
+        for item in items:
+            row = row_of.get(id(item))
+            if row is None:
+                result.append(item)
+                continue
+            url = canonicalize_url(item["url"])
+            vector = vectors[row]
+            if kept_rows:
+                similarity = vectors[kept_rows] @ vector
+                best = int(np.argmax(similarity))
+                if similarity[best] >= self.threshold and kept[best][1] != url:
+                    kept[best][0].setdefault("duplicates", []).append(item["url"])
+                    self.collapsed += 1
+                    continue
+            if history_vectors is not None:
+                similarity = history_vectors @ vector
+                best = int(np.argmax(similarity))
+                earlier_url = history[best][0]
+                if similarity[best] >= self.threshold and earlier_url != url:
+                    result.append(
+                        {
+                            "url": item["url"],
+                            "title": item.get("title", ""),
+                            "duplicate_of": earlier_url,
+                            "similarity": round(float(similarity[best]), 3),
+                        }
+                    )
+                    self.collapsed += 1
+                    continue
+            kept.append((item, url))
+            kept_rows.append(row)
+            recorded[url] = keys[row]
+            result.append(item)
+        with self._lock:
+            if scope and recorded:
+                self._documents.setdefault(scope, {}).update(recorded)
+                self._append(
+                    [{"scope": scope, "url": url, "key": key} for url, key in recorded.items()]
+                )
+        return result
+
+    def stats(self) -> dict:
+        """Return embedding cache counters, store size and duplicates collapsed."""
+        lookups = self.hits + self.misses
+        with self._lock:
+            self._load()
+            documents = sum(len(urls) for urls in self._documents.values())
+            vectors = len(self._keys)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "vectors": vectors,
+            "documents": documents,
+            "collapsed": self.collapsed,
+        }
+
+
+_vector_store: VectorStore | None = None
+_vector_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore | None:
+    """Return the process-wide vector store, or None when dedup is disabled or has no embeddings."""
+    global _vector_store
+    if not DEDUP_ENABLED:
+        return None
+    with _vector_store_lock:
+        if _vector_store is None:
+            if DEDUP_EMBEDDINGS == "local":
+                _vector_store = VectorStore()
+            elif all([EMBEDDING_BASE_URL, EMBEDDING_API_KEY, EMBEDDING_MODEL_NAME]):
+                _vector_store = VectorStore(embed=api_embeddings, model=EMBEDDING_MODEL_NAME)
+        return _vector_store
+
+
+def _search_text(item: dict) -> str:
+    return "\n".join(filter(None, [item.get("title"), item.get("content"), item.get("raw_content")]))
+
+
+def _page_text(item: dict) -> str:
+    return item.get("raw_content") or ""
+
+
+def _current_thread_id() -> str | None:
+    # The thread of the agent run calling the tool, if any
+    try:
+        thread_id = get_config().get("configurable", {}).get("thread_id")
+    except RuntimeError:
+        return None
+    return str(thread_id) if thread_id is not None else None
+
+
+def collapse_near_duplicates(response: dict, kind: str) -> dict:
+    """
+    Collapse near-duplicate 'results' of a search ('search') or crawl ('crawl')
+    response in place, against each other and against results returned earlier
+    in the calling agent run's thread. Dedup failures leave the response unchanged.
+    """
+    vector_store = get_vector_store()
+    if vector_store is None or not response.get("results"):
+        return response
+    try:
+        response["results"] = vector_store.collapse(
+            response["results"],
+            kind,
+            _search_text if kind == "search" else _page_text,
+            thread_id=_current_thread_id(),
+        )
+    except (httpx.HTTPError, OSError, KeyError, ValueError) as e:
+        print(f"Near-duplicate filtering skipped: {e}")
+    return response
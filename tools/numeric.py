@@ -0,0 +1,146 @@
+import ast
+import math
+import operator
+import re
+from fractions import Fraction
+
+# Bounds that keep the in-process fast path cheap; anything larger goes to SymPy
+MAX_INT_BITS = 4096
+MAX_EXPONENT = 1024
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+
+class NotNumeric(Exception):
+    """The expression needs SymPy: a name, call, unsupported operator or out-of-range value."""
+
+
+def preprocess_math(expr: str) -> str:
+    """Convert common math expressions to Python/sympy syntax"""
+    expr = expr.replace("^", "**")
+    expr = re.sub(r"(\d)([a-zA-Z])", r"\1*\2", expr)  # 2x → 2*x
+    expr = re.sub(r"(\b[a-zA-Z]|\d)(\()", r"\1*(", expr)  # x(2+x) → x*(2+x), not sin(x)
+    expr = re.sub(r"(\d)%", r"0.\1", expr)  # 15% → 0.15
+    expr = expr.replace(" ", "")  # remove spaces
+    return expr
+
+
+def prepare_expression(expression: str) -> str:
+    """Apply `calculate`'s input preprocessing, including "15% of 200" phrasing."""
+    raw_expr = preprocess_math(expression.strip())
+    if "of" in raw_expr:
+        raw_expr = raw_expr.replace("of", "*")
+    return raw_expr
+
+
+def format_result(result) -> str:
+    """Show whole numbers as integers and other numbers compactly; keep anything else symbolic."""
+    try:
+        float_result = float(result)
+        if float_result.is_integer():
+            return str(int(float_result))
+        return f"{float_result:.6g}"  # Compact float
+    except Exception:
+        return str(result)  # Keep symbolic: e.g., sqrt(2)
+
+
+def _check(value):
+    if isinstance(value, complex):
+        raise NotNumeric("complex result")
+    if isinstance(value, int) and value.bit_length() > MAX_INT_BITS:
+        raise NotNumeric("integer too large")
+    if isinstance(value, Fraction) and (
+        value.numerator.bit_length() > MAX_INT_BITS
+        or value.denominator.bit_length() > MAX_INT_BITS
+    ):
+        raise NotNumeric("fraction too large")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise NotNumeric("non-finite result")
+    return value
+
+
+def _evaluate(node):
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant):
+        if type(node.value) in (int, float):
+            return _check(node.value)
+        raise NotNumeric("unsupported literal")
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        return _UNARY_OPS[type(node.op)](_evaluate(node.operand))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        left, right = _evaluate(node.left), _evaluate(node.right)
+        op = type(node.op)
+        exact = isinstance(left, (int, Fraction)) and isinstance(right, (int, Fraction))
+        if op is ast.Div and exact:
+            # Exact like SymPy's Rational, so 1/3*3 is 1
+            if right == 0:
+                raise NotNumeric("division by zero")
+            return _check(Fraction(left) / Fraction(right))
+        if op is ast.Pow:
+            return _check(_power(left, right))
+        try:
+            return _check(_BINARY_OPS[op](left, right))
+        except (ZeroDivisionError, OverflowError) as e:
+            raise NotNumeric(str(e))
+    raise NotNumeric(f"unsupported syntax: {type(node).__name__}")
+
+
+def _power(base, exponent):
+    if isinstance(exponent, int):
+        if abs(exponent) > MAX_EXPONENT:
+            raise NotNumeric("exponent too large")
+        if isinstance(base, (int, Fraction)):
+            if base == 0 and exponent < 0:
+                raise NotNumeric("division by zero")
+            bits = max(abs(base.numerator), base.denominator).bit_length()
+            if bits * abs(exponent) > MAX_INT_BITS:
+                raise NotNumeric("result too large")
+            # SymPy keeps 2**-1 exact as 1/2
+            return Fraction(base) ** exponent if exponent < 0 else base**exponent
+    try:
+        return float(base) ** float(exponent)
+    except (ZeroDivisionError, OverflowError) as e:
+        raise NotNumeric(str(e))
+
+
+def evaluate_numeric(raw_expr: str):
+    """
+    Evaluate a preprocessed, purely numeric expression without SymPy.
+
+    Only number literals, + - * / % ** and parentheses are accepted; the syntax
+    tree is checked node by node, so nothing is ever executed.
+
+    Returns:
+        int | Fraction | float: The value of the expression.
+
+    Raises:
+        NotNumeric: If the expression needs SymPy.
+    """
+    try:
+        value = _evaluate(ast.parse(raw_expr, mode="eval"))
+        # SymPy reports values beyond float range as inf; leave those to it
+        float(value)
+        return value
+    except (SyntaxError, ValueError, RecursionError, OverflowError) as e:
+        raise NotNumeric(str(e))
+
+
+def fast_calculate(expression: str) -> str | None:
+    """
+    Return `calculate`'s answer for plain arithmetic, or None if it needs SymPy.
+
+    Example: "2^10 + 3" → "1027", "x + 1" → None
+    """
+    try:
+        return format_result(evaluate_numeric(prepare_expression(expression)))
+    except NotNumeric:
+        return None
@@ -0,0 +1,409 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+from dotenv import load_dotenv
+
+from config import CACHE_DIR
+
+from .registry import record_cache_lookup
+
+load_dotenv()
+
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "True").lower() == "true"
+PAGE_CACHE_PATH = os.getenv(
+    "PAGE_CACHE_PATH", os.path.join(CACHE_DIR, "page_cache.sqlite")
+)
+# Within this window a stored page is served without contacting the origin.
+PAGE_CACHE_FRESH_FOR = float(os.getenv("PAGE_CACHE_FRESH_FOR", str(6 * 3600)))
+# Past the freshness window, a stored page is still served when revalidation
+# fails, as long as it is younger than this.
+PAGE_CACHE_MAX_STALE = float(os.getenv("PAGE_CACHE_MAX_STALE", str(7 * 24 * 3600)))
+REVALIDATE_TIMEOUT = float(os.getenv("PAGE_CACHE_REVALIDATE_TIMEOUT", "5"))
+# Stale pages of one batch revalidated at once
+REVALIDATE_CONCURRENCY = int(os.getenv("PAGE_CACHE_REVALIDATE_CONCURRENCY", "8"))
+# Compressed bytes kept before the least recently validated pages are evicted
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(500 * 1024**2)))
+
+# Validators of changed pages kept for their re-extraction
+_MAX_PENDING = 1024
+
+# Only parameters that never select content; e.g. "ref" picks a branch on GitHub
+_TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref_src"}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Canonicalize a URL so equivalent spellings share one cache entry.
+
+    Lowercases scheme and host, drops default ports, fragments and tracking
+    parameters (utm_*, fbclid, ...), sorts the query string and strips a
+    trailing slash from non-root paths. A "www." host is kept: it may serve a
+    different site than the bare domain.
+    """
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "http").lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not (scheme == "http" and port == 80) and not (
+        scheme == "https" and port == 443
+    ):
+        host = f"{host}:{port}"
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    query = urlencode(
+        sorted(
+            (k, v)
+            for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+        )
+    )
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class PageCache:
+    """
+    Compressed on-disk store of extracted pages keyed by canonical URL.
+
+    Each entry keeps the zlib-compressed Markdown, the origin's ETag and
+    Last-Modified validators and a SHA-256 hash of the content. Entries inside
+    the freshness window are served directly; older ones are revalidated with a
+    conditional request and served as-is on 304, or while revalidation fails.
+    An entry the origin reports as changed is dropped, and the new validators
+    are kept for the re-extracted copy. Stale entries without validators (e.g.
+    Tavily pages) are plain misses.
+
+    Entries not validated for `max_stale` seconds, and stale entries that cannot
+    be revalidated, are pruned on write; beyond `max_bytes` the least recently
+    validated entries go first.
+
+    Args:
+        path (str): Location of the SQLite database file.
+        fresh_for (float): Seconds an entry is served without revalidation.
+        max_stale (float): Seconds an entry may still be served if revalidation fails.
+        max_bytes (int): Compressed bytes kept before eviction.
+    """
+
+    def __init__(
+        self,
+        path: str = PAGE_CACHE_PATH,
+        fresh_for: float = PAGE_CACHE_FRESH_FOR,
+        max_stale: float = PAGE_CACHE_MAX_STALE,
+        max_bytes: int = PAGE_CACHE_MAX_BYTES,
+    ):
+        self.path = path
+        self.fresh_for = fresh_for
+        self.max_stale = max_stale
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        # Validators of changed pages, by key, until their new copy is stored
+        self._pending: dict[str, tuple[str | None, str | None]] = {}
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                content BLOB NOT NULL,
+                content_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                validated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pages_validated
+                ON pages (validated_at);
+            """
+        )
+        self._conn.commit()
+
+    def _row(self, key: str):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT content, etag, last_modified, fetched_at, validated_at FROM pages WHERE url = ?",
+                (key,),
+            ).fetchone()
+
+    def _drop(self, key: str, validated_at: float, etag: str | None, last_modified: str | None):
+        with self._lock:
+            # Unless it was stored again meanwhile
+            self._conn.execute(
+                "DELETE FROM pages WHERE url = ? AND validated_at = ?", (key, validated_at)
+            )
+            self._conn.commit()
+            if etag or last_modified:
+                self._pending[key] = (etag, last_modified)
+                if len(self._pending) > _MAX_PENDING:
+                    del self._pending[next(iter(self._pending))]
+
+    def _touch(self, key: str, etag: str | None, last_modified: str | None):
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE pages SET validated_at = ?,
+                    etag = COALESCE(?, etag),
+                    last_modified = COALESCE(?, last_modified)
+                WHERE url = ?
+                """,
+                (time.time(), etag, last_modified, key),
+            )
+            self._conn.commit()
+
+    def _revalidate(self, url: str, etag: str | None, last_modified: str | None):
+        """
+        Ask the origin whether the stored copy is still current.
+
+        Returns:
+            tuple: (still_valid, etag, last_modified) as reported by the origin.
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        response = httpx.head(
+            url, headers=headers, timeout=REVALIDATE_TIMEOUT, follow_redirects=True
+        )
+        new_etag = response.headers.get("etag")
+        new_last_modified = response.headers.get("last-modified")
+        if response.status_code == 304:
+            return True, new_etag, new_last_modified
+        unchanged = (etag and new_etag == etag) or (
+            last_modified and new_last_modified == last_modified
+        )
+        return bool(unchanged), new_etag, new_last_modified
+
+    def _serve_stale(self, url: str, row: tuple, now: float) -> tuple[str | None, str]:
+        """
+        Revalidate a stale entry.
+
+        Returns:
+            tuple: (content or None, the counter it falls under).
+        """
+        content, etag, last_modified, fetched_at, validated_at = row
+        try:
+            valid, new_etag, new_last_modified = self._revalidate(
+                url, etag, last_modified
+            )
+        except httpx.HTTPError:
+            # Origin unreachable: fall back to the stored copy while not too old.
+            if now - fetched_at <= self.max_stale:
+                return zlib.decompress(content).decode("utf-8"), "hits"
+            return None, "misses"
+
+        if valid:
+            self._touch(canonicalize_url(url), new_etag, new_last_modified)
+            return zlib.decompress(content).decode("utf-8"), "revalidated"
+        # The stored copy is outdated whether or not the page is re-extracted
+        self._drop(canonicalize_url(url), validated_at, new_etag, new_last_modified)
+        return None, "misses"
+
+    def get(self, url: str) -> str | None:
+        """
+        Return the stored Markdown for `url` if it is fresh or successfully revalidated.
+
+        Returns:
+            str | None: Cached content, or None when the page must be re-extracted.
+        """
+        return self.get_many([url])[0]
+
+    def get_many(self, urls: list[str]) -> list[str | None]:
+        """
+        Look up a batch of URLs, like `get`.
+
+        Stale entries are revalidated concurrently, at most
+        `REVALIDATE_CONCURRENCY` at a time.
+
+        Returns:
+            list: Cached content or None, in the order of `urls`.
+        """
+        contents: list[str | None] = [None] * len(urls)
+        stale = []
+        now = time.time()
+        for i, url in enumerate(urls):
+            row = self._row(canonicalize_url(url))
+            if row is None:
+                self.misses += 1
+            elif now - row[4] <= self.fresh_for:
+                self.hits += 1
+                contents[i] = zlib.decompress(row[0]).decode("utf-8")
+            elif not row[1] and not row[2]:
+                # Nothing to revalidate with: the page is re-extracted
+                self.misses += 1
+            else:
+                stale.append((i, url, row))
+        if not stale:
+            return contents
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(len(stale), REVALIDATE_CONCURRENCY))
+        ) as executor:
+            outcomes = executor.map(lambda item: self._serve_stale(item[1], item[2], now), stale)
+            for (i, _, _), (content, counter) in zip(stale, outcomes):
+                contents[i] = content
+                setattr(self, counter, getattr(self, counter) + 1)
+        return contents
+
+    def put(
+        self,
+        url: str,
+        content: str,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ):
+        """
+        Store extracted Markdown for `url`.
+
+        Without validators, those reported when the page was found changed, or
+        else the ones already stored, are kept.
+        """
+        key = canonicalize_url(url)
+        data = content.encode("utf-8")
+        now = time.time()
+        with self._lock:
+            pending_etag, pending_last_modified = self._pending.pop(key, (None, None))
+            if not etag and not last_modified:
+                etag, last_modified = pending_etag, pending_last_modified
+            self._conn.execute(
+                """
+                INSERT INTO pages
+                    (url, content, content_hash, etag, last_modified, fetched_at, validated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    content = excluded.content,
+                    content_hash = excluded.content_hash,
+                    etag = COALESCE(excluded.etag, pages.etag),
+                    last_modified = COALESCE(excluded.last_modified, pages.last_modified),
+                    fetched_at = excluded.fetched_at,
+                    validated_at = excluded.validated_at
+                """,
+                (
+                    key,
+                    zlib.compress(data),
+                    sha256(data).hexdigest(),
+                    etag,
+                    last_modified,
+                    now,
+                    now,
+                ),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        # Called with the lock held
+        self._conn.execute(
+            """
+            DELETE FROM pages WHERE validated_at < ?
+                OR (etag IS NULL AND last_modified IS NULL AND validated_at < ?)
+            """,
+            (now - self.max_stale, now - self.fresh_for),
+        )
+        (total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(content)), 0) FROM pages"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT url, LENGTH(content) FROM pages ORDER BY validated_at ASC"
+        ).fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM pages WHERE url = ?", doomed)
+
+    def stats(self) -> dict:
+        """Return hit/revalidation/miss counters and the size of the store."""
+        with self._lock:
+            entries, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(content)), 0) FROM pages"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "entries": entries,
+            "compressed_bytes": stored,
+        }
+
+
+_page_cache: PageCache | None = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache | None:
+    """Return the process-wide page cache, or None when `PAGE_CACHE_ENABLED=False`."""
+    global _page_cache
+    if not PAGE_CACHE_ENABLED:
+        return None
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = PageCache()
+        return _page_cache
+
+
+def split_cached(urls: list[str], format: str = "markdown") -> tuple[list[dict], list[str]]:
+    """
+    Serve what we can of a batch from the page cache.
+
+    Args:
+        urls: URLs requested by the caller.
+        format: Output format of the backend; only Markdown pages are cached.
+
+    Returns:
+        tuple: (cached results in the backends' `results` shape, URLs still to fetch).
+    """
+    page_cache = get_page_cache()
+    if page_cache is None or format != "markdown":
+        return [], list(urls)
+    cached, missing = [], []
+    for url, content in zip(urls, page_cache.get_many(urls)):
+        if content is None:
+            missing.append(url)
+        else:
+            cached.append({"url": url, "raw_content": content})
+    record_cache_lookup(hits=len(cached), misses=len(missing))
+    return cached, missing
+
+
+def store_results(results: list[dict], format: str = "markdown", headers: dict | None = None):
+    """
+    Store freshly extracted pages.
+
+    Args:
+        results: Items in the backends' `results` shape (`url`, `raw_content`).
+        format: Output format of the backend; only Markdown pages are cached.
+        headers: Optional mapping of URL to response headers carrying validators.
+    """
+    page_cache = get_page_cache()
+    if page_cache is None or format != "markdown":
+        return
+    headers = headers or {}
+    for item in results:
+        content = item.get("raw_content")
+        if not content:
+            continue
+        response_headers = {
+            k.lower(): v for k, v in (headers.get(item["url"]) or {}).items()
+        }
+        page_cache.put(
+            item["url"],
+            content,
+            etag=response_headers.get("etag"),
+            last_modified=response_headers.get("last-modified"),
+        )
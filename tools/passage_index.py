@@ -0,0 +1,301 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from hashlib import sha256
+
+from dotenv import load_dotenv
+
+from config import SANDBOX_DIR
+
+from .page_cache import canonicalize_url
+
+load_dotenv()
+
+PASSAGE_INDEX_ENABLED = os.getenv("PASSAGE_INDEX_ENABLED", "True").lower() == "true"
+PASSAGE_INDEX_PATH = os.getenv(
+    "PASSAGE_INDEX_PATH", os.path.join(SANDBOX_DIR, ".index", "passages.sqlite")
+)
+# Target passage length in characters, and the longest summary `crawl_url` returns
+PASSAGE_CHARS = int(os.getenv("PASSAGE_CHARS", "1200"))
+SUMMARY_CHARS = int(os.getenv("PASSAGE_SUMMARY_CHARS", "400"))
+MAX_SEARCH_RESULTS = 20
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+
+
+def chunk_markdown(text: str, max_chars: int = PASSAGE_CHARS) -> list[tuple[str, str]]:
+    """
+    Split a Markdown page into passages of about `max_chars` characters.
+
+    Passages break on blank lines and never span a heading, so each one can be
+    labelled with the section it comes from. Oversized paragraphs are cut.
+
+    Returns:
+        list: (heading, passage text) pairs in page order.
+    """
+    passages: list[tuple[str, str]] = []
+    heading, blocks, size = "", [], 0
+
+    def flush():
+        nonlocal blocks, size
+        if blocks:
+            passages.append((heading, "\n\n".join(blocks)))
+        blocks, size = [], 0
+
+    for block in re.split(r"\n\s*\n", text):
+        block = block.strip()
+        if not block:
+            continue
+        match = _HEADING.match(block.splitlines()[0])
+        if match:
+            # The heading is indexed as the passages' label, not as body text
+            flush()
+            heading = match.group(2)
+            block = block[match.end() :].strip()
+            if not block:
+                continue
+        while len(block) > max_chars:
+            flush()
+            cut = block.rfind(" ", 0, max_chars)
+            cut = cut if cut > max_chars // 2 else max_chars
+            passages.append((heading, block[:cut].strip()))
+            block = block[cut:].strip()
+        if size + len(block) > max_chars:
+            flush()
+        blocks.append(block)
+        size += len(block) + 2
+    flush()
+    return passages
+
+
+def summarize_page(text: str, passages: list[tuple[str, str]]) -> dict:
+    """Return a page's title, its first paragraph (truncated) and its section headings."""
+    title, lede = "", ""
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        match = _HEADING.match(line)
+        if match and not title:
+            title = match.group(2)
+        elif not match and not lede and len(line) > 40:
+            lede = line
+        if title and lede:
+            break
+    if len(lede) > SUMMARY_CHARS:
+        lede = lede[:SUMMARY_CHARS].rsplit(" ", 1)[0] + " ..."
+    headings = list(dict.fromkeys(h for h, _ in passages if h))
+    return {"title": title[:200], "summary": lede, "sections": headings[:10]}
+
+
+def _match_query(query: str) -> str:
+    """Turn free text into an FTS5 query matching any of its words (ranked by BM25)."""
+    tokens = re.findall(r"\w+", query.lower())
+    return " OR ".join(f'"{token}"' for token in dict.fromkeys(tokens))
+
+
+class PassageIndex:
+    """
+    A local full-text index of crawled pages, split into passages and ranked with BM25.
+
+    Pages are stored by canonical URL and re-indexed only when their content
+    changes. The database lives in the sandbox, so clearing the sandbox clears
+    the index too; it is recreated on next use.
+
+    Args:
+        path (str): Location of the SQLite database file.
+        max_chars (int): Target passage length in characters.
+    """
+
+    def __init__(self, path: str = PASSAGE_INDEX_PATH, max_chars: int = PASSAGE_CHARS):
+        self.path = path
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Reopen if the sandbox (and with it the database file) was cleared
+        if self._conn is not None and (
+            self.path == ":memory:" or os.path.exists(self.path)
+        ):
+            return self._conn
+        if self._conn is not None:
+            self._conn.close()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                title TEXT NOT NULL,
+                chars INTEGER NOT NULL,
+                passages INTEGER NOT NULL,
+                indexed_at REAL NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5(
+                heading, body, url UNINDEXED, tokenize = 'porter unicode61'
+            );
+            """
+        )
+        self._conn.commit()
+        return self._conn
+
+    def add_page(self, url: str, content: str) -> dict:
+        """
+        Index a page, replacing any earlier version of it.
+
+        Returns:
+            dict: A short handle for the page: url, title, summary, sections,
+                chars and passages.
+        """
+        key = canonicalize_url(url)
+        passages = chunk_markdown(content, self.max_chars)
+        handle = {"url": url, **summarize_page(content, passages)}
+        handle.update(chars=len(content), passages=len(passages))
+        content_hash = sha256(content.encode("utf-8")).hexdigest()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT content_hash FROM pages WHERE url = ?", (key,)
+            ).fetchone()
+            if row is not None and row[0] == content_hash:
+                return handle
+            conn.execute("DELETE FROM passages WHERE url = ?", (key,))
+            conn.executemany(
+                "INSERT INTO passages (heading, body, url) VALUES (?, ?, ?)",
+                [(heading, body, key) for heading, body in passages],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    content_hash,
+                    handle["title"],
+                    len(content),
+                    len(passages),
+                    time.time(),
+                ),
+            )
+            conn.commit()
+        return handle
+
+    def search(self, query: str, k: int = 5, url: str | None = None) -> list[dict]:
+        """
+        Return the `k` passages that best match `query`, best first.
+
+        Args:
+            query: Free-text query.
+            k: Number of passages to return (at most 20).
+            url: Only search passages of this page.
+
+        Returns:
+            list: Dicts with 'url', 'heading', 'passage' and 'score' (higher is better).
+        """
+        match = _match_query(query)
+        if not match:
+            return []
+        sql = (
+            "SELECT url, heading, body, bm25(passages, 2.0, 1.0) AS rank "
+            "FROM passages WHERE passages MATCH ?"
+        )
+        params: list = [match]
+        if url:
+            sql += " AND url = ?"
+            params.append(canonicalize_url(url))
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(max(1, min(k, MAX_SEARCH_RESULTS)))
+        with self._lock:
+            rows = self._connection().execute(sql, params).fetchall()
+        return [
+            {"url": u, "heading": heading, "passage": body, "score": round(-rank, 3)}
+            for u, heading, body, rank in rows
+        ]
+
+    def stats(self) -> dict:
+        """Return the number of indexed pages and passages, and the characters they hold."""
+        with self._lock:
+            pages, passages, chars = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(passages), 0), COALESCE(SUM(chars), 0) "
+                "FROM pages"
+            ).fetchone()
+        return {"pages": pages, "passages": passages, "chars": chars}
+
+
+_passage_index: PassageIndex | None = None
+_passage_index_lock = threading.Lock()
+
+
+def get_passage_index() -> PassageIndex | None:
+    """Return the process-wide passage index, or None when `PASSAGE_INDEX_ENABLED=false`."""
+    global _passage_index
+    if not PASSAGE_INDEX_ENABLED:
+        return None
+    with _passage_index_lock:
+        if _passage_index is None:
+            _passage_index = PassageIndex()
+        return _passage_index
+
+
+def index_results(response: dict, full_content: bool = False) -> dict:
+    """
+    Index the pages of a `crawl_url` response and, unless `full_content`, replace
+    each page body with a short handle so the response stays small.
+
+    Args:
+        response: A backend response with 'results' items (`url`, `raw_content`).
+        full_content: Keep the raw page bodies in the response.
+
+    Returns:
+        dict: The response, with handles instead of bodies when summarized.
+    """
+    passage_index = get_passage_index()
+    if passage_index is None:
+        return response
+    results = []
+    for item in response.get("results", []):
+        content = item.get("raw_content")
+        if not content:
+            results.append(item)
+            continue
+        try:
+            handle = passage_index.add_page(item["url"], content)
+        except sqlite3.Error as e:
+            print(f"Failed to index {item['url']}: {e}")
+            results.append(item)
+            continue
+        results.append(item if full_content else handle)
+    response["results"] = results
+    if not full_content and results:
+        response["note"] = (
+            "Page bodies are indexed, not returned. Use search_crawled(query) "
+            "to read the passages relevant to your question."
+        )
+    return response
+
+
+def search_crawled(query: str, k: int = 5, url: str | None = None) -> dict:
+    """
+    Search the pages crawled so far and return only the most relevant passages.
+
+    Args:
+        query: What you are looking for, in plain words.
+        k: Number of passages to return (at most 20).
+        url: Optionally restrict the search to one crawled page.
+
+    Returns:
+        Dictionary with ranked 'results' (url, heading, passage, score).
+    """
+    passage_index = get_passage_index()
+    if passage_index is None:
+        return {"results": [], "error": "The passage index is disabled."}
+    return {"results": passage_index.search(query, k=k, url=url)}
+
+
+async def asearch_crawled(query: str, k: int = 5, url: str | None = None) -> dict:
+    """Async version of `search_crawled`."""
+    return await asyncio.to_thread(search_crawled, query, k, url)
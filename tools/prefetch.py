@@ -0,0 +1,286 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+
+from .page_cache import canonicalize_url, split_cached
+from .registry import record_cache_lookup
+
+load_dotenv()
+
+# Speculative prefetch: when a search returns, its top PREFETCH_TOP_K result
+# pages are extracted in the background, so the crawl_url call that usually
+# follows finds them ready; the backends also write them to the page cache.
+# Off by default: pages the agent never reads cost extraction credits and
+# bandwidth (reported as wasted bytes).
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "False").lower() == "true"
+PREFETCH_TOP_K = int(os.getenv("PREFETCH_TOP_K", "3"))
+# Seconds a prefetched page is kept for crawl_url before it is dropped as wasted
+PREFETCH_TTL = float(os.getenv("PREFETCH_TTL", "300"))
+# Prefetch batches (one per search) extracting at once, and waiting; beyond
+# that the oldest waiting batch is cancelled
+PREFETCH_MAX_IN_FLIGHT = int(os.getenv("PREFETCH_MAX_IN_FLIGHT", "2"))
+PREFETCH_MAX_PENDING = int(os.getenv("PREFETCH_MAX_PENDING", "4"))
+# Bytes of unclaimed pages kept; the oldest are dropped first
+PREFETCH_MAX_BYTES = int(os.getenv("PREFETCH_MAX_BYTES", str(32 * 1024**2)))
+# Seconds crawl_url waits for a page whose prefetch is still running
+PREFETCH_WAIT_TIMEOUT = float(os.getenv("PREFETCH_WAIT_TIMEOUT", "30"))
+
+USE_CRAWL4AI = os.getenv("USE_CRAWL4AI", "False").lower() == "true"
+
+
+def _fetch_pages(urls: list[str]) -> dict:
+    # Imported here: the backends import this module
+    if USE_CRAWL4AI:
+        from .web_crawler import prefetch_pages
+    else:
+        from .web_search import prefetch_pages
+    return prefetch_pages(urls)
+
+
+@dataclass
+class _Entry:
+    url: str
+    future: Future
+    created: float
+
+
+def _page_size(page: dict | None) -> int:
+    return len(((page or {}).get("raw_content") or "").encode("utf-8"))
+
+
+class Prefetcher:
+    """
+    Extract likely next pages in the background and hand them to `crawl_url`.
+
+    Each `schedule` call queues one extraction batch on a small thread pool.
+    Pages wait in memory, keyed by canonical URL, until `take` claims them or
+    they expire. Unclaimed pages count as wasted bytes.
+
+    Args:
+        fetch (callable): Extracts a list of URLs into a backend response
+            (`results` with `url` and `raw_content`).
+        top_k (int): Result URLs prefetched per search.
+        ttl (float): Seconds a page is kept.
+        max_in_flight (int): Batches extracting at once.
+        max_pending (int): Batches allowed to wait; older ones are cancelled.
+        max_bytes (int): Bytes of unclaimed pages kept.
+    """
+
+    def __init__(
+        self,
+        fetch=_fetch_pages,
+        top_k: int = PREFETCH_TOP_K,
+        ttl: float = PREFETCH_TTL,
+        max_in_flight: int = PREFETCH_MAX_IN_FLIGHT,
+        max_pending: int = PREFETCH_MAX_PENDING,
+        max_bytes: int = PREFETCH_MAX_BYTES,
+    ):
+        self.fetch = fetch
+        self.top_k = top_k
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_in_flight), thread_name_prefix="prefetch"
+        )
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._batches: list[tuple[Future, list[str]]] = []
+        self._lock = threading.Lock()
+        self.scheduled = 0
+        self.fetched = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self.failures = 0
+        self.used_bytes = 0
+        self.wasted_bytes = 0
+
+    def _run(self, urls: list[str]) -> dict[str, dict]:
+        # Queued batches are skipped once the interpreter is shutting down
+        if not threading.main_thread().is_alive():
+            return {}
+        # Pages already on disk are served by the page cache; not fetched again
+        _, missing = split_cached(urls)
+        if not missing:
+            return {}
+        try:
+            response = self.fetch(missing)
+        except Exception as e:
+            self.failures += 1
+            print(f"Prefetch of {len(missing)} pages failed: {e}")
+            return {}
+        pages = {
+            canonicalize_url(item["url"]): item
+            for item in response.get("results", [])
+            if item.get("url") and item.get("raw_content")
+        }
+        self.fetched += len(pages)
+        return pages
+
+    def schedule(self, urls: list[str]):
+        """Start prefetching the first `top_k` URLs not already prefetched; returns at once."""
+        with self._lock:
+            self._expire()
+            keys, batch = set(), []
+            for url in urls:
+                key = canonicalize_url(url)
+                if key in self._entries or key in keys:
+                    continue
+                keys.add(key)
+                batch.append(url)
+                if len(batch) >= self.top_k:
+                    break
+            if not batch:
+                return
+            future = self._executor.submit(self._run, batch)
+            now = time.monotonic()
+            for url in batch:
+                self._entries[canonicalize_url(url)] = _Entry(url, future, now)
+            self._batches.append((future, batch))
+            self.scheduled += len(batch)
+            # Bounded backlog: the oldest batches still waiting give way
+            waiting = [item for item in self._batches if not item[0].running() and not item[0].done()]
+            for old_future, old_batch in waiting[: max(0, len(waiting) - self.max_pending)]:
+                if old_future.cancel():
+                    self.cancelled += len(old_batch)
+                    for url in old_batch:
+                        self._entries.pop(canonicalize_url(url), None)
+            self._batches = [item for item in self._batches if not item[0].done()]
+
+    def _expire(self):
+        # Called with the lock held
+        now = time.monotonic()
+        kept_bytes = 0
+        # Newest first, so the byte budget drops the oldest pages
+        for key, entry in reversed(list(self._entries.items())):
+            future = entry.future
+            expired = now - entry.created > self.ttl
+            if not future.done():
+                if expired:
+                    future.cancel()
+                if not future.done():
+                    continue
+            if future.cancelled():
+                self.cancelled += 1
+                del self._entries[key]
+                continue
+            page = None if future.exception() is not None else future.result().get(key)
+            size = _page_size(page)
+            if expired or page is None or kept_bytes + size > self.max_bytes:
+                self.wasted_bytes += size
+                del self._entries[key]
+            else:
+                kept_bytes += size
+
+    def take(self, urls: list[str]) -> tuple[list[dict], list[str]]:
+        """
+        Claim prefetched pages, waiting for extractions still in progress.
+
+        Returns:
+            tuple: (pages in the backends' `results` shape, URLs still to fetch).
+        """
+        with self._lock:
+            self._expire()
+            claimed = [(url, self._entries.pop(canonicalize_url(url), None)) for url in urls]
+        pages, missing = [], []
+        for url, entry in claimed:
+            page = None
+            if entry is not None:
+                try:
+                    page = entry.future.result(PREFETCH_WAIT_TIMEOUT).get(canonicalize_url(url))
+                except Exception:
+                    # Cancelled, failed or too slow: crawl_url fetches it itself
+                    page = None
+            if page is None:
+                missing.append(url)
+                continue
+            pages.append({**page, "url": url})
+            self.used_bytes += _page_size(page)
+        self.hits += len(pages)
+        self.misses += len(missing)
+        record_cache_lookup(hits=len(pages), misses=len(missing))
+        return pages, missing
+
+    def stats(self) -> dict:
+        """Return prefetch counters: hit rate of crawled pages, and bytes used and wasted."""
+        with self._lock:
+            self._expire()
+            entries = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "scheduled": self.scheduled,
+            "fetched": self.fetched,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "used_bytes": self.used_bytes,
+            "wasted_bytes": self.wasted_bytes,
+            "cancelled": self.cancelled,
+            "failures": self.failures,
+            "pending": entries,
+        }
+
+
+_prefetcher: Prefetcher | None = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Prefetcher | None:
+    """Return the process-wide prefetcher, or None unless `PREFETCH_ENABLED=true`."""
+    global _prefetcher
+    if not PREFETCH_ENABLED:
+        return None
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher()
+        return _prefetcher
+
+
+def prefetch_results(response: dict):
+    """Prefetch the top result pages of a search response, skipping collapsed duplicates."""
+    prefetcher = get_prefetcher()
+    if prefetcher is None:
+        return
+    prefetcher.schedule(
+        [
+            item["url"]
+            for item in response.get("results", [])
+            if item.get("url") and "duplicate_of" not in item
+        ]
+    )
+
+
+def take_prefetched(urls: list[str], format: str = "markdown") -> tuple[list[dict], list[str]]:
+    """
+    Claim the prefetched pages among `urls` for `crawl_url`.
+
+    Called before the page cache is consulted: a finished prefetch has also
+    written its pages there, and claiming them here keeps them from counting
+    as wasted prefetches.
+
+    Args:
+        urls: URLs requested by `crawl_url`.
+        format: Output format of the backend; only Markdown pages are prefetched.
+
+    Returns:
+        tuple: (prefetched pages in the backends' `results` shape, URLs still to fetch).
+    """
+    prefetcher = get_prefetcher()
+    if prefetcher is None or format != "markdown" or not urls:
+        return [], list(urls)
+    return prefetcher.take(urls)
+
+
+def format_prefetch_stats(stats: dict) -> str:
+    """Render `Prefetcher.stats` as one line."""
+    return (
+        f"Prefetch: {stats['hits']} of {stats['hits'] + stats['misses']} crawled pages "
+        f"ready ({stats['hit_rate']:.0%}), {stats['fetched']}/{stats['scheduled']} pages fetched, "
+        f"{stats['used_bytes'] / 1024:.0f} KB used, {stats['wasted_bytes'] / 1024:.0f} KB wasted, "
+        f"{stats['cancelled']} cancelled, {stats['pending']} pending"
+    )
@@ -0,0 +1,105 @@
+import asyncio
+import functools
+import importlib
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable
+
+from langchain_core.tools import StructuredTool
+
+# Seconds spent importing each heavy tool module, recorded on first invocation.
+load_times: dict[str, float] = {}
+_load_lock = threading.Lock()
+
+# Cache hits and misses of the tool call running in the current context. A
+# tracer opens a counter when a call starts; the caches report into it.
+_cache_lookups: ContextVar[dict | None] = ContextVar("cache_lookups", default=None)
+
+
+def track_cache_lookups() -> dict:
+    """Start counting cache lookups made in the current context and return the counter."""
+    counts = {"hits": 0, "misses": 0}
+    _cache_lookups.set(counts)
+    return counts
+
+
+def record_cache_lookup(hits: int = 0, misses: int = 0):
+    """Count cache hits and misses towards the traced call in progress, if any."""
+    counts = _cache_lookups.get()
+    if counts is not None:
+        counts["hits"] += hits
+        counts["misses"] += misses
+
+
+# Seconds queued and retries spent on upstream APIs (Tavily, the LLM endpoints)
+# by the traced call in the current context, reported by the governors.
+_upstream_calls: ContextVar[dict | None] = ContextVar("upstream_calls", default=None)
+
+
+def track_upstream_calls() -> dict:
+    """Start counting upstream queue time and retries in the current context and return the counter."""
+    counts = {"queue_wait_s": 0.0, "retries": 0}
+    _upstream_calls.set(counts)
+    return counts
+
+
+def record_upstream_call(queue_wait_s: float = 0.0, retries: int = 0):
+    """Count an upstream request's queue time and retries towards the traced call in progress, if any."""
+    counts = _upstream_calls.get()
+    if counts is not None:
+        counts["queue_wait_s"] += queue_wait_s
+        counts["retries"] += retries
+
+
+def load_module(module: str):
+    """Import a tool module (relative to this package) once, recording how long it took."""
+    name = f"{__package__}.{module}"
+    with _load_lock:
+        if name not in load_times:
+            started = time.perf_counter()
+            importlib.import_module(name)
+            load_times[name] = time.perf_counter() - started
+    return importlib.import_module(name)
+
+
+def lazy_tool(
+    module: str,
+    attr: str | None = None,
+    async_attr: str | None = None,
+) -> Callable[[Callable], StructuredTool]:
+    """
+    Turn a light stub into a tool whose implementation is imported on first call.
+
+    The stub only provides the name, signature and docstring the agent sees;
+    its body is never run. Calls are forwarded to `module.attr` (and
+    `module.async_attr` when awaited), importing `module` the first time.
+
+    Example:
+        @lazy_tool("synbolic_math")
+        def calculate(expression: str) -> str:
+            \"\"\"Evaluate a math expression.\"\"\"
+    """
+
+    def decorator(stub: Callable) -> StructuredTool:
+        name = attr or stub.__name__
+
+        @functools.wraps(stub)
+        def func(*args, **kwargs):
+            return getattr(load_module(module), name)(*args, **kwargs)
+
+        coroutine = None
+        if async_attr is not None:
+
+            @functools.wraps(stub)
+            async def coroutine(*args, **kwargs):
+                # Keep a first-time import from stalling the event loop
+                loaded = await asyncio.to_thread(load_module, module)
+                implementation = getattr(loaded, async_attr)
+                return await implementation(*args, **kwargs)
+
+        return StructuredTool.from_function(
+            func=func, coroutine=coroutine, name=stub.__name__
+        )
+
+    return decorator
@@ -0,0 +1,261 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from config import SANDBOX_DIR
+
+load_dotenv()
+
+SANDBOX_INDEX_PATH = os.getenv(
+    "SANDBOX_INDEX_PATH", os.path.join(SANDBOX_DIR, ".index", "files.sqlite")
+)
+# Files larger than this are listed but not indexed
+SANDBOX_INDEX_MAX_FILE_BYTES = int(
+    os.getenv("SANDBOX_INDEX_MAX_FILE_BYTES", str(5 * 1024**2))
+)
+# Minimum seconds between two scans of the sandbox for changed files
+SANDBOX_INDEX_REFRESH_INTERVAL = float(
+    os.getenv("SANDBOX_INDEX_REFRESH_INTERVAL", "2")
+)
+CHUNK_LINES = 40
+MAX_SEARCH_RESULTS = 50
+
+
+def _match_query(query: str) -> str:
+    tokens = re.findall(r"\w+", query.lower())
+    return " OR ".join(f'"{token}"' for token in dict.fromkeys(tokens))
+
+
+def _read_text(path: str) -> str | None:
+    """Return a file's text, or None if it looks binary or is not UTF-8."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if b"\x00" in data[:4096]:
+        return None
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+class SandboxIndex:
+    """
+    A persistent full-text index over the files in the agent's sandbox.
+
+    Each `refresh` stats the sandbox and re-indexes only files whose mtime or
+    size changed, so keeping the index current costs one directory walk rather
+    than reading every file. Dot-directories (such as `.index` itself) are skipped.
+
+    Args:
+        root (str): Sandbox directory to index.
+        path (str): Location of the SQLite database file.
+        refresh_interval (float): Minimum seconds between two scans.
+    """
+
+    def __init__(
+        self,
+        root: str = SANDBOX_DIR,
+        path: str = SANDBOX_INDEX_PATH,
+        refresh_interval: float = SANDBOX_INDEX_REFRESH_INTERVAL,
+    ):
+        self.root = root
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._last_refresh = 0.0
+        # Snapshot of the file listing, dropped whenever a scan finds a change
+        self._files: list[str] | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Reopen if the sandbox (and with it the database file) was cleared
+        if self._conn is not None and os.path.exists(self.path):
+            return self._conn
+        if self._conn is not None:
+            self._conn.close()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                indexed INTEGER NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+                body, path UNINDEXED, line UNINDEXED, tokenize = 'porter unicode61'
+            );
+            """
+        )
+        self._conn.commit()
+        self._last_refresh = 0.0
+        self._files = None
+        return self._conn
+
+    def _scan(self) -> dict[str, os.stat_result]:
+        """Stat every file under the root, keyed by its sandbox-relative POSIX path."""
+        found = {}
+        stack = [self.root]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    rel = os.path.relpath(entry.path, self.root).replace(os.sep, "/")
+                    found[rel] = entry.stat()
+        return found
+
+    def _index_file(self, conn: sqlite3.Connection, rel: str, st: os.stat_result):
+        conn.execute("DELETE FROM chunks WHERE path = ?", (rel,))
+        text = None
+        if st.st_size <= SANDBOX_INDEX_MAX_FILE_BYTES:
+            try:
+                text = _read_text(os.path.join(self.root, rel))
+            except OSError:
+                text = None
+        if text:
+            lines = text.splitlines()
+            conn.executemany(
+                "INSERT INTO chunks (body, path, line) VALUES (?, ?, ?)",
+                [
+                    ("\n".join(lines[start : start + CHUNK_LINES]), rel, start + 1)
+                    for start in range(0, len(lines), CHUNK_LINES)
+                ],
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+            (rel, st.st_mtime_ns, st.st_size, int(text is not None)),
+        )
+
+    def refresh(self, force: bool = False) -> dict:
+        """
+        Bring the index up to date with the sandbox.
+
+        Args:
+            force: Scan even if the last scan was less than `refresh_interval` ago.
+
+        Returns:
+            dict: Numbers of files 'added', 'updated' and 'removed' by this refresh.
+        """
+        changes = {"added": 0, "updated": 0, "removed": 0}
+        with self._lock:
+            conn = self._connection()
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.refresh_interval:
+                return changes
+            known = {
+                path: (mtime_ns, size)
+                for path, mtime_ns, size in conn.execute(
+                    "SELECT path, mtime_ns, size FROM files"
+                )
+            }
+            found = self._scan()
+            for rel, st in found.items():
+                previous = known.get(rel)
+                if previous == (st.st_mtime_ns, st.st_size):
+                    continue
+                self._index_file(conn, rel, st)
+                changes["added" if previous is None else "updated"] += 1
+            for rel in known.keys() - found.keys():
+                conn.execute("DELETE FROM chunks WHERE path = ?", (rel,))
+                conn.execute("DELETE FROM files WHERE path = ?", (rel,))
+                changes["removed"] += 1
+            conn.commit()
+            self._last_refresh = time.monotonic()
+            if any(changes.values()):
+                self._files = None
+        return changes
+
+    def list_files(self) -> list[str]:
+        """
+        Return the sandbox-relative paths of all files, sorted.
+
+        The listing is served from an in-memory snapshot until a scan (at most
+        one per `refresh_interval`) sees a file added, changed or removed.
+        """
+        self.refresh()
+        with self._lock:
+            if self._files is None:
+                rows = self._connection().execute(
+                    "SELECT path FROM files ORDER BY path"
+                )
+                self._files = [path for (path,) in rows]
+            return list(self._files)
+
+    def search(self, query: str, k: int = 10) -> list[dict]:
+        """
+        Return the file passages that best match `query`, best first.
+
+        Args:
+            query: Free-text query.
+            k: Number of matches to return (at most 50).
+
+        Returns:
+            list: Dicts with 'path', 'line' (first line of the passage),
+                'snippet' (matched terms in **bold**) and 'score' (higher is better).
+        """
+        match = _match_query(query)
+        if not match:
+            return []
+        self.refresh()
+        with self._lock:
+            rows = self._connection().execute(
+                """
+                SELECT path, line, snippet(chunks, 0, '**', '**', ' … ', 24), bm25(chunks)
+                FROM chunks WHERE chunks MATCH ? ORDER BY bm25(chunks) LIMIT ?
+                """,
+                (match, max(1, min(k, MAX_SEARCH_RESULTS))),
+            ).fetchall()
+        return [
+            {"path": path, "line": line, "snippet": snippet, "score": round(-rank, 3)}
+            for path, line, snippet, rank in rows
+        ]
+
+
+_sandbox_index: SandboxIndex | None = None
+_sandbox_index_lock = threading.Lock()
+
+
+def get_sandbox_index() -> SandboxIndex:
+    """Return the process-wide sandbox index."""
+    global _sandbox_index
+    with _sandbox_index_lock:
+        if _sandbox_index is None:
+            _sandbox_index = SandboxIndex()
+        return _sandbox_index
+
+
+def search_files(query: str, k: int = 10) -> dict:
+    """
+    Full-text search over the files in your workspace (notes, reports, uploads).
+
+    Args:
+        query: What you are looking for, in plain words.
+        k: Number of matches to return (at most 50).
+
+    Returns:
+        Dictionary with ranked 'results' (path, line, snippet, score); read a
+        match with read_file starting at its line.
+    """
+    results = get_sandbox_index().search(query, k=k)
+    for result in results:
+        # The agent's filesystem tools address sandbox files from "/"
+        result["path"] = "/" + result["path"]
+    return {"results": results}
+
+
+async def asearch_files(query: str, k: int = 10) -> dict:
+    """Async version of `search_files`."""
+    return await asyncio.to_thread(search_files, query, k)
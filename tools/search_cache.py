@@ -0,0 +1,197 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from hashlib import sha256
+
+from dotenv import load_dotenv
+
+from config import CACHE_DIR
+
+load_dotenv()
+
+# "readwrite" caches live results, "replay" serves only recorded results
+# (no network, entries never expire), "off" disables the cache.
+SEARCH_CACHE_MODE = os.getenv("SEARCH_CACHE_MODE", "readwrite").lower()
+SEARCH_CACHE_PATH = os.getenv(
+    "SEARCH_CACHE_PATH", os.path.join(CACHE_DIR, "search_cache.sqlite")
+)
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(24 * 3600)))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "5000"))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(200 * 1024**2)))
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a search query so trivially reformatted queries share a cache entry.
+
+    Case, punctuation and repeated whitespace are ignored, word order is not:
+    "Rust vs. Go?" and "rust  VS go" share a key, "go vs rust" does not.
+    """
+    query = unicodedata.normalize("NFKC", query).lower()
+    return " ".join(re.findall(r"\w+", query))
+
+
+class SearchCache:
+    """
+    SQLite-backed cache of search responses with per-entry TTL and LRU eviction.
+
+    Args:
+        path (str): Location of the SQLite database file.
+        ttl (float): Default time-to-live of an entry, in seconds.
+        max_entries (int): Entries kept before least-recently-used ones are evicted.
+        max_bytes (int): Total payload size kept before LRU eviction.
+        replay (bool): Serve recorded entries only, ignoring their expiry.
+    """
+
+    def __init__(
+        self,
+        path: str = SEARCH_CACHE_PATH,
+        ttl: float = SEARCH_CACHE_TTL,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+        max_bytes: int = SEARCH_CACHE_MAX_BYTES,
+        replay: bool = False,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS search_cache (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                max_results INTEGER NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS search_cache_lru
+                ON search_cache (last_access);
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(query: str, max_results: int) -> str:
+        """Build the cache key from the normalized query and `max_results`."""
+        raw = f"{normalize_query(query)}\x00{max_results}"
+        return sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, query: str, max_results: int) -> dict | None:
+        """Return the cached response, or None on a miss or an expired entry."""
+        key = self.make_key(query, max_results)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, expires_at FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (not self.replay and row[1] < now):
+                self.misses += 1
+                return None
+            if not self.replay:
+                self._conn.execute(
+                    "UPDATE search_cache SET last_access = ? WHERE key = ?", (now, key)
+                )
+                self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(
+        self, query: str, max_results: int, response: dict, ttl: float | None = None
+    ):
+        """Store a response, then evict least-recently-used entries over the size limits."""
+        if self.replay:
+            return
+        payload = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO search_cache
+                    (key, query, max_results, response, size, created_at, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    self.make_key(query, max_results),
+                    query,
+                    max_results,
+                    payload,
+                    len(payload.encode("utf-8")),
+                    now,
+                    expires_at,
+                    now,
+                ),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM search_cache WHERE expires_at < ?", (now,))
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM search_cache"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM search_cache ORDER BY last_access ASC"
+        ).fetchall()
+        doomed = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM search_cache WHERE key = ?", doomed)
+
+    def clear(self):
+        """Drop every cached entry and reset the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache")
+            self._conn.commit()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size of the store."""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM search_cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
+
+
+_search_cache: SearchCache | None = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache | None:
+    """Return the process-wide search cache, or None when `SEARCH_CACHE_MODE=off`."""
+    global _search_cache
+    if SEARCH_CACHE_MODE == "off":
+        return None
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache(replay=SEARCH_CACHE_MODE == "replay")
+        return _search_cache
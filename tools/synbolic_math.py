@@ -1,9 +1,21 @@
-from sympy import *
-import re
+from functools import lru_cache
+import os
 
+import numpy as np
+from dotenv import load_dotenv
+from sympy import Matrix, diff, integrate, lambdify, simplify, solve, symbols
+from sympy.parsing.sympy_parser import parse_expr
 
-# Enable pretty printing (optional, for debugging)
-init_printing(use_unicode=True)
+from .numeric import NotNumeric, evaluate_numeric, format_result, prepare_expression
+from .numeric import preprocess_math  # noqa: F401 (exposed as a tool)
+
+load_dotenv()
+
+# Number of parsed and simplified `calculate` expressions kept per process
+MATH_PARSE_CACHE_SIZE = int(os.getenv("MATH_PARSE_CACHE_SIZE", "512"))
+# Largest grid `evaluate_expression_grid` evaluates, and most table rows it returns
+MATH_GRID_MAX_POINTS = int(os.getenv("MATH_GRID_MAX_POINTS", "1000000"))
+MATH_GRID_MAX_ROWS = int(os.getenv("MATH_GRID_MAX_ROWS", "200"))
 
 
 def solve_equation(equation: str) -> str:
@@ -48,12 +60,63 @@ def integrate_expression(expression: str, variable: str = "x") -> str:
         return f"Error: {str(e)}"
 
 
-def matrix_operation(matrix_a: list, operation: str, matrix_b: list = None) -> str:
+def _as_float_array(rows) -> np.ndarray | None:
+    """Return `rows` as a 2-D float array if every entry is a plain number, else None."""
+    if not isinstance(rows, list) or not rows:
+        return None
+    if not all(isinstance(row, list) and len(row) == len(rows[0]) for row in rows):
+        return None
+    for row in rows:
+        for value in row:
+            if type(value) not in (int, float):
+                return None
+            # Beyond 2**53 floats no longer hold integers exactly
+            if type(value) is int and abs(value) > 2**53:
+                return None
+    array = np.array(rows, dtype=float)
+    return array if array.size and np.isfinite(array).all() else None
+
+
+def _format_matrix(array: np.ndarray) -> str:
+    rows = ", ".join(
+        "[" + ", ".join(format_result(value) for value in row) + "]" for row in array
+    )
+    return f"Matrix([{rows}])"
+
+
+def _numeric_matrix_operation(A: np.ndarray, operation: str, B) -> str | None:
+    if operation == "determinant":
+        return format_result(np.linalg.det(A))
+    elif operation == "inverse":
+        # Leave (nearly) singular matrices to SymPy's exact check
+        if A.shape[0] == A.shape[1] and np.linalg.cond(A) > 1 / np.finfo(float).eps:
+            return None
+        return _format_matrix(np.linalg.inv(A))
+    elif operation == "transpose":
+        return _format_matrix(A.T)
+    elif operation == "multiply" and B is not None:
+        return _format_matrix(A @ B)
+    return None
+
+
+def matrix_operation(
+    matrix_a: list, operation: str, matrix_b: list = None, exact: bool = False
+) -> str:
     """
     Perform matrix operations: 'determinant', 'inverse', 'transpose', 'multiply'
     matrix_a and matrix_b are list of lists, e.g., [[1,2],[3,4]]
+    Numeric matrices are computed in floating point; set exact=True for exact
+    (fractional/symbolic) results.
     """
     try:
+        if not exact:
+            A = _as_float_array(matrix_a)
+            B = _as_float_array(matrix_b) if matrix_b is not None else None
+            if A is not None and (matrix_b is None or B is not None):
+                result = _numeric_matrix_operation(A, operation, B)
+                if result is not None:
+                    return result
+
         A = Matrix(matrix_a)
         if operation == "determinant":
             return str(A.det())
@@ -70,14 +133,10 @@ def matrix_operation(matrix_a: list, operation: str, matrix_b: list = None) -> s
         return f"Error: {str(e)}"
 
 
-def preprocess_math(expr: str) -> str:
-    """Convert common math expressions to Python/sympy syntax"""
-    expr = expr.replace("^", "**")
-    expr = re.sub(r"(\d)([a-zA-Z])", r"\1*\2", expr)  # 2x → 2*x
-    expr = re.sub(r"(\w)(\()", r"\1*(", expr)  # x(2+x) → x*(2+x)
-    expr = re.sub(r"(\d)%", r"0.\1", expr)  # 15% → 0.15
-    expr = expr.replace(" ", "")  # remove spaces
-    return expr
+@lru_cache(maxsize=MATH_PARSE_CACHE_SIZE)
+def _parse_and_simplify(raw_expr: str):
+    """Parse and simplify a preprocessed expression, memoized on its text."""
+    return simplify(parse_expr(raw_expr, evaluate=True))
 
 
 def calculate(expression: str) -> str:
@@ -86,26 +145,117 @@ def calculate(expression: str) -> str:
     Supports: +, -, *, /, **, %, parentheses, variables, functions (sin, log, etc.)
     """
     try:
-        # Preprocess input
-        raw_expr = preprocess_math(expression.strip())
+        # Preprocess input, including percentage usage like "15% of 200"
+        raw_expr = prepare_expression(expression)
 
-        # Handle percentage usage like "15% of 200"
-        if "of" in raw_expr:
-            raw_expr = raw_expr.replace("of", "*")
+        # Plain arithmetic needs no SymPy
+        try:
+            return format_result(evaluate_numeric(raw_expr))
+        except NotNumeric:
+            pass
 
-        # Parse and evaluate
-        expr = parse_expr(raw_expr, evaluate=True)
-        # Try to simplify or evaluate numerically
-        result = simplify(expr)
+        # Parse, then simplify or evaluate numerically
+        result = _parse_and_simplify(raw_expr)
 
         # If it's a number, show decimal; otherwise keep symbolic
-        try:
-            float_result = float(result)
-            if float_result.is_integer():
-                return str(int(float_result))
-            return f"{float_result:.6g}"  # Compact float
-        except:
-            return str(result)  # Keep symbolic: e.g., sqrt(2)
+        return format_result(result)
+
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+@lru_cache(maxsize=MATH_PARSE_CACHE_SIZE)
+def _compile_grid_function(raw_expr: str, names: tuple[str, ...]):
+    """Parse a preprocessed expression and compile it to a NumPy function of `names`."""
+    expr = parse_expr(raw_expr)
+    missing = sorted(str(s) for s in expr.free_symbols if str(s) not in names)
+    if missing:
+        raise ValueError(f"No values given for: {', '.join(missing)}")
+    return expr, lambdify([symbols(name) for name in names], expr, modules="numpy")
+
+
+def _grid_axis(spec, points: int) -> np.ndarray:
+    """Values of one variable: a list of numbers, or a "start:stop[:num]" range."""
+    if isinstance(spec, str):
+        parts = [float(part) for part in spec.split(":")]
+        if len(parts) not in (2, 3):
+            raise ValueError(
+                f"Range '{spec}' must look like 'start:stop' or 'start:stop:num'"
+            )
+        num = int(parts[2]) if len(parts) == 3 else points
+        if num > MATH_GRID_MAX_POINTS:
+            raise ValueError(f"Range '{spec}' exceeds {MATH_GRID_MAX_POINTS:,} points")
+        return np.linspace(parts[0], parts[1], num)
+    return np.asarray(spec, dtype=float).ravel()
+
+
+def evaluate_expression_grid(
+    expression: str,
+    variables: dict[str, list[float] | str],
+    points: int = 50,
+    max_rows: int = 20,
+) -> str:
+    """
+    Evaluate an expression over a grid of values in one vectorized pass.
+    variables maps each variable to a list of values or a "start:stop[:num]"
+    range (num defaults to points); several variables form a full grid.
+    Returns summary statistics (min, max, mean, ...) and a table down-sampled
+    to at most max_rows rows.
+    Example: "sin(x)*exp(-x/5)", {"x": "0:10:101"}
+    """
+    try:
+        names = tuple(variables)
+        if not names:
+            return "Error: Give values for at least one variable."
+        axes = [_grid_axis(variables[name], points) for name in names]
+        total = int(np.prod([len(axis) for axis in axes]))
+        if total == 0:
+            return "Error: Empty grid."
+        if total > MATH_GRID_MAX_POINTS:
+            return (
+                f"Error: Grid has {total:,} points; "
+                f"the limit is {MATH_GRID_MAX_POINTS:,}."
+            )
+
+        expr, fn = _compile_grid_function(preprocess_math(expression.strip()), names)
+        grids = np.meshgrid(*axes, indexing="ij")
+        with np.errstate(all="ignore"):
+            values = np.broadcast_to(np.asarray(fn(*grids)), grids[0].shape)
+        if np.iscomplexobj(values):
+            if not np.allclose(values.imag, 0):
+                return "Error: Expression takes complex values on this grid."
+            values = values.real
+        values = values.astype(float).ravel()
+        coords = [grid.ravel() for grid in grids]
+
+        def at(i: int) -> str:
+            return ", ".join(
+                f"{name}={format_result(coord[i])}" for name, coord in zip(names, coords)
+            )
+
+        finite = np.isfinite(values)
+        lines = [
+            f"f({', '.join(names)}) = {expr}",
+            f"points: {total} ({int(finite.sum())} finite)",
+        ]
+        if finite.any():
+            masked = np.where(finite, values, np.nan)
+            lo, hi = int(np.nanargmin(masked)), int(np.nanargmax(masked))
+            lines += [
+                f"min: {format_result(values[lo])} at {at(lo)}",
+                f"max: {format_result(values[hi])} at {at(hi)}",
+                f"mean: {format_result(np.nanmean(masked))}, "
+                f"std: {format_result(np.nanstd(masked))}",
+            ]
 
+        rows = max(1, min(max_rows, MATH_GRID_MAX_ROWS, total))
+        indices = np.unique(np.linspace(0, total - 1, rows).round().astype(int))
+        lines.append(" | ".join([*names, "value"]))
+        for i in indices:
+            cells = [format_result(coord[i]) for coord in coords]
+            lines.append(" | ".join([*cells, format_result(values[i])]))
+        if len(indices) < total:
+            lines.append(f"(showing {len(indices)} of {total} rows)")
+        return "\n".join(lines)
     except Exception as e:
         return f"Error: {str(e)}"
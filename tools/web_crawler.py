@@ -1,7 +1,9 @@
 import asyncio
+import os
+import weakref
+from urllib.parse import urlsplit
 from crawl4ai import (
     AsyncWebCrawler,
-    BrowserConfig,
     CrawlerRunConfig,
     DefaultMarkdownGenerator,
     PruningContentFilter,
@@ -10,41 +12,221 @@ from crawl4ai import (
 from typing import cast
 from crawl4ai.models import MarkdownGenerationResult
 
+from .crawler_pool import CRAWL_TIMEOUT, CrawlerPool, get_crawler_pool
+from .near_duplicates import collapse_near_duplicates
+from .page_cache import split_cached, store_results
+from .passage_index import index_results
+from .prefetch import take_prefetched
 
-def crawl_url(url: str, headless: bool = True, verbose: bool = False) -> str:
+BATCH_TIMEOUT = float(os.getenv("CRAWL4AI_BATCH_TIMEOUT", "120"))
+MAX_CONCURRENCY = int(os.getenv("CRAWL4AI_MAX_CONCURRENCY", "5"))
+PER_DOMAIN_CONCURRENCY = int(os.getenv("CRAWL4AI_PER_DOMAIN_CONCURRENCY", "2"))
+PER_DOMAIN_DELAY = float(os.getenv("CRAWL4AI_PER_DOMAIN_DELAY", "0.5"))
+
+
+class DomainThrottle:
+    """
+    Per-domain politeness limits: at most `concurrency` in-flight requests per
+    host, and at least `delay` seconds between the starts of two requests to it.
     """
-    Synchronously crawl a given URL and return the content as Markdown string.
+
+    def __init__(
+        self,
+        concurrency: int = PER_DOMAIN_CONCURRENCY,
+        delay: float = PER_DOMAIN_DELAY,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.delay = max(0.0, delay)
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._next_start: dict[str, float] = {}
+
+    async def acquire(self, domain: str):
+        semaphore = self._semaphores.setdefault(
+            domain, asyncio.Semaphore(self.concurrency)
+        )
+        await semaphore.acquire()
+        loop = asyncio.get_running_loop()
+        start = max(loop.time(), self._next_start.get(domain, 0.0))
+        self._next_start[domain] = start + self.delay
+        wait = start - loop.time()
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except BaseException:
+                semaphore.release()
+                raise
+
+    def release(self, domain: str):
+        self._semaphores[domain].release()
+
+
+# One throttle per pool, since asyncio primitives are bound to the pool's loop.
+_throttles: "weakref.WeakKeyDictionary[CrawlerPool, DomainThrottle]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _crawler_run_config() -> CrawlerRunConfig:
+    return CrawlerRunConfig(
+        markdown_generator=DefaultMarkdownGenerator(
+            content_filter=PruningContentFilter()
+        ),
+    )
+
+
+def _to_markdown(result: CrawlResult) -> str:
+    # return result.markdown.raw_markdown
+    markdown_result = getattr(result.markdown, "_markdown_result", None)
+    if markdown_result is not None:
+        return cast(MarkdownGenerationResult, markdown_result).raw_markdown
+    return result.markdown or ""  # fallback to string coercion
+
+
+async def _crawl_batch(
+    pool: CrawlerPool,
+    urls: list[str],
+    url_timeout: float,
+    batch_timeout: float,
+) -> dict:
+    throttle = _throttles.setdefault(pool, DomainThrottle())
+    semaphore = asyncio.Semaphore(max(1, MAX_CONCURRENCY))
+    headers: dict[str, dict] = {}
+
+    async def _crawl_one(url: str) -> dict:
+        domain = urlsplit(url).netloc.lower()
+
+        async def _fetch(crawler: AsyncWebCrawler) -> CrawlResult:
+            return await crawler.arun(url=url, config=_crawler_run_config())
+
+        async with semaphore:
+            await throttle.acquire(domain)
+            try:
+                result = await asyncio.wait_for(
+                    pool.with_crawler(_fetch), timeout=url_timeout
+                )
+            finally:
+                throttle.release(domain)
+
+        if not result.success:
+            raise RuntimeError(result.error_message or "Crawl failed")
+        headers[url] = result.response_headers or {}
+        return {"url": url, "raw_content": _to_markdown(result)}
+
+    tasks = {url: asyncio.create_task(_crawl_one(url)) for url in urls}
+    done, pending = await asyncio.wait(tasks.values(), timeout=batch_timeout)
+    for task in pending:
+        task.cancel()
+
+    results, failed_results = [], []
+    for url, task in tasks.items():
+        if task in pending:
+            failed_results.append({"url": url, "error": "Batch timed out"})
+        elif isinstance(task.exception(), asyncio.TimeoutError):
+            failed_results.append(
+                {"url": url, "error": f"Timed out after {url_timeout}s"}
+            )
+        elif task.exception() is not None:
+            failed_results.append({"url": url, "error": str(task.exception())})
+        else:
+            results.append(task.result())
+
+    store_results(results, headers=headers)
+    # Only the pages: timing would make identical crawls look different to the model
+    return {"results": results, "failed_results": failed_results}
+
+
+def prefetch_pages(urls: list[str]) -> dict:
+    """Crawl pages for the prefetcher with the shared pool's default browsers."""
+    pool = get_crawler_pool()
+    return pool.run_coroutine(
+        _crawl_batch(pool, urls, CRAWL_TIMEOUT, BATCH_TIMEOUT)
+    ).result()
+
+
+def crawl_url(
+    urls: list[str] | str,
+    headless: bool = True,
+    verbose: bool = False,
+    full_content: bool = False,
+) -> dict:
+    """
+    Crawl one or more URLs concurrently and return their content as Markdown.
+
+    Pages are fetched with warm browsers borrowed from the shared crawler pool,
+    with bounded concurrency and per-domain politeness limits, so a batch takes
+    about as long as its slowest page. Near-duplicates of other pages are
+    collapsed and the rest are added to the local passage index. Unless
+    `full_content` is set, each result is a short summary and the body is read
+    with `search_crawled`.
 
     Args:
-        url (str): The URL to crawl.
+        urls: A single URL or list of URLs to crawl.
         headless (bool): Whether to run browser in headless mode. Default is True.
         verbose (bool): Whether to enable verbose logging. Default is False.
+        full_content (bool): Return the full page bodies instead of summaries.
 
     Returns:
-        str: The crawled content in Markdown format, or error message.
+        Dictionary containing crawled 'results' and 'failed_results'.
     """
+    if isinstance(urls, str):
+        urls = [urls]
+    urls = list(dict.fromkeys(url.strip() for url in urls if url and url.strip()))
+    prefetched, urls = take_prefetched(urls)
+    cached, urls = split_cached(urls)
+    cached = prefetched + cached
+    if not urls:
+        response = collapse_near_duplicates({"results": cached, "failed_results": []}, "crawl")
+        return index_results(response, full_content)
 
-    async def _async_crawl():
-        browser_config = BrowserConfig(
-            headless=headless,
-            verbose=verbose,
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36",
+    try:
+        pool = get_crawler_pool(headless=headless, verbose=verbose)
+        future = pool.run_coroutine(
+            _crawl_batch(pool, urls, CRAWL_TIMEOUT, BATCH_TIMEOUT)
         )
-        async with AsyncWebCrawler(config=browser_config) as crawler:
-            crawler_config = CrawlerRunConfig(
-                markdown_generator=DefaultMarkdownGenerator(
-                    content_filter=PruningContentFilter()
-                ),
-            )
-            try:
-                result: CrawlResult = await crawler.arun(url=url, config=crawler_config)
-                # return result.markdown.raw_markdown
-                markdown_result = getattr(
-                    result.markdown, "_markdown_result", None)
-                if markdown_result is not None:
-                    return cast(MarkdownGenerationResult, markdown_result).raw_markdown
-                return result.markdown or ""  # fallback to string coercion
-            except Exception as e:
-                return f"Error: {str(e)}"
-
-    return asyncio.run(_async_crawl())
+        response = future.result()
+    except Exception as e:
+        response = {
+            "results": [],
+            "failed_results": [{"url": url, "error": str(e)} for url in urls],
+        }
+    response["results"] = cached + response["results"]
+    return index_results(collapse_near_duplicates(response, "crawl"), full_content)
+
+
+async def acrawl_url(
+    urls: list[str] | str,
+    headless: bool = True,
+    verbose: bool = False,
+    full_content: bool = False,
+) -> dict:
+    """
+    Async version of `crawl_url`.
+
+    The batch runs on the crawler pool's own loop; the caller's loop only
+    awaits its completion, so several crawls can be awaited concurrently.
+    """
+    if isinstance(urls, str):
+        urls = [urls]
+    urls = list(dict.fromkeys(url.strip() for url in urls if url and url.strip()))
+    prefetched, urls = await asyncio.to_thread(take_prefetched, urls)
+    cached, urls = await asyncio.to_thread(split_cached, urls)
+    cached = prefetched + cached
+    if not urls:
+        response = {"results": cached, "failed_results": []}
+        response = await asyncio.to_thread(collapse_near_duplicates, response, "crawl")
+        return await asyncio.to_thread(index_results, response, full_content)
+
+    try:
+        pool = await asyncio.to_thread(get_crawler_pool, headless, verbose)
+        future = pool.run_coroutine(
+            _crawl_batch(pool, urls, CRAWL_TIMEOUT, BATCH_TIMEOUT)
+        )
+        response = await asyncio.wrap_future(future)
+    except Exception as e:
+        response = {
+            "results": [],
+            "failed_results": [{"url": url, "error": str(e)} for url in urls],
+        }
+    response["results"] = cached + response["results"]
+    response = await asyncio.to_thread(collapse_near_duplicates, response, "crawl")
+    return await asyncio.to_thread(index_results, response, full_content)
@@ -1,16 +1,85 @@
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from tavily import TavilyClient
+from tavily import AsyncTavilyClient, TavilyClient
+
+from .governor import get_async_http_client, get_requests_session
+from .near_duplicates import collapse_near_duplicates
+from .page_cache import canonicalize_url, split_cached, store_results
+from .passage_index import index_results
+from .prefetch import prefetch_results, take_prefetched
+from .registry import record_cache_lookup
+from .search_cache import SEARCH_CACHE_MODE, get_search_cache
 
 # Load environment variables
 load_dotenv()
 
-# Check if TAVILY_API_KEY exists
-if not os.environ.get("TAVILY_API_KEY"):
+# Check if TAVILY_API_KEY exists; replaying recorded searches needs no key
+if not os.environ.get("TAVILY_API_KEY") and SEARCH_CACHE_MODE != "replay":
     raise ValueError(
         "TAVILY_API_KEY is missing. Please set it in your .env file.")
 
-tavily_client = TavilyClient(api_key=os.environ["TAVILY_API_KEY"])
+# Alternative Tavily endpoint, e.g. the stand-in server used by the benchmarks
+TAVILY_API_BASE_URL = os.getenv("TAVILY_API_BASE_URL") or None
+
+# Both clients share one keep-alive pool per flavour and the "tavily" governor
+# (rate limit, concurrency cap and retries), whichever session calls them
+tavily_client = (
+    TavilyClient(
+        api_key=os.environ["TAVILY_API_KEY"],
+        api_base_url=TAVILY_API_BASE_URL,
+        session=get_requests_session("tavily"),
+    )
+    if os.environ.get("TAVILY_API_KEY")
+    else None
+)
+async_tavily_client = (
+    AsyncTavilyClient(
+        api_key=os.environ["TAVILY_API_KEY"],
+        api_base_url=TAVILY_API_BASE_URL,
+        client=get_async_http_client("tavily"),
+    )
+    if os.environ.get("TAVILY_API_KEY")
+    else None
+)
+
+
+def _lookup_search(query: str, max_results: int) -> dict | None:
+    search_cache = get_search_cache()
+    if search_cache is None:
+        return None
+    cached = search_cache.get(query, max_results)
+    record_cache_lookup(hits=int(cached is not None), misses=int(cached is None))
+    if cached is None and search_cache.replay:
+        raise LookupError(f"No recorded search results for query: {query!r}")
+    return cached
+
+
+def _store_search(query: str, max_results: int, response: dict):
+    search_cache = get_search_cache()
+    if search_cache is not None:
+        search_cache.put(query, max_results, response)
+
+
+def _search(query: str, max_results: int) -> dict:
+    cached = _lookup_search(query, max_results)
+    if cached is not None:
+        return cached
+
+    response = tavily_client.search(query, max_results=max_results)
+    _store_search(query, max_results, response)
+    return response
+
+
+async def _asearch(query: str, max_results: int) -> dict:
+    cached = await asyncio.to_thread(_lookup_search, query, max_results)
+    if cached is not None:
+        return cached
+
+    response = await async_tavily_client.search(query, max_results=max_results)
+    await asyncio.to_thread(_store_search, query, max_results, response)
+    return response
 
 
 def internet_search(
@@ -18,29 +87,222 @@ def internet_search(
     max_results: int = 5,
 ):
     """Run a web search with improved query understanding"""
-    return tavily_client.search(query, max_results=max_results)
+    response = collapse_near_duplicates(_search(query, max_results), "search")
+    prefetch_results(response)
+    return response
+
+
+async def ainternet_search(
+    query: str,
+    max_results: int = 5,
+):
+    """Run a web search with improved query understanding"""
+    response = await _asearch(query, max_results)
+    response = await asyncio.to_thread(collapse_near_duplicates, response, "search")
+    prefetch_results(response)
+    return response
+
+
+RRF_K = 60
+
+
+def fuse_results(responses: dict[str, dict], max_total: int = 10) -> list[dict]:
+    """
+    Merge per-query search responses with reciprocal-rank fusion.
+
+    Results are deduplicated by canonical URL; each keeps the text of its
+    best-ranked occurrence, a fused score of sum(1 / (RRF_K + rank)) and the
+    queries (with ranks) that returned it.
+
+    Args:
+        responses: Mapping of query to its Tavily search response.
+        max_total: Maximum number of fused results to return.
+
+    Returns:
+        list[dict]: Fused results, best first.
+    """
+    fused: dict[str, dict] = {}
+    for query, response in responses.items():
+        for rank, item in enumerate(response.get("results", []), start=1):
+            url = item.get("url")
+            if not url:
+                continue
+            key = canonicalize_url(url)
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {
+                    "url": url,
+                    "title": item.get("title", ""),
+                    "content": item.get("content", ""),
+                    "score": 0.0,
+                    "provenance": [],
+                    "_best_rank": rank,
+                }
+            elif rank < entry["_best_rank"]:
+                entry.update(
+                    url=url,
+                    title=item.get("title", ""),
+                    content=item.get("content", ""),
+                    _best_rank=rank,
+                )
+            entry["score"] += 1.0 / (RRF_K + rank)
+            entry["provenance"].append({"query": query, "rank": rank})
+
+    ranked = sorted(fused.values(), key=lambda e: e["score"], reverse=True)
+    for entry in ranked:
+        entry.pop("_best_rank")
+        entry["score"] = round(entry["score"], 5)
+    return ranked[:max_total]
+
+
+def internet_search_many(
+    queries: list[str],
+    max_results: int = 5,
+    max_total: int = 10,
+) -> dict:
+    """
+    Run several phrasings of a search at once and return one fused, deduplicated ranking.
+
+    Args:
+        queries: Search queries to run concurrently.
+        max_results: Results fetched per query.
+        max_total: Maximum number of fused results returned.
+
+    Returns:
+        Dictionary with fused 'results' (each with per-query 'provenance') and 'failed_queries'.
+    """
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    responses, failed = {}, []
+    with ThreadPoolExecutor(max_workers=max(1, len(queries))) as executor:
+        futures = {
+            query: executor.submit(_search, query, max_results)
+            for query in queries
+        }
+        for query, future in futures.items():
+            try:
+                responses[query] = future.result()
+            except Exception as e:
+                failed.append({"query": query, "error": str(e)})
+    response = {
+        "results": fuse_results(responses, max_total=max_total),
+        "failed_queries": failed,
+    }
+    response = collapse_near_duplicates(response, "search")
+    prefetch_results(response)
+    return response
+
+
+async def ainternet_search_many(
+    queries: list[str],
+    max_results: int = 5,
+    max_total: int = 10,
+) -> dict:
+    """Async version of `internet_search_many`."""
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    outcomes = await asyncio.gather(
+        *(_asearch(query, max_results) for query in queries),
+        return_exceptions=True,
+    )
+    responses, failed = {}, []
+    for query, outcome in zip(queries, outcomes):
+        if isinstance(outcome, Exception):
+            failed.append({"query": query, "error": str(outcome)})
+        else:
+            responses[query] = outcome
+    response = {
+        "results": fuse_results(responses, max_total=max_total),
+        "failed_queries": failed,
+    }
+    response = await asyncio.to_thread(collapse_near_duplicates, response, "search")
+    prefetch_results(response)
+    return response
+
+
+def prefetch_pages(urls: list[str]) -> dict:
+    """Extract pages for the prefetcher, as `crawl_url` does by default."""
+    response = tavily_client.extract(
+        urls=urls, include_images=False, format="markdown", extract_depth="basic"
+    )
+    store_results(response.get("results", []))
+    return response
 
 
 def crawl_url(
     urls: list[str] | str,
     format: str = "markdown",
     extract_depth: str = "basic",
+    full_content: bool = False,
 ) -> dict:
     """
     Extract content from one or more URLs using Tavily's extraction API.
 
+    Near-duplicates of other pages are collapsed and the rest are added to the
+    local passage index. Unless `full_content` is set, each result is a short
+    summary and the body is read with `search_crawled`.
+
     Args:
         urls: A single URL or list of URLs to extract content from.
         format: Output format - 'markdown' (default) or 'text'.
         extract_depth: How deeply to extract - 'basic' or 'advanced' (default).
-        max_retries: Number of retry attempts on failure (not directly used by Tavily client, but can be extended).
+        full_content: Return the full page bodies instead of summaries.
 
     Returns:
         Dictionary containing extracted 'results' and 'failed_results'.
     """
-    return tavily_client.extract(
-        urls=urls,
-        include_images=False,
-        format=format,
-        extract_depth=extract_depth,
-    )
+    if isinstance(urls, str):
+        urls = [urls]
+    # The prefetcher and the page cache only hold basic-depth extractions
+    basic = extract_depth == "basic"
+    prefetched, cached, missing = [], [], urls
+    if basic:
+        prefetched, urls = take_prefetched(urls, format=format)
+        cached, missing = split_cached(urls, format=format)
+    response = {"results": [], "failed_results": []}
+    if missing:
+        response = tavily_client.extract(
+            urls=missing,
+            include_images=False,
+            format=format,
+            extract_depth=extract_depth,
+        )
+        if basic:
+            store_results(response.get("results", []), format=format)
+    # Only the pages: timing and request ids differ between live and cached
+    # answers and would make identical crawls look different to the model
+    response = {
+        "results": cached + prefetched + response.get("results", []),
+        "failed_results": response.get("failed_results", []),
+    }
+    return index_results(collapse_near_duplicates(response, "crawl"), full_content)
+
+
+async def acrawl_url(
+    urls: list[str] | str,
+    format: str = "markdown",
+    extract_depth: str = "basic",
+    full_content: bool = False,
+) -> dict:
+    """Async version of `crawl_url` built on Tavily's async client."""
+    if isinstance(urls, str):
+        urls = [urls]
+    basic = extract_depth == "basic"
+    prefetched, cached, missing = [], [], urls
+    if basic:
+        prefetched, urls = await asyncio.to_thread(take_prefetched, urls, format)
+        cached, missing = await asyncio.to_thread(split_cached, urls, format)
+    response = {"results": [], "failed_results": []}
+    if missing:
+        response = await async_tavily_client.extract(
+            urls=missing,
+            include_images=False,
+            format=format,
+            extract_depth=extract_depth,
+        )
+        if basic:
+            await asyncio.to_thread(store_results, response.get("results", []), format)
+    response = {
+        "results": cached + prefetched + response.get("results", []),
+        "failed_results": response.get("failed_results", []),
+    }
+    response = await asyncio.to_thread(collapse_near_duplicates, response, "crawl")
+    return await asyncio.to_thread(index_results, response, full_content)
@@ -1,3 +1,13 @@
+from .startup import startup_timer
 from .print_msg import print_message
+from .aio import get_event_loop, run_sync, iterate_sync
+from .checkpointer import get_checkpointer
 
-__all__ = [print_message]
\ No newline at end of file
+__all__ = [
+    startup_timer,
+    print_message,
+    get_event_loop,
+    run_sync,
+    iterate_sync,
+    get_checkpointer,
+]
@@ -0,0 +1,130 @@
+import json
+import os
+from typing import Any, Iterator
+
+import httpx
+from dotenv import load_dotenv
+from langchain_core.messages import messages_from_dict
+
+load_dotenv()
+
+# Base URL of an agent server (`python server.py`); when set, main.py and
+# cli.py send turns there instead of running an agent in their own process
+AGENT_SERVER_URL = os.getenv("AGENT_SERVER_URL") or None
+# Times a dropped event stream is resumed before the turn is given up on
+AGENT_CLIENT_RECONNECTS = 3
+
+
+class AgentServerError(RuntimeError):
+    """The agent server refused a turn, or the turn failed on the server."""
+
+
+def _decode(kind: str, data: dict) -> Any:
+    if kind == "token":
+        return data["text"]
+    if kind in ("message", "tool_result"):
+        return messages_from_dict([data])[0]
+    if kind == "queued":
+        return data["position"]
+    return data
+
+
+class AgentClient:
+    """
+    Thin client of the agent server: start turns and follow their events.
+
+    Args:
+        base_url (str): The server's base URL, e.g. http://127.0.0.1:8765.
+        timeout (float): Seconds to wait for a response or the next event.
+    """
+
+    def __init__(self, base_url: str = AGENT_SERVER_URL, timeout: float = 60.0):
+        self.base_url = base_url.rstrip("/")
+        self._client = httpx.Client(base_url=self.base_url, timeout=timeout)
+
+    def _request(self, method: str, path: str, expected: int = 200, **kwargs) -> dict:
+        try:
+            response = self._client.request(method, path, **kwargs)
+        except httpx.TransportError as e:
+            raise AgentServerError(f"Agent server at {self.base_url} is unreachable: {e}") from e
+        if response.status_code != expected:
+            try:
+                error = response.json().get("error", response.text)
+            except ValueError:
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+            raise AgentServerError(error)
+        return response.json()
+
+    def start_turn(self, thread_id: str, prompt: str) -> dict:
+        """Queue a turn on a thread and return its ids."""
+        return self._request(
+            "POST", f"/threads/{thread_id}/turns", expected=202, json={"prompt": prompt}
+        )
+
+    def events(self, thread_id: str) -> Iterator[tuple[str, dict]]:
+        """
+        Yield the raw (event, data) pairs of a thread's latest turn until it is
+        done, resuming after the last event seen if the stream drops.
+        """
+        last_id, reconnects = -1, 0
+        while True:
+            try:
+                with self._client.stream(
+                    "GET", f"/threads/{thread_id}/events", params={"after": last_id}
+                ) as response:
+                    if response.status_code != 200:
+                        response.read()
+                        raise AgentServerError(f"HTTP {response.status_code}: {response.text[:200]}")
+                    kind, data = None, []
+                    for line in response.iter_lines():
+                        if line.startswith("id:"):
+                            event_id = int(line[3:].strip())
+                        elif line.startswith("event:"):
+                            kind = line[6:].strip()
+                        elif line.startswith("data:"):
+                            data.append(line[5:].strip())
+                        elif not line and kind is not None:
+                            last_id, reconnects = event_id, 0
+                            yield kind, json.loads("\n".join(data))
+                            if kind == "done":
+                                return
+                            kind, data = None, []
+            except httpx.TransportError as e:
+                lost = f"{type(e).__name__}: {e}"
+            else:
+                lost = "the server closed the stream"
+            reconnects += 1
+            if reconnects > AGENT_CLIENT_RECONNECTS:
+                raise AgentServerError(f"Lost the turn's event stream ({lost})")
+
+    def stream_turn(self, thread_id: str, prompt: str) -> Iterator[tuple[str, Any]]:
+        """
+        Run a turn on the server and yield its events.
+
+        Yields the same ("token" | "message" | "tool_call" | "tool_result", payload)
+        pairs as `iter_agent_events`, plus ("queued", position) while waiting for
+        a slot and ("performance", summary) with the turn's `TurnTracer` summary
+        at the end.
+
+        Raises:
+            AgentServerError: The turn was refused or failed.
+        """
+        self.start_turn(thread_id, prompt)
+        for kind, data in self.events(thread_id):
+            if kind == "started":
+                continue
+            if kind == "done":
+                if data["performance"] is not None:
+                    yield "performance", data["performance"]
+                if data["error"]:
+                    raise AgentServerError(data["error"])
+                return
+            yield kind, _decode(kind, data)
+
+    def delete_thread(self, thread_id: str):
+        """Delete a finished thread's checkpoints on the server."""
+        self._request("DELETE", f"/threads/{thread_id}")
+
+    def stats(self) -> dict:
+        """Return the server's turn counters and `runtime_stats`."""
+        return self._request("GET", "/stats")
@@ -0,0 +1,330 @@
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+import uuid
+
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage, message_to_dict
+from langchain_core.runnables import RunnableConfig
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from tools.governor import governor_stats
+from tools.prefetch import get_prefetcher
+
+from .compression import get_compression_middleware
+from .llm import get_llm_cache
+from .streaming import STREAM_MODES, iter_agent_events
+from .tracing import TurnTracer
+
+load_dotenv()
+
+AGENT_SERVER_HOST = os.getenv("AGENT_SERVER_HOST", "127.0.0.1")
+AGENT_SERVER_PORT = int(os.getenv("AGENT_SERVER_PORT", "8765"))
+# Turns run at once; further turns wait in a queue of at most MAX_QUEUED_TURNS
+AGENT_SERVER_MAX_CONCURRENT_TURNS = int(os.getenv("AGENT_SERVER_MAX_CONCURRENT_TURNS", "8"))
+AGENT_SERVER_MAX_QUEUED_TURNS = int(os.getenv("AGENT_SERVER_MAX_QUEUED_TURNS", "64"))
+# Seconds the events of a finished turn stay available to clients reconnecting
+AGENT_SERVER_TURN_RETENTION = float(os.getenv("AGENT_SERVER_TURN_RETENTION", "900"))
+# Seconds between SSE comments keeping idle streams open through proxies
+SSE_KEEPALIVE_INTERVAL = 15.0
+
+
+class ThreadBusyError(RuntimeError):
+    """A turn is already queued or running on the thread."""
+
+
+class QueueFullError(RuntimeError):
+    """Every turn slot is busy and the queue is full."""
+
+
+def _encode(kind: str, payload) -> dict:
+    if kind == "token":
+        return {"text": payload}
+    if kind in ("message", "tool_result"):
+        return message_to_dict(payload)
+    return payload
+
+
+class Turn:
+    """
+    One agent turn and the events it has produced so far.
+
+    Events are kept for the whole turn, so any number of clients can follow it
+    and a client that lost its connection resumes from the last event it saw.
+    """
+
+    def __init__(self, thread_id: str, prompt: str):
+        self.thread_id = thread_id
+        self.prompt = prompt
+        self.turn_id = uuid.uuid4().hex
+        self.events: list[tuple[str, str]] = []
+        self.finished_at: float | None = None
+        self.task: asyncio.Task | None = None
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def publish(self, kind: str, data: dict):
+        """Append an event and wake the clients waiting for it."""
+        self.events.append((kind, json.dumps(data, ensure_ascii=False, default=str)))
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def finish(self, performance: dict | None, error: str | None):
+        """Publish the final 'done' event with the turn's performance summary."""
+        self.publish("done", {"performance": performance, "error": error})
+        self.finished_at = time.monotonic()
+
+    async def follow(self, after: int = -1):
+        """
+        Yield the turn's events after index `after` as SSE frames, waiting for
+        new ones until the turn is done.
+        """
+        index = after + 1
+        while True:
+            changed = self._changed
+            while index < len(self.events):
+                kind, data = self.events[index]
+                yield f"id: {index}\nevent: {kind}\ndata: {data}\n\n"
+                index += 1
+            if self.finished:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), SSE_KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+
+
+class AgentRuntime:
+    """
+    Run agent turns for many threads on one event loop, with one shared agent.
+
+    At most `max_concurrent` turns run at once; later ones wait in FIFO order,
+    and new turns are refused once `max_queued` are waiting. A thread runs one
+    turn at a time. Turns keep running when their client disconnects.
+
+    Args:
+        agent: A compiled agent with a checkpointer, shared by every thread.
+        max_concurrent (int): Turns running at once.
+        max_queued (int): Turns allowed to wait for a slot.
+        retention (float): Seconds a finished turn's events are kept.
+    """
+
+    def __init__(
+        self,
+        agent,
+        max_concurrent: int = AGENT_SERVER_MAX_CONCURRENT_TURNS,
+        max_queued: int = AGENT_SERVER_MAX_QUEUED_TURNS,
+        retention: float = AGENT_SERVER_TURN_RETENTION,
+    ):
+        self.agent = agent
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self.retention = retention
+        self.turns: dict[str, Turn] = {}
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+
+    def submit(self, thread_id: str, prompt: str) -> Turn:
+        """
+        Queue a turn on a thread and start it as soon as a slot is free.
+
+        Raises:
+            ThreadBusyError: The thread already has a turn in progress.
+            QueueFullError: The queue is full.
+        """
+        self._prune()
+        current = self.turns.get(thread_id)
+        if current is not None and not current.finished:
+            raise ThreadBusyError(f"Thread {thread_id} already has a turn in progress")
+        if self.queued >= self.max_queued and self._slots.locked():
+            raise QueueFullError(f"{self.queued} turns are already waiting")
+        turn = self.turns[thread_id] = Turn(thread_id, prompt)
+        self.queued += 1
+        turn.task = asyncio.get_running_loop().create_task(self._run(turn))
+        return turn
+
+    def _prune(self):
+        now = time.monotonic()
+        for thread_id, turn in list(self.turns.items()):
+            if turn.finished and now - turn.finished_at > self.retention:
+                del self.turns[thread_id]
+
+    async def _run(self, turn: Turn):
+        if self._slots.locked():
+            turn.publish("queued", {"position": self.queued})
+        try:
+            await self._slots.acquire()
+        except asyncio.CancelledError:
+            turn.finish(None, "cancelled")
+            raise
+        finally:
+            self.queued -= 1
+        self.running += 1
+        try:
+            await self._execute(turn)
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    async def _execute(self, turn: Turn):
+        turn.publish("started", {})
+        tracer = TurnTracer(turn.thread_id, turn.prompt)
+        config: RunnableConfig = {
+            "configurable": {"thread_id": turn.thread_id},
+            "callbacks": [tracer],
+        }
+        error = None
+        try:
+            stream = self.agent.astream(
+                {"messages": [HumanMessage(content=turn.prompt, id=str(uuid.uuid4()))]},
+                config=config,
+                stream_mode=STREAM_MODES,
+            )
+            async for event in stream:
+                for kind, payload in iter_agent_events([event]):
+                    turn.publish(kind, _encode(kind, payload))
+        except asyncio.CancelledError:
+            error = "cancelled"
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            self.completed += error is None
+            self.failed += error is not None
+            # The trace export writes to disk; keep it off the loop
+            performance = await asyncio.to_thread(tracer.finish, error)
+            turn.finish(performance, error)
+
+    async def shutdown(self):
+        """Cancel the turns in progress and wait for them to wind down."""
+        tasks = [turn.task for turn in self.turns.values() if turn.task and not turn.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Return turn counters and the concurrency and queue limits."""
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "threads": len(self.turns),
+        }
+
+
+def runtime_stats(checkpointer=None) -> dict:
+    """
+    Return the process-wide counters shown in the sidebar: checkpointer, LLM
+    response cache, compression, near-duplicate filtering, prefetch and API
+    governors.
+    Disabled components are None.
+    """
+    llm_cache = get_llm_cache()
+    compression = get_compression_middleware()
+    # Not imported here: it pulls in NumPy, which only searches and crawls need
+    near_duplicates = sys.modules.get("tools.near_duplicates")
+    vector_store = near_duplicates.get_vector_store() if near_duplicates else None
+    prefetcher = get_prefetcher()
+    return {
+        "checkpointer": checkpointer.metrics() if checkpointer is not None else None,
+        "llm_cache": llm_cache.stats() if llm_cache is not None else None,
+        "compression": compression.stats() if compression is not None else None,
+        "near_duplicates": vector_store.stats() if vector_store is not None else None,
+        "prefetch": prefetcher.stats() if prefetcher is not None else None,
+        "upstream": governor_stats(),
+    }
+
+
+def create_app(runtime: AgentRuntime, checkpointer=None) -> Starlette:
+    """
+    Build the ASGI app serving `runtime`.
+
+    Routes:
+        POST /threads/{thread_id}/turns   Start a turn: {"prompt": "..."}.
+        GET  /threads/{thread_id}/events  Server-sent events of the thread's latest
+                                          turn; resume with ?after=<id> or Last-Event-ID.
+        DELETE /threads/{thread_id}       Delete the thread's checkpoints.
+        GET  /stats                       `AgentRuntime.stats` and `runtime_stats`.
+        GET  /health                      Liveness probe.
+    """
+
+    async def start_turn(request: Request):
+        thread_id = request.path_params["thread_id"]
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        prompt = body.get("prompt") if isinstance(body, dict) else None
+        if not isinstance(prompt, str) or not prompt.strip():
+            return JSONResponse({"error": "A non-empty 'prompt' is required"}, status_code=400)
+        try:
+            turn = runtime.submit(thread_id, prompt)
+        except ThreadBusyError as e:
+            return JSONResponse({"error": str(e)}, status_code=409)
+        except QueueFullError as e:
+            return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "5"})
+        return JSONResponse({"thread_id": thread_id, "turn_id": turn.turn_id}, status_code=202)
+
+    async def follow_turn(request: Request):
+        turn = runtime.turns.get(request.path_params["thread_id"])
+        if turn is None:
+            return JSONResponse({"error": "No turn on this thread"}, status_code=404)
+        after = request.query_params.get("after", request.headers.get("last-event-id", "-1"))
+        try:
+            after = int(after)
+        except ValueError:
+            return JSONResponse({"error": f"Invalid event id: {after!r}"}, status_code=400)
+        return StreamingResponse(
+            turn.follow(after),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    async def delete_thread(request: Request):
+        thread_id = request.path_params["thread_id"]
+        turn = runtime.turns.get(thread_id)
+        if turn is not None and not turn.finished:
+            return JSONResponse({"error": f"Thread {thread_id} has a turn in progress"}, status_code=409)
+        runtime.turns.pop(thread_id, None)
+        if checkpointer is not None:
+            await checkpointer.adelete_thread(thread_id)
+        return JSONResponse({"thread_id": thread_id, "deleted": True})
+
+    async def stats(request: Request):
+        # The checkpointer and caches query SQLite; keep that off the loop
+        data = await asyncio.to_thread(runtime_stats, checkpointer)
+        return JSONResponse({"turns": runtime.stats(), **data})
+
+    async def health(request: Request):
+        return JSONResponse({"status": "ok"})
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: Starlette):
+        yield
+        await runtime.shutdown()
+
+    return Starlette(
+        routes=[
+            Route("/threads/{thread_id}/turns", start_turn, methods=["POST"]),
+            Route("/threads/{thread_id}/events", follow_turn),
+            Route("/threads/{thread_id}", delete_thread, methods=["DELETE"]),
+            Route("/stats", stats),
+            Route("/health", health),
+        ],
+        lifespan=lifespan,
+    )
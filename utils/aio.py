@@ -0,0 +1,54 @@
+import asyncio
+import threading
+from typing import AsyncIterator, Awaitable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the process-wide event loop running on a background thread.
+
+    Async agent runs and async clients (Tavily, OpenAI) live on this one loop,
+    so connection pools bound to it stay valid across turns and sessions.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="agent-event-loop", daemon=True
+            ).start()
+        return _loop
+
+
+def run_sync(coro: Awaitable[T], timeout: float | None = None) -> T:
+    """Run a coroutine on the background loop and block until it finishes."""
+    future = asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+    return future.result(timeout)
+
+
+def iterate_sync(agen: AsyncIterator[T]) -> Iterator[T]:
+    """
+    Drive an async iterator on the background loop from synchronous code.
+
+    Example:
+        for step in iterate_sync(agent.astream(inputs, config=config)):
+            ...
+    """
+    loop = get_event_loop()
+    try:
+        while True:
+            future = asyncio.run_coroutine_threadsafe(agen.__anext__(), loop)
+            try:
+                item = future.result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        aclose = getattr(agen, "aclose", None)
+        if aclose is not None:
+            asyncio.run_coroutine_threadsafe(aclose(), loop).result()
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import os
+import re
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import Callable
+
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
+
+from tools.governor import format_governor_stats, governor_stats
+
+from .print_msg import print_message
+from .streaming import text_of, iter_agent_events
+from .tracing import TurnTracer
+
+load_dotenv()
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+_timeout = os.getenv("BATCH_PROMPT_TIMEOUT")
+BATCH_PROMPT_TIMEOUT = float(_timeout) if _timeout else None
+# Each batch prompt gets its own sandbox subdirectory under this one; kept out of
+# the interactive sandbox, whose index and file listing would pick the reports up
+BATCH_SANDBOX_DIR = os.getenv("BATCH_SANDBOX_DIR", "./batch_sandbox")
+
+
+def read_prompts(path: str) -> list[dict]:
+    """
+    Read batch prompts from a JSONL file.
+
+    Each line is an object with a 'prompt' and an optional 'id'; lines
+    without an id are identified by their line number, so a resumed run
+    matches them up as long as the file is unchanged.
+    """
+    prompts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"prompt": item}
+            if not item.get("prompt"):
+                raise ValueError(f"{path}:{number}: missing 'prompt'")
+            item["id"] = str(item.get("id") or f"line-{number}")
+            prompts.append(item)
+    return prompts
+
+
+def finished_ids(path: str) -> set[str]:
+    """Return the ids already completed successfully in an output JSONL file."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash; that prompt is simply rerun
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+def _sandbox_name(prompt_id: str) -> str:
+    return re.sub(r"[^\w.-]", "_", prompt_id)[:100] or "prompt"
+
+
+async def run_prompt(
+    agent, item: dict, thread_id: str, timeout: float | None = None, console=None
+) -> dict:
+    """
+    Research one prompt and return its result record.
+
+    Returns:
+        dict: 'report' (the final answer), 'tool_trace' (calls and result
+            sizes in order), 'status' ('ok' or 'error'), 'latency_s' and
+            'performance' (time per model/tool category and slowest steps).
+    """
+    tracer = TurnTracer(thread_id, item["prompt"])
+    config: RunnableConfig = {
+        "configurable": {"thread_id": thread_id},
+        "callbacks": [tracer],
+    }
+    trace: list[dict] = []
+    report = ""
+
+    async def consume():
+        nonlocal report
+        stream = agent.astream(
+            {"messages": [HumanMessage(content=item["prompt"])]},
+            config=config,
+            stream_mode=["updates"],
+        )
+        async for event in stream:
+            for kind, payload in iter_agent_events([event]):
+                if kind == "tool_call":
+                    trace.append({"tool": payload["name"], "args": payload["args"]})
+                elif kind == "tool_result":
+                    trace.append(
+                        {
+                            "tool_result": payload.name,
+                            "status": getattr(payload, "status", None),
+                            "chars": len(str(payload.content)),
+                        }
+                    )
+                    print_message(console=console, msg=payload)
+                elif kind == "message":
+                    if text_of(payload.content):
+                        report = text_of(payload.content)
+                    print_message(console=console, msg=payload)
+
+    started = time.perf_counter()
+    record = {
+        "id": item["id"],
+        "prompt": item["prompt"],
+        "thread_id": thread_id,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+    }
+    try:
+        await asyncio.wait_for(consume(), timeout)
+        record["status"] = "ok"
+    except asyncio.TimeoutError:
+        record.update(status="error", error=f"timed out after {timeout:g}s")
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+    summary = tracer.finish(error=record.get("error"))
+    summary.pop("steps")
+    record.update(
+        latency_s=round(time.perf_counter() - started, 3),
+        report=report,
+        tool_trace=trace,
+        performance=summary,
+    )
+    return record
+
+
+async def run_batch(
+    prompts_path: str,
+    output_path: str,
+    agent_factory: Callable[[str], object],
+    workers: int = BATCH_WORKERS,
+    timeout: float | None = BATCH_PROMPT_TIMEOUT,
+    console=None,
+) -> dict:
+    """
+    Research every prompt of a JSONL file with up to `workers` agents at a time.
+
+    Each prompt runs in its own agent thread and sandbox subdirectory, and its
+    record is appended to `output_path` as soon as it finishes. Prompts that
+    already have a successful record there are skipped, so an interrupted
+    batch resumes where it stopped.
+
+    Args:
+        prompts_path: Input JSONL with 'prompt' (and optionally 'id') per line.
+        output_path: Output JSONL, appended to.
+        agent_factory: Builds an agent whose sandbox is the given directory.
+        workers: Maximum number of prompts in flight.
+        timeout: Seconds allowed per prompt, or None.
+        console: Rich console for message panels, or None to run quietly.
+
+    Returns:
+        dict: Run statistics (see `format_stats`).
+    """
+    prompts = read_prompts(prompts_path)
+    done = finished_ids(output_path)
+    pending = [item for item in prompts if item["id"] not in done]
+    semaphore = asyncio.Semaphore(max(1, workers))
+    latencies: list[float] = []
+    failed = 0
+    started = time.perf_counter()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "a", encoding="utf-8") as output:
+
+        async def worker(item: dict):
+            nonlocal failed
+            async with semaphore:
+                root_dir = os.path.join(BATCH_SANDBOX_DIR, _sandbox_name(item["id"]))
+                os.makedirs(root_dir, exist_ok=True)
+                agent = agent_factory(root_dir)
+                thread_id = f"batch-{item['id']}"
+                record = await run_prompt(agent, item, thread_id, timeout, console)
+            record["sandbox"] = root_dir
+            output.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            output.flush()
+            latencies.append(record["latency_s"])
+            if record["status"] != "ok":
+                failed += 1
+            if console is None:
+                print(f"[{record['status']}] {item['id']} in {record['latency_s']:.1f}s")
+
+        await asyncio.gather(*(worker(item) for item in pending))
+
+    elapsed = time.perf_counter() - started
+    return {
+        "prompts": len(prompts),
+        "skipped": len(prompts) - len(pending),
+        "completed": len(pending) - failed,
+        "failed": failed,
+        "elapsed_s": elapsed,
+        "throughput_per_min": len(pending) / elapsed * 60 if elapsed and pending else 0.0,
+        "latencies_s": sorted(latencies),
+        "upstream": governor_stats(),
+    }
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1]
+
+
+def format_stats(stats: dict) -> str:
+    """Summarize a batch run: counts, throughput, latency percentiles and API rate limiting."""
+    lines = [
+        f"Prompts: {stats['prompts']} "
+        f"(completed {stats['completed']}, failed {stats['failed']}, "
+        f"skipped {stats['skipped']} already done)",
+        f"Wall time: {stats['elapsed_s']:.1f} s, "
+        f"throughput: {stats['throughput_per_min']:.2f} prompts/min",
+    ]
+    latencies = stats["latencies_s"]
+    if latencies:
+        lines.append(
+            "Latency per prompt (s): "
+            f"mean {statistics.fmean(latencies):.1f}, "
+            f"p50 {_percentile(latencies, 50):.1f}, "
+            f"p90 {_percentile(latencies, 90):.1f}, "
+            f"p99 {_percentile(latencies, 99):.1f}, "
+            f"max {latencies[-1]:.1f}"
+        )
+    if stats.get("upstream"):
+        lines.append(format_governor_stats(stats["upstream"]))
+    return "\n".join(lines)
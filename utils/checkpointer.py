@@ -0,0 +1,432 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, Sequence
+
+from dotenv import load_dotenv
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from config import CACHE_DIR
+
+load_dotenv()
+
+# "sqlite" (durable, default) or "memory"
+CHECKPOINTER = os.getenv("CHECKPOINTER", "sqlite").lower()
+CHECKPOINT_DB_PATH = os.getenv(
+    "CHECKPOINT_DB_PATH", os.path.join(CACHE_DIR, "checkpoints.sqlite")
+)
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "20"))
+CHECKPOINT_THREAD_TTL = float(os.getenv("CHECKPOINT_THREAD_TTL", str(7 * 24 * 3600)))
+CHECKPOINT_COMPACT_INTERVAL = float(os.getenv("CHECKPOINT_COMPACT_INTERVAL", "600"))
+
+
+class _Compactor:
+    """Daemon thread that calls `saver.compact()` every `interval` seconds."""
+
+    def __init__(self, saver, interval: float):
+        self._saver = saver
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="checkpoint-compactor", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self._saver.compact()
+            except Exception as e:
+                print(f"Checkpoint compaction failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+
+class DurableSqliteSaver(SqliteSaver):
+    """
+    SQLite checkpointer with a retention policy and background compaction.
+
+    Only the newest `keep_last` checkpoints of each thread/namespace are kept,
+    and threads idle for longer than `thread_ttl` seconds are dropped. Every
+    stored checkpoint carries its full channel values, so older ones can be
+    removed without affecting the state the agent resumes from.
+
+    The async methods run the synchronous SQLite calls in a worker thread, so
+    the saver can back agents driven with `astream`.
+
+    Args:
+        path (str): Location of the SQLite database file.
+        keep_last (int): Checkpoints kept per thread and namespace.
+        thread_ttl (float): Seconds of inactivity after which a thread is deleted.
+    """
+
+    def __init__(
+        self,
+        path: str = CHECKPOINT_DB_PATH,
+        keep_last: int = CHECKPOINT_KEEP_LAST,
+        thread_ttl: float = CHECKPOINT_THREAD_TTL,
+    ):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        super().__init__(sqlite3.connect(path, check_same_thread=False))
+        self.path = path
+        self.keep_last = max(1, keep_last)
+        self.thread_ttl = thread_ttl
+        self.last_compaction: dict = {}
+        self._compactor: _Compactor | None = None
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        # Only takes effect on a new database; lets compaction return pages to the OS.
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        super().setup()
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS thread_activity (
+                thread_id TEXT PRIMARY KEY,
+                last_seen REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, last_seen) VALUES (?, ?)",
+                (str(config["configurable"]["thread_id"]), time.time()),
+            )
+        return next_config
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute(
+                "DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),)
+            )
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await asyncio.to_thread(
+            self.put_writes, config, writes, task_id, task_path
+        )
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def compact(self) -> dict:
+        """
+        Apply the retention policy and reclaim disk space.
+
+        Returns:
+            dict: Threads expired, checkpoints and writes deleted, and duration.
+        """
+        started = time.perf_counter()
+        cutoff = time.time() - self.thread_ttl
+        with self.cursor() as cur:
+            expired = [
+                row[0]
+                for row in cur.execute(
+                    "SELECT thread_id FROM thread_activity WHERE last_seen < ?",
+                    (cutoff,),
+                ).fetchall()
+            ]
+        for thread_id in expired:
+            self.delete_thread(thread_id)
+
+        with self.cursor() as cur:
+            cur.execute(
+                """
+                DELETE FROM checkpoints WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, ROW_NUMBER() OVER (
+                            PARTITION BY thread_id, checkpoint_ns
+                            ORDER BY checkpoint_id DESC
+                        ) AS position
+                        FROM checkpoints
+                    ) WHERE position > ?
+                )
+                """,
+                (self.keep_last,),
+            )
+            checkpoints_deleted = cur.rowcount
+            cur.execute(
+                """
+                DELETE FROM writes WHERE NOT EXISTS (
+                    SELECT 1 FROM checkpoints c
+                    WHERE c.thread_id = writes.thread_id
+                      AND c.checkpoint_ns = writes.checkpoint_ns
+                      AND c.checkpoint_id = writes.checkpoint_id
+                )
+                """
+            )
+            writes_deleted = cur.rowcount
+
+        with self.cursor() as cur:
+            cur.execute("PRAGMA incremental_vacuum")
+            cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        self.last_compaction = {
+            "at": time.time(),
+            "threads_expired": len(expired),
+            "checkpoints_deleted": checkpoints_deleted,
+            "writes_deleted": writes_deleted,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        return self.last_compaction
+
+    def start_compaction(self, interval: float = CHECKPOINT_COMPACT_INTERVAL):
+        """Run `compact()` on a daemon thread every `interval` seconds."""
+        if self._compactor is None and interval > 0:
+            self._compactor = _Compactor(self, interval)
+
+    def metrics(self) -> dict:
+        """Return row counts and on-disk size of the checkpoint store."""
+        with self.cursor(transaction=False) as cur:
+            threads = cur.execute(
+                "SELECT COUNT(DISTINCT thread_id) FROM checkpoints"
+            ).fetchone()[0]
+            checkpoints = cur.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+            writes = cur.execute("SELECT COUNT(*) FROM writes").fetchone()[0]
+        disk_bytes = 0
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                disk_bytes += os.path.getsize(self.path + suffix)
+            except OSError:
+                pass
+        return {
+            "backend": "sqlite",
+            "threads": threads,
+            "checkpoints": checkpoints,
+            "writes": writes,
+            "disk_bytes": disk_bytes,
+            "last_compaction": self.last_compaction,
+        }
+
+
+class PrunableMemorySaver(InMemorySaver):
+    """
+    In-memory checkpointer with the same retention policy as `DurableSqliteSaver`.
+
+    Only the newest `keep_last` checkpoints of each thread/namespace (and the
+    channel blobs they reference) are kept, and threads idle for longer than
+    `thread_ttl` seconds are dropped. Reads and writes take the same lock as
+    the background compaction, so they never see the dicts change under them.
+
+    Args:
+        keep_last (int): Checkpoints kept per thread and namespace.
+        thread_ttl (float): Seconds of inactivity after which a thread is deleted.
+    """
+
+    def __init__(
+        self,
+        keep_last: int = CHECKPOINT_KEEP_LAST,
+        thread_ttl: float = CHECKPOINT_THREAD_TTL,
+    ):
+        super().__init__()
+        self.keep_last = max(1, keep_last)
+        self.thread_ttl = thread_ttl
+        self.last_compaction: dict = {}
+        self._last_seen: dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._compactor: _Compactor | None = None
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        with self._lock:
+            return super().get_tuple(config)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        # Materialized under the lock: a lazy generator would iterate the
+        # dicts while the compactor deletes from them
+        with self._lock:
+            items = [*super().list(config, filter=filter, before=before, limit=limit)]
+        yield from items
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with self._lock:
+            self._last_seen[str(config["configurable"]["thread_id"])] = time.time()
+            return super().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with self._lock:
+            return super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._last_seen.pop(str(thread_id), None)
+            super().delete_thread(thread_id)
+
+    def _prune_thread(self, thread_id: str) -> int:
+        deleted = 0
+        for checkpoint_ns, by_id in list(self.storage.get(thread_id, {}).items()):
+            doomed = sorted(by_id, reverse=True)[self.keep_last :]
+            if not doomed:
+                continue
+            for checkpoint_id in doomed:
+                del by_id[checkpoint_id]
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            deleted += len(doomed)
+            referenced = set()
+            for saved, _, _ in by_id.values():
+                kept = self.serde.loads_typed(saved)
+                referenced.update(kept.get("channel_versions", {}).items())
+            for key in [
+                k
+                for k in self.blobs
+                if k[0] == thread_id
+                and k[1] == checkpoint_ns
+                and (k[2], k[3]) not in referenced
+            ]:
+                del self.blobs[key]
+        return deleted
+
+    def compact(self) -> dict:
+        """
+        Apply the retention policy.
+
+        Returns:
+            dict: Threads expired, checkpoints deleted, and duration.
+        """
+        started = time.perf_counter()
+        cutoff = time.time() - self.thread_ttl
+        with self._lock:
+            expired = [t for t, seen in self._last_seen.items() if seen < cutoff]
+            for thread_id in expired:
+                self.delete_thread(thread_id)
+            checkpoints_deleted = sum(
+                self._prune_thread(thread_id) for thread_id in list(self.storage)
+            )
+        self.last_compaction = {
+            "at": time.time(),
+            "threads_expired": len(expired),
+            "checkpoints_deleted": checkpoints_deleted,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        return self.last_compaction
+
+    def start_compaction(self, interval: float = CHECKPOINT_COMPACT_INTERVAL):
+        """Run `compact()` on a daemon thread every `interval` seconds."""
+        if self._compactor is None and interval > 0:
+            self._compactor = _Compactor(self, interval)
+
+    def metrics(self) -> dict:
+        """Return thread/checkpoint counts and the approximate size of stored blobs."""
+        with self._lock:
+            return self._metrics()
+
+    def _metrics(self) -> dict:
+        checkpoints = sum(
+            len(by_id) for by_ns in self.storage.values() for by_id in by_ns.values()
+        )
+        memory_bytes = sum(
+            len(item[0][1])
+            for by_ns in self.storage.values()
+            for by_id in by_ns.values()
+            for item in by_id.values()
+        ) + sum(
+            len(blob[1]) for blob in self.blobs.values() if isinstance(blob[1], bytes)
+        )
+        return {
+            "backend": "memory",
+            "threads": len(self.storage),
+            "checkpoints": checkpoints,
+            "memory_bytes": memory_bytes,
+            "last_compaction": self.last_compaction,
+        }
+
+
+_checkpointer: BaseCheckpointSaver | None = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer() -> BaseCheckpointSaver:
+    """
+    Return the process-wide checkpointer selected by `CHECKPOINTER`.
+
+    The first call builds it and starts background compaction.
+    """
+    global _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            if CHECKPOINTER == "memory":
+                _checkpointer = PrunableMemorySaver()
+            elif CHECKPOINTER == "sqlite":
+                _checkpointer = DurableSqliteSaver()
+            else:
+                raise ValueError(
+                    f"Unknown CHECKPOINTER {CHECKPOINTER!r}; expected 'sqlite' or 'memory'."
+                )
+            _checkpointer.start_compaction()
+        return _checkpointer
@@ -0,0 +1,379 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+
+from dotenv import load_dotenv
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+
+from config import CACHE_DIR
+from tools.registry import record_cache_lookup
+
+from .llm import CODER_LLM_MODEL_NAME, build_fast_model
+from .streaming import text_of
+
+load_dotenv()
+
+# Large search and crawl outputs are condensed by the fast model (CODER_LLM_*)
+# before the main model sees them; without a fast model configured nothing changes.
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "True").lower() == "true"
+COMPRESSION_TOOLS = {
+    name.strip()
+    for name in os.getenv(
+        "COMPRESSION_TOOLS", "internet_search,internet_search_many,crawl_url"
+    ).split(",")
+    if name.strip()
+}
+# A tool output is condensed when it is at least this long (characters), and
+# within it every source text of at least COMPRESSION_ITEM_MIN_CHARS
+COMPRESSION_MIN_CHARS = int(os.getenv("COMPRESSION_MIN_CHARS", "4000"))
+COMPRESSION_ITEM_MIN_CHARS = int(os.getenv("COMPRESSION_ITEM_MIN_CHARS", "1500"))
+# Source text beyond this many characters is cut before it reaches the fast model
+COMPRESSION_MAX_INPUT_CHARS = int(os.getenv("COMPRESSION_MAX_INPUT_CHARS", "32000"))
+COMPRESSION_CACHE_ENABLED = os.getenv("COMPRESSION_CACHE_ENABLED", "True").lower() == "true"
+COMPRESSION_CACHE_PATH = os.getenv(
+    "COMPRESSION_CACHE_PATH", os.path.join(CACHE_DIR, "compression_cache.sqlite")
+)
+COMPRESSION_CACHE_MAX_ENTRIES = int(os.getenv("COMPRESSION_CACHE_MAX_ENTRIES", "20000"))
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(100 * 1024**2)))
+
+# Fields holding source text in search results, crawled pages and passages
+TEXT_FIELDS = ("raw_content", "content", "passage")
+
+EXTRACTION_PROMPT = """You condense web sources for a research assistant.
+List the facts in the source that help answer the question, as short bullet points.
+Keep numbers, names, dates and quotes exact, and end every bullet with the source URL in square brackets.
+Leave out navigation, ads and anything unrelated to the question. Do not add facts that are not in the source.
+If nothing in the source is relevant, answer exactly: No relevant facts."""
+
+
+class CompressionCache:
+    """
+    SQLite-backed store of condensed source texts with LRU eviction.
+
+    Entries are keyed by a hash of the fast model's name, the question and
+    the source text, so a page read again for the same question is never
+    condensed twice.
+
+    Args:
+        path (str): Location of the SQLite database file.
+        max_entries (int): Entries kept before least-recently-used ones are evicted.
+        max_bytes (int): Total payload size kept before LRU eviction.
+    """
+
+    def __init__(
+        self,
+        path: str = COMPRESSION_CACHE_PATH,
+        max_entries: int = COMPRESSION_CACHE_MAX_ENTRIES,
+        max_bytes: int = COMPRESSION_CACHE_MAX_BYTES,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS compressed (
+                key TEXT PRIMARY KEY,
+                facts TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS compressed_lru ON compressed (last_access);
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, question: str, text: str) -> str:
+        return sha256(f"{model}\x00{question}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT facts FROM compressed WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._conn.execute(
+                    "UPDATE compressed SET last_access = ? WHERE key = ?", (time.time(), key)
+                )
+                self._conn.commit()
+        record_cache_lookup(hits=int(row is not None), misses=int(row is None))
+        return row[0] if row else None
+
+    def put(self, key: str, facts: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO compressed (key, facts, size, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (key, facts, len(facts.encode("utf-8")), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM compressed"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM compressed ORDER BY last_access ASC"
+        ).fetchall()
+        doomed = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM compressed WHERE key = ?", doomed)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size of the store."""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM compressed"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
+
+
+def _question(state) -> str:
+    """The user's latest message, which the condensed facts have to serve."""
+    messages = state.get("messages", []) if isinstance(state, dict) else getattr(state, "messages", [])
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return text_of(message.content)[:2000]
+    return ""
+
+
+def _sources(content: str) -> tuple[dict | None, list[tuple[dict, str]]]:
+    """
+    Find the source texts worth condensing in a tool output.
+
+    Returns:
+        The parsed output (None when it is not JSON) and (item, field) pairs;
+        for plain-text output a single pseudo item holds the whole text.
+    """
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return None, [({"text": content}, "text")]
+    if not isinstance(data, dict):
+        return None, [({"text": content}, "text")]
+    found = []
+    for item in data.get("results", []):
+        if not isinstance(item, dict):
+            continue
+        for field in TEXT_FIELDS:
+            text = item.get(field)
+            if isinstance(text, str) and len(text) >= COMPRESSION_ITEM_MIN_CHARS:
+                found.append((item, field))
+    return data, found
+
+
+class CompressionMiddleware(AgentMiddleware):
+    """
+    Agent middleware that condenses large search and crawl outputs with a fast
+    model before they enter the main model's context.
+
+    Every long source text in a tool output (a search result, a crawled page)
+    is reduced, concurrently, to the facts relevant to the user's question,
+    each citing its URL. Condensed texts are cached by content hash. A source
+    the fast model fails on is passed through unchanged.
+
+    Args:
+        model: The fast chat model (see `utils.llm.build_fast_model`).
+        cache (CompressionCache): Store of condensed texts, or None.
+        tool_names (set[str]): Names of the tools whose outputs are condensed.
+    """
+
+    def __init__(
+        self, model, cache: CompressionCache | None = None, tool_names=COMPRESSION_TOOLS
+    ):
+        super().__init__()
+        self.model = model
+        self.cache = cache
+        # Not `tools`: middleware use that attribute to contribute tools of their own
+        self.tool_names = set(tool_names)
+        self.model_name = getattr(model, "model_name", None) or CODER_LLM_MODEL_NAME or ""
+        self._lock = threading.Lock()
+        self._metrics = {
+            "outputs": 0,
+            "sources": 0,
+            "chars_in": 0,
+            "chars_out": 0,
+            "failures": 0,
+        }
+
+    def _prompt(self, question: str, item: dict, text: str) -> list:
+        url = item.get("url") or "unknown source"
+        title = item.get("title") or item.get("heading") or ""
+        return [
+            SystemMessage(EXTRACTION_PROMPT),
+            HumanMessage(
+                f"Question: {question or 'not stated'}\n\n"
+                f"Source: {url}\n{title}\n\n{text[:COMPRESSION_MAX_INPUT_CHARS]}"
+            ),
+        ]
+
+    def _wants(self, request, result) -> str | None:
+        """The output of a call worth condensing, or None."""
+        if request.tool_call["name"] not in self.tool_names or not isinstance(result, ToolMessage):
+            return None
+        content = result.content
+        if result.status == "error" or not isinstance(content, str):
+            return None
+        if len(content) < COMPRESSION_MIN_CHARS or content.startswith("Error"):
+            return None
+        return content
+
+    def _cached(self, key: str) -> str | None:
+        return self.cache.get(key) if self.cache is not None else None
+
+    def _store(self, key: str, facts: str) -> str:
+        facts = facts.strip()
+        if self.cache is not None:
+            self.cache.put(key, facts)
+        return facts
+
+    def _condense(self, question: str, item: dict, text: str) -> str:
+        key = CompressionCache.make_key(self.model_name, question, text)
+        facts = self._cached(key)
+        if facts is None:
+            try:
+                reply = self.model.invoke(self._prompt(question, item, text))
+            except Exception as e:
+                print(f"Compression of {item.get('url', 'tool output')} failed: {e}")
+                self._count(failures=1)
+                return text
+            facts = self._store(key, text_of(reply.content))
+        return facts
+
+    async def _acondense(self, question: str, item: dict, text: str) -> str:
+        key = CompressionCache.make_key(self.model_name, question, text)
+        facts = await asyncio.to_thread(self._cached, key)
+        if facts is None:
+            try:
+                reply = await self.model.ainvoke(self._prompt(question, item, text))
+            except Exception as e:
+                print(f"Compression of {item.get('url', 'tool output')} failed: {e}")
+                self._count(failures=1)
+                return text
+            facts = await asyncio.to_thread(self._store, key, text_of(reply.content))
+        return facts
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                self._metrics[name] += value
+
+    def _rebuild(self, result: ToolMessage, content: str, data, sources, condensed) -> ToolMessage:
+        changed = 0
+        for (item, field), facts in zip(sources, condensed):
+            if facts != item[field]:
+                item["condensed_from_chars"] = len(item[field])
+                item[field] = facts
+                changed += 1
+        if not changed:
+            return result
+        if data is None:
+            new_content = condensed[0]
+        else:
+            note = "Long sources were condensed to the facts relevant to the question."
+            data["note"] = f"{data['note']} {note}" if data.get("note") else note
+            new_content = json.dumps(data, ensure_ascii=False)
+        self._count(
+            outputs=1, sources=changed, chars_in=len(content), chars_out=len(new_content)
+        )
+        return result.model_copy(update={"content": new_content})
+
+    def wrap_tool_call(self, request, handler):
+        result = handler(request)
+        content = self._wants(request, result)
+        if content is None:
+            return result
+        data, sources = _sources(content)
+        if not sources:
+            return result
+        question = _question(request.state)
+        with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+            condensed = list(
+                executor.map(
+                    lambda source: self._condense(question, source[0], source[0][source[1]]),
+                    sources,
+                )
+            )
+        return self._rebuild(result, content, data, sources, condensed)
+
+    async def awrap_tool_call(self, request, handler):
+        result = await handler(request)
+        content = self._wants(request, result)
+        if content is None:
+            return result
+        data, sources = _sources(content)
+        if not sources:
+            return result
+        question = _question(request.state)
+        condensed = await asyncio.gather(
+            *(self._acondense(question, item, item[field]) for item, field in sources)
+        )
+        return self._rebuild(result, content, data, sources, condensed)
+
+    def stats(self) -> dict:
+        """Return how many outputs and sources were condensed and the characters saved."""
+        with self._lock:
+            stats = dict(self._metrics)
+        stats["chars_saved"] = stats["chars_in"] - stats["chars_out"]
+        stats["cache"] = self.cache.stats() if self.cache is not None else None
+        return stats
+
+
+_middleware: CompressionMiddleware | None = None
+_middleware_lock = threading.Lock()
+
+
+def get_compression_middleware() -> CompressionMiddleware | None:
+    """Return the process-wide compression middleware, or None when disabled or no fast model is configured."""
+    global _middleware
+    if not COMPRESSION_ENABLED:
+        return None
+    with _middleware_lock:
+        if _middleware is None:
+            model = build_fast_model()
+            if model is None:
+                return None
+            cache = CompressionCache() if COMPRESSION_CACHE_ENABLED else None
+            _middleware = CompressionMiddleware(model, cache)
+        return _middleware
+
+
+def agent_middleware() -> list[AgentMiddleware]:
+    """Middleware to pass to `create_deep_agent`: the compression stage, when enabled."""
+    middleware = get_compression_middleware()
+    return [middleware] if middleware is not None else []
@@ -0,0 +1,51 @@
+import mmap
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Approximate size of one page in the sidebar file viewer
+FILE_VIEWER_PAGE_BYTES = int(os.getenv("FILE_VIEWER_PAGE_BYTES", str(32 * 1024)))
+
+
+def _page_start(mm: mmap.mmap, index: int, page_bytes: int) -> int:
+    """Offset where page `index` starts: just after the first newline past its nominal start."""
+    if index <= 0:
+        return 0
+    nominal = index * page_bytes
+    if nominal >= len(mm):
+        return len(mm)
+    newline = mm.find(b"\n", nominal, nominal + page_bytes)
+    # A line longer than a page is cut at the nominal offset
+    return newline + 1 if newline != -1 else nominal
+
+
+def read_page(
+    path: str, page: int, page_bytes: int = FILE_VIEWER_PAGE_BYTES
+) -> tuple[str, int]:
+    """
+    Read one page of a file without loading the rest of it.
+
+    The file is memory-mapped and split into pages of about `page_bytes`,
+    moved forward to the next line break so lines are not split across pages.
+
+    Args:
+        path: File to read.
+        page: Zero-based page number; clamped to the valid range.
+        page_bytes: Nominal page size in bytes.
+
+    Returns:
+        tuple: (text of the page, total number of pages).
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return "", 1
+        pages = -(-size // page_bytes)
+        page = max(0, min(page, pages - 1))
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = _page_start(mm, page, page_bytes)
+            end = _page_start(mm, page + 1, page_bytes)
+            data = mm[start:end]
+    return data.decode("utf-8", errors="replace"), pages
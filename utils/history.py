@@ -0,0 +1,73 @@
+import os
+from functools import lru_cache
+
+import streamlit as st
+from dotenv import load_dotenv
+from langchain_core.messages import BaseMessage, HumanMessage
+
+load_dotenv()
+
+# Messages rendered in full; older ones are loaded this many at a time on request
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "10"))
+
+# Blocks written by `format_tool_call` / `format_tool_result` into saved transcripts
+_TOOL_PREFIXES = ("**Using Tool:**", "**Tool Result:**")
+
+
+@lru_cache(maxsize=1024)
+def split_transcript(message_id: str | None, content: str) -> tuple[str, tuple[str, ...]]:
+    """
+    Separate an assistant transcript into its prose and its tool-call lines.
+
+    Memoized on the message id and content, so a rerun does not re-split
+    messages it has already seen.
+
+    Returns:
+        tuple: (Markdown without tool lines, tool lines in order).
+    """
+    body, tools = [], []
+    for block in content.split("\n\n"):
+        (tools if block.startswith(_TOOL_PREFIXES) else body).append(block)
+    return "\n\n".join(body), tuple(tools)
+
+
+def _render_message(msg: BaseMessage, key: str):
+    content = msg.content if isinstance(msg.content, str) else str(msg.content)
+    if isinstance(msg, HumanMessage):
+        with st.chat_message("user"):
+            st.markdown(content)
+        return
+    body, tools = split_transcript(msg.id, content)
+    with st.chat_message("assistant"):
+        if tools:
+            # Tool transcripts are only rendered when asked for
+            if st.toggle(f"Show {len(tools)} tool steps", key=f"tools_{key}"):
+                st.markdown("\n\n".join(tools))
+        st.markdown(body)
+
+
+def render_history(messages: list[BaseMessage], window: int = HISTORY_WINDOW):
+    """
+    Render the chat history through a window over its most recent messages.
+
+    Only the newest `st.session_state["history_window"]` messages are rendered;
+    a button loads `window` more at a time. Tool steps of assistant messages
+    sit behind a toggle, so long sessions cost about the same per rerun as
+    short ones.
+
+    Args:
+        messages: The chat history, oldest first.
+        window: Messages rendered initially and added per "show earlier" click.
+    """
+    shown = st.session_state.setdefault("history_window", window)
+    hidden = max(0, len(messages) - shown)
+    if hidden:
+        if st.button(
+            f"Show {min(window, hidden)} earlier messages ({hidden} hidden)",
+            key="history_show_earlier",
+        ):
+            st.session_state["history_window"] = shown + window
+            st.rerun()
+    for index in range(hidden, len(messages)):
+        msg = messages[index]
+        _render_message(msg, msg.id or str(index))
@@ -0,0 +1,315 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from hashlib import sha256
+
+from dotenv import load_dotenv
+from langchain_core.caches import BaseCache
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, Generation
+from langchain_openai import ChatOpenAI
+
+from config import CACHE_DIR
+from tools.governor import get_async_http_client, get_http_client
+from tools.registry import record_cache_lookup
+
+load_dotenv()
+
+MAIN_LLM_BASE_URL = os.getenv("MAIN_LLM_BASE_URL")
+MAIN_LLM_API_KEY = os.getenv("MAIN_LLM_API_KEY")
+MAIN_LLM_MODEL_NAME = os.getenv("MAIN_LLM_MODEL_NAME")
+TEMPERATURE = float(os.getenv("TEMPERATURE", "0.1"))
+
+# Small, fast model that condenses large tool outputs (see utils.compression)
+CODER_LLM_BASE_URL = os.getenv("CODER_LLM_BASE_URL")
+CODER_LLM_API_KEY = os.getenv("CODER_LLM_API_KEY")
+CODER_LLM_MODEL_NAME = os.getenv("CODER_LLM_MODEL_NAME")
+
+# "off" (default) calls the model every time, "readwrite" serves identical
+# requests from the cache, "record" always calls the model and stores its
+# answers, "replay" serves recorded answers only and never calls the model.
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "off").lower()
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(CACHE_DIR, "llm_cache.sqlite"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(500 * 1024**2)))
+
+# Serialized ChatOpenAI fields that do not change what the model answers
+# (stream_usage only asks for token counts, and defaults differently per endpoint)
+_CONNECTION_SETTINGS = {
+    "openai_api_base",
+    "openai_api_key",
+    "openai_organization",
+    "openai_proxy",
+    "request_timeout",
+    "max_retries",
+    "default_headers",
+    "default_query",
+    "stream_usage",
+}
+
+# Message fields LangChain keeps for bookkeeping but never sends to the model;
+# token usage in particular differs between a live and a cached answer.
+_BOOKKEEPING_FIELDS = ("id", "response_metadata", "usage_metadata")
+
+# Classes a cache entry may deserialize to
+_CACHED_CLASSES = [Generation, ChatGeneration, ChatGenerationChunk, AIMessage, AIMessageChunk]
+
+
+def _request_messages(prompt: str) -> str:
+    """Reduce a serialized message list to the parts that are sent to the model."""
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt
+    for message in messages if isinstance(messages, list) else []:
+        fields = message.get("kwargs") if isinstance(message, dict) else None
+        if isinstance(fields, dict):
+            for name in _BOOKKEEPING_FIELDS:
+                fields.pop(name, None)
+    return json.dumps(messages, sort_keys=True)
+
+
+class LLMResponseCache(BaseCache):
+    """
+    SQLite-backed exact-match cache of chat model responses with LRU eviction.
+
+    Entries are keyed by the model settings (name, temperature, ...), the call
+    parameters such as bound tool schemas, and the message list as sent to the
+    model, so only identical requests are served from the cache.
+
+    Args:
+        path (str): Location of the SQLite database file.
+        mode (str): 'readwrite', 'record' or 'replay' (see `LLM_CACHE_MODE`).
+        max_entries (int): Entries kept before least-recently-used ones are evicted.
+        max_bytes (int): Total payload size kept before LRU eviction.
+    """
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        mode: str = "readwrite",
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+    ):
+        if mode not in ("readwrite", "record", "replay"):
+            raise ValueError(
+                f"Unknown LLM cache mode {mode!r}; expected 'readwrite', 'record' or 'replay'."
+            )
+        self.path = path
+        self.mode = mode
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS llm_cache_lru ON llm_cache (last_access);
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        """
+        Build the cache key from the serialized messages and model parameters.
+
+        Connection settings (endpoint, key, timeouts) are left out of the key,
+        so a run recorded against one endpoint replays against any other.
+        """
+        model, _, params = llm_string.partition("---")
+        try:
+            settings = json.loads(model).get("kwargs", {})
+        except ValueError:
+            settings = {"llm_string": model}
+        settings = {
+            name: value for name, value in settings.items() if name not in _CONNECTION_SETTINGS
+        }
+        raw = f"{json.dumps(settings, sort_keys=True)}\x00{params}\x00{_request_messages(prompt)}"
+        return sha256(raw.encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str):
+        """
+        Return the stored generations for a request, or None on a miss.
+
+        Raises:
+            LookupError: In replay mode, when the request was never recorded.
+        """
+        if self.mode == "record":
+            return None
+        key = self.make_key(prompt, llm_string)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                if self.mode != "replay":
+                    self._conn.execute(
+                        "UPDATE llm_cache SET last_access = ? WHERE key = ?",
+                        (time.time(), key),
+                    )
+                    self._conn.commit()
+        record_cache_lookup(hits=int(row is not None), misses=int(row is None))
+        if row is None:
+            if self.mode == "replay":
+                raise LookupError(
+                    "No recorded LLM response for this request; record the run "
+                    "with LLM_CACHE_MODE=record first."
+                )
+            return None
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", LangChainBetaWarning)
+            return loads(row[0], allowed_objects=_CACHED_CLASSES)
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        """Store generations, then evict least-recently-used entries over the size limits."""
+        if self.mode == "replay":
+            return
+        payload = dumps(return_val)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO llm_cache (key, response, size, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (
+                    self.make_key(prompt, llm_string),
+                    payload,
+                    len(payload.encode("utf-8")),
+                    now,
+                    now,
+                ),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM llm_cache ORDER BY last_access ASC"
+        ).fetchall()
+        doomed = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", doomed)
+
+    def clear(self, **kwargs):
+        """Drop every cached response and reset the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        """Return the mode, hit/miss counters and the current size of the store."""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
+
+
+_llm_cache: LLMResponseCache | None = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache | None:
+    """Return the process-wide LLM response cache, or None when `LLM_CACHE_MODE=off`."""
+    global _llm_cache
+    if LLM_CACHE_MODE == "off":
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMResponseCache(mode=LLM_CACHE_MODE)
+        return _llm_cache
+
+
+def build_chat_model() -> ChatOpenAI:
+    """
+    Create the main chat model from the MAIN_LLM_* settings, with the response
+    cache attached when `LLM_CACHE_MODE` enables it.
+
+    Requests go through the shared keep-alive clients of the "main_llm"
+    governor, which rate-limits and retries them (MAIN_LLM_RATE_LIMIT, ...),
+    so the OpenAI client's own retries are turned off.
+
+    Replaying recorded responses needs only the model name, which is part of
+    the cache key; the endpoint is never called.
+
+    Raises:
+        EnvironmentError: If the endpoint, key or model name is not configured.
+    """
+    replay = LLM_CACHE_MODE == "replay"
+    if not MAIN_LLM_MODEL_NAME or not replay and not all([MAIN_LLM_BASE_URL, MAIN_LLM_API_KEY]):
+        raise EnvironmentError(
+            "Missing one or more required environment variables: MAIN_LLM_BASE_URL, MAIN_LLM_API_KEY, MAIN_LLM_MODEL_NAME"
+        )
+    return ChatOpenAI(
+        base_url=MAIN_LLM_BASE_URL,
+        api_key=MAIN_LLM_API_KEY or "replay",
+        model=MAIN_LLM_MODEL_NAME,
+        temperature=TEMPERATURE,
+        cache=get_llm_cache(),
+        max_retries=0,
+        http_client=get_http_client("main_llm"),
+        http_async_client=get_async_http_client("main_llm"),
+    )
+
+
+def build_fast_model() -> ChatOpenAI | None:
+    """
+    Create the fast model from the CODER_LLM_* settings, or return None when
+    they are not configured.
+
+    Calls are tagged "compression", so traces tell them apart from the main
+    model, and "nostream", so their tokens stay out of the agent's message
+    stream and the chat. They go through the "coder_llm" governor.
+    """
+    if not all([CODER_LLM_BASE_URL, CODER_LLM_API_KEY, CODER_LLM_MODEL_NAME]):
+        return None
+    return ChatOpenAI(
+        base_url=CODER_LLM_BASE_URL,
+        api_key=CODER_LLM_API_KEY,
+        model=CODER_LLM_MODEL_NAME,
+        temperature=0,
+        tags=["compression", "nostream"],
+        max_retries=0,
+        http_client=get_http_client("coder_llm"),
+        http_async_client=get_async_http_client("coder_llm"),
+    )
@@ -5,6 +5,14 @@ from rich.markdown import Markdown
 
 
 def print_message(console, msg: BaseMessage):
+    """
+    Print a message as a Rich panel with its content rendered as Markdown.
+
+    Pass `console=None` to skip rendering entirely, e.g. in headless batch runs
+    where Markdown layout would only cost throughput.
+    """
+    if console is None:
+        return
 
     role = msg.type.capitalize()
     content = msg.content
@@ -0,0 +1,85 @@
+import os
+import subprocess
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+STARTUP_TIMING = os.getenv("STARTUP_TIMING", "False").lower() == "true"
+
+# Modules whose cold import time `benchmarks/startup_report.py` reports
+PROFILED_MODULES = [
+    "tools",
+    "tools.synbolic_math",
+    "tools.web_search",
+    "tools.web_crawler",
+    "langchain_openai",
+    "deepagents",
+    "streamlit",
+]
+
+
+class StartupTimer:
+    """Record labelled checkpoints during startup and summarize the time between them."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.marks: list[tuple[str, float]] = []
+        self.finished = False
+
+    def mark(self, label: str):
+        """Record that `label` finished now. Ignored once startup has finished."""
+        if not self.finished:
+            self.marks.append((label, time.perf_counter()))
+
+    def finish(self, label: str = "ready"):
+        """Record the last step and print the report when `STARTUP_TIMING=true`."""
+        if self.finished:
+            return
+        self.mark(label)
+        self.finished = True
+        if STARTUP_TIMING:
+            print(self.report())
+
+    def report(self) -> str:
+        """Return a table of each step's duration and the running total."""
+        lines = [f"{'step':<32}{'step s':>10}{'total s':>10}"]
+        previous = self.started
+        for label, at in self.marks:
+            lines.append(
+                f"{label:<32}{at - previous:>10.3f}{at - self.started:>10.3f}"
+            )
+            previous = at
+
+        # Lazily loaded tool modules, imported on first invocation
+        tools = sys.modules.get("tools")
+        for module, seconds in getattr(tools, "load_times", {}).items():
+            lines.append(f"{'first use: ' + module:<32}{seconds:>10.3f}{'':>10}")
+        return "\n".join(lines)
+
+
+startup_timer = StartupTimer()
+
+
+def measure_cold_imports(modules: list[str] = PROFILED_MODULES) -> dict[str, float | None]:
+    """
+    Import each module in a fresh interpreter and return its cold import time in seconds.
+
+    Returns:
+        dict: Module name to seconds, or None if it failed to import.
+    """
+    timings = {}
+    for module in modules:
+        code = (
+            "import time; t = time.perf_counter(); "
+            f"import {module}; print(time.perf_counter() - t)"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True
+        )
+        lines = result.stdout.strip().splitlines()
+        timings[module] = float(lines[-1]) if result.returncode == 0 and lines else None
+    return timings
+
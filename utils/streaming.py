@@ -0,0 +1,136 @@
+import time
+from typing import Any, Iterable, Iterator
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langgraph.constants import TAG_NOSTREAM
+
+# Stream modes to pass to `agent.stream`/`agent.astream` for `iter_agent_events`
+STREAM_MODES = ["messages", "updates"]
+# Model calls made inside tools (e.g. the fast model condensing their output)
+# carry one of these tags; their tokens are not part of the assistant's answer
+UNSTREAMED_TAGS = {TAG_NOSTREAM, "compression"}
+
+
+def text_of(content: Any) -> str:
+    """Return the text of a message's content, whether a string or a list of blocks."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block.get("text", "") if isinstance(block, dict) else str(block)
+            for block in content
+        )
+    return ""
+
+
+def iter_agent_events(stream: Iterable) -> Iterator[tuple[str, Any]]:
+    """
+    Turn a multi-mode agent stream into small, incremental events.
+
+    Args:
+        stream: Items yielded by `agent.stream(..., stream_mode=STREAM_MODES)`.
+
+    Yields:
+        tuple: One of
+            ("token", str) for a piece of assistant text,
+            ("message", AIMessage) for every completed assistant message,
+            ("tool_call", dict) for each tool call the assistant makes,
+            ("tool_result", ToolMessage) for each finished tool call.
+    """
+    for mode, payload in stream:
+        if mode == "messages":
+            chunk, metadata = payload
+            if UNSTREAMED_TAGS.intersection((metadata or {}).get("tags") or ()):
+                continue
+            if isinstance(chunk, AIMessage):
+                text = text_of(chunk.content)
+                if text:
+                    yield "token", text
+        elif mode == "updates":
+            for update in (payload or {}).values():
+                if not isinstance(update, dict):
+                    continue
+                messages = update.get("messages")
+                if not isinstance(messages, list):
+                    continue
+                for msg in messages:
+                    if isinstance(msg, AIMessage):
+                        yield "message", msg
+                        for tool_call in msg.tool_calls:
+                            yield "tool_call", tool_call
+                    elif isinstance(msg, ToolMessage):
+                        yield "tool_result", msg
+
+
+def format_tool_call(tool_call: dict) -> str:
+    """One-line Markdown description of a tool call."""
+    return f"**Using Tool:** `{tool_call['name']}` with `{tool_call['args']}`"
+
+
+def format_tool_result(msg: ToolMessage) -> str:
+    """One-line Markdown summary of a tool result (name, status and size)."""
+    size = len(text_of(msg.content))
+    status = " (error)" if getattr(msg, "status", None) == "error" else ""
+    return f"**Tool Result:** `{msg.name}`{status} – {size:,} chars"
+
+
+class IncrementalMarkdown:
+    """
+    Render a growing Markdown transcript without re-rendering what is already on screen.
+
+    The transcript is split into segments, each backed by its own placeholder.
+    Finished segments are written once; only the active one is re-rendered, and
+    at most every `flush_interval` seconds.
+
+    Args:
+        container: A Streamlit container (e.g. `st.container()`) to render into.
+        flush_interval (float): Minimum seconds between two UI updates.
+    """
+
+    def __init__(self, container, flush_interval: float = 0.05):
+        self.container = container
+        self.flush_interval = flush_interval
+        self._segments: list[str] = []
+        self._active: list[str] = []
+        self._placeholder = None
+        self._dirty = False
+        self._last_flush = 0.0
+
+    def append(self, text: str):
+        """Append streamed text to the active segment."""
+        if self._placeholder is None:
+            self._placeholder = self.container.empty()
+            self._active = []
+        self._active.append(text)
+        self._dirty = True
+        self.flush()
+
+    def add_block(self, text: str):
+        """Close the active segment and render `text` as a standalone block."""
+        self.end_segment()
+        self.container.markdown(text)
+        self._segments.append(text)
+
+    def end_segment(self):
+        """Finish the active segment; the next `append` starts a new one."""
+        self.flush(force=True)
+        if self._placeholder is not None:
+            self._segments.append("".join(self._active))
+        self._placeholder = None
+        self._active = []
+
+    def flush(self, force: bool = False):
+        now = time.perf_counter()
+        if not self._dirty or self._placeholder is None:
+            return
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._placeholder.markdown("".join(self._active))
+        self._dirty = False
+        self._last_flush = now
+
+    @property
+    def text(self) -> str:
+        """The whole transcript rendered so far, as one Markdown string."""
+        parts = self._segments + (["".join(self._active)] if self._active else [])
+        return "\n\n".join(part for part in parts if part)
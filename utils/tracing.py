@@ -0,0 +1,400 @@
+import json
+import os
+import secrets
+import threading
+import time
+
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config import CACHE_DIR
+from tools.registry import track_cache_lookups, track_upstream_calls
+
+load_dotenv()
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "True").lower() == "true"
+TRACE_PATH = os.getenv("TRACE_PATH", os.path.join(CACHE_DIR, "traces.jsonl"))
+# The trace file is rotated to `<TRACE_PATH>.1` once it grows past this size
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024**2)))
+SERVICE_NAME = "cyber-researcher"
+
+# Where the time of a tool call is accounted in turn summaries
+TOOL_CATEGORIES = {
+    "internet_search": "search",
+    "internet_search_many": "search",
+    "crawl_url": "crawl",
+    "search_crawled": "crawl",
+    "differentiate": "math",
+    "integrate_expression": "math",
+    "solve_equation": "math",
+    "matrix_operation": "math",
+    "evaluate_expression_grid": "math",
+    "preprocess_math": "math",
+    "calculate": "math",
+    "search_files": "files",
+    "ls": "files",
+    "read_file": "files",
+    "write_file": "files",
+    "edit_file": "files",
+    "glob": "files",
+    "grep": "files",
+}
+
+_export_lock = threading.Lock()
+
+
+def _text_size(content) -> int:
+    if isinstance(content, str):
+        return len(content)
+    return len(json.dumps(content, ensure_ascii=False, default=str))
+
+
+def _is_error(output) -> bool:
+    if getattr(output, "status", None) == "error":
+        return True
+    content = getattr(output, "content", output)
+    # Tools report failures as "Error: ..." strings rather than raising
+    return isinstance(content, str) and content.startswith("Error")
+
+
+class TurnTracer(BaseCallbackHandler):
+    """
+    Record a span for every model call and tool call of one agent turn.
+
+    Pass the tracer in the run's `callbacks`, then call `finish` when the turn
+    is over. Spans carry start and end times, input and output sizes, token
+    usage reported by the model, cache hits of tool calls and errors, and are
+    exported as OpenTelemetry (OTLP JSON) records.
+
+    Args:
+        session_id (str): Conversation thread the turn belongs to.
+        prompt (str): The user's message, whose size is recorded on the turn span.
+    """
+
+    # Spans must be timed when the event happens, and cache lookups are
+    # attributed through context variables set in the call's own context
+    run_inline = True
+
+    def __init__(self, session_id: str = "", prompt: str = ""):
+        self.trace_id = secrets.token_hex(16)
+        self.root = {
+            "span_id": secrets.token_hex(8),
+            "parent_id": None,
+            "name": "invoke_agent",
+            "kind": "turn",
+            "start_ns": time.time_ns(),
+            "end_ns": None,
+            "attributes": {"gen_ai.conversation.id": str(session_id), "io.input_chars": len(prompt)},
+            "error": None,
+        }
+        self.spans: list[dict] = []
+        self._open: dict = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, parent_run_id, kind: str, name: str, attributes: dict) -> dict:
+        span = {
+            "span_id": secrets.token_hex(8),
+            "name": name,
+            "kind": kind,
+            "start_ns": time.time_ns(),
+            "end_ns": None,
+            "attributes": attributes,
+            "error": None,
+        }
+        with self._lock:
+            parent = self._open.get(parent_run_id)
+            span["parent_id"] = parent["span_id"] if parent else self.root["span_id"]
+            self._open[run_id] = span
+        return span
+
+    def _end(self, run_id, error: str | None = None) -> dict | None:
+        with self._lock:
+            span = self._open.pop(run_id, None)
+            if span is None:
+                return None
+            span["end_ns"] = time.time_ns()
+            span["error"] = error
+            cache = span.pop("cache", None)
+            if cache and (cache["hits"] or cache["misses"]):
+                span["attributes"]["cache.hits"] = cache["hits"]
+                span["attributes"]["cache.misses"] = cache["misses"]
+            upstream = span.pop("upstream", None)
+            if upstream and (upstream["queue_wait_s"] or upstream["retries"]):
+                span["attributes"]["upstream.queue_wait_s"] = round(upstream["queue_wait_s"], 4)
+                span["attributes"]["upstream.retries"] = upstream["retries"]
+            self.spans.append(span)
+        return span
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or "model"
+        attributes = {
+            "gen_ai.operation.name": "chat",
+            "gen_ai.request.model": str(model),
+            "io.input_chars": sum(_text_size(m.content) for batch in messages for m in batch),
+        }
+        # The fast model condensing tool outputs (utils.compression) tags its calls
+        compression = "compression" in (kwargs.get("tags") or [])
+        if compression:
+            attributes["llm.role"] = "compression"
+        span = self._start(
+            run_id,
+            parent_run_id,
+            "llm",
+            f"{'compress' if compression else 'chat'} {model}",
+            attributes,
+        )
+        span["cache"] = track_cache_lookups()
+        span["upstream"] = track_upstream_calls()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self._end(run_id)
+        if span is None:
+            return
+        usage, output_chars = {}, 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                output_chars += len(generation.text or "")
+                if message is not None:
+                    output_chars += _text_size(getattr(message, "tool_calls", []) or "")
+                    usage = getattr(message, "usage_metadata", None) or usage
+        attributes = span["attributes"]
+        attributes["io.output_chars"] = output_chars
+        if usage:
+            attributes["gen_ai.usage.input_tokens"] = usage.get("input_tokens", 0)
+            attributes["gen_ai.usage.output_tokens"] = usage.get("output_tokens", 0)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=f"{type(error).__name__}: {error}")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name", "tool")
+        span = self._start(
+            run_id,
+            parent_run_id,
+            "tool",
+            f"execute_tool {name}",
+            {
+                "gen_ai.operation.name": "execute_tool",
+                "gen_ai.tool.name": name,
+                "io.input_chars": len(input_str or ""),
+            },
+        )
+        span["cache"] = track_cache_lookups()
+        span["upstream"] = track_upstream_calls()
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        content = getattr(output, "content", output)
+        error = str(content)[:200] if _is_error(output) else None
+        span = self._end(run_id, error=error)
+        if span is not None:
+            span["attributes"]["io.output_chars"] = _text_size(content)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=f"{type(error).__name__}: {error}")
+
+    def finish(self, error: str | None = None, export: bool = TRACING_ENABLED) -> dict:
+        """
+        Close the turn, export its spans and return its summary.
+
+        Args:
+            error: Why the turn failed, if it did.
+            export: Append the spans to `TRACE_PATH`.
+
+        Returns:
+            dict: See `summarize`.
+        """
+        self.root["end_ns"] = time.time_ns()
+        self.root["error"] = error
+        if export:
+            try:
+                export_spans(self)
+            except OSError:
+                # Tracing must never break a turn
+                pass
+        return self.summarize()
+
+    def summarize(self, top: int = 5) -> dict:
+        """
+        Break the turn down by where its time went.
+
+        Returns:
+            dict: 'total_s'; 'categories' (busy seconds per model, search, crawl,
+                math, files and other tools; parallel calls overlap); 'overhead_s'
+                (time outside any model or tool call); 'llm' (main model),
+                'compression' (fast model) and 'tools' counters;
+                'upstream' seconds queued and retries at the API governors;
+                'steps' in start order and the `top` 'slowest' steps.
+        """
+        end_ns = self.root["end_ns"] or time.time_ns()
+        start_ns = self.root["start_ns"]
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start_ns"])
+        steps, categories = [], {}
+        llm = {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cache_hits": 0}
+        tools = {"calls": 0, "errors": 0, "cache_hits": 0, "cache_misses": 0}
+        compression = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+        upstream = {"queue_wait_s": 0.0, "retries": 0}
+        for span in spans:
+            attributes = span["attributes"]
+            upstream["queue_wait_s"] += attributes.get("upstream.queue_wait_s", 0.0)
+            upstream["retries"] += attributes.get("upstream.retries", 0)
+            if span["kind"] == "llm" and attributes.get("llm.role") == "compression":
+                category = "compress"
+                compression["calls"] += 1
+                compression["input_tokens"] += attributes.get("gen_ai.usage.input_tokens", 0)
+                compression["output_tokens"] += attributes.get("gen_ai.usage.output_tokens", 0)
+                label = span["name"]
+            elif span["kind"] == "llm":
+                category = "llm"
+                llm["calls"] += 1
+                llm["input_tokens"] += attributes.get("gen_ai.usage.input_tokens", 0)
+                llm["output_tokens"] += attributes.get("gen_ai.usage.output_tokens", 0)
+                llm["cache_hits"] += attributes.get("cache.hits", 0)
+                label = span["name"]
+            else:
+                label = attributes["gen_ai.tool.name"]
+                category = TOOL_CATEGORIES.get(label, "other")
+                tools["calls"] += 1
+                tools["errors"] += span["error"] is not None
+                tools["cache_hits"] += attributes.get("cache.hits", 0)
+                tools["cache_misses"] += attributes.get("cache.misses", 0)
+            duration = (span["end_ns"] - span["start_ns"]) / 1e9
+            categories[category] = categories.get(category, 0.0) + duration
+            steps.append(
+                {
+                    "name": label,
+                    "category": category,
+                    "start_s": round((span["start_ns"] - start_ns) / 1e9, 3),
+                    "duration_s": round(duration, 3),
+                    "input_chars": attributes.get("io.input_chars", 0),
+                    "output_chars": attributes.get("io.output_chars", 0),
+                    "cache_hits": attributes.get("cache.hits", 0),
+                    "error": span["error"],
+                }
+            )
+        busy, covered_until = 0, start_ns
+        for span in spans:
+            if span["end_ns"] > covered_until:
+                busy += span["end_ns"] - max(span["start_ns"], covered_until)
+                covered_until = span["end_ns"]
+        total = (end_ns - start_ns) / 1e9
+        return {
+            "trace_id": self.trace_id,
+            "total_s": round(total, 3),
+            "categories": {name: round(seconds, 3) for name, seconds in categories.items()},
+            "overhead_s": round(max(0.0, total - busy / 1e9), 3),
+            "llm": llm,
+            "tools": tools,
+            "compression": compression,
+            "upstream": {"queue_wait_s": round(upstream["queue_wait_s"], 3), "retries": upstream["retries"]},
+            "steps": steps,
+            "slowest": sorted(steps, key=lambda step: step["duration_s"], reverse=True)[:top],
+            "error": self.root["error"],
+        }
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP JSON encodes 64-bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span: dict, trace_id: str) -> dict:
+    record = {
+        "traceId": trace_id,
+        "spanId": span["span_id"],
+        "name": span["name"],
+        # SPAN_KIND_INTERNAL for the turn, SPAN_KIND_CLIENT for model and tool calls
+        "kind": 1 if span["kind"] == "turn" else 3,
+        "startTimeUnixNano": str(span["start_ns"]),
+        "endTimeUnixNano": str(span["end_ns"]),
+        "attributes": [
+            {"key": key, "value": _otlp_value(value)} for key, value in span["attributes"].items()
+        ],
+        # STATUS_CODE_OK / STATUS_CODE_ERROR
+        "status": {"code": 2, "message": span["error"]} if span["error"] else {"code": 1},
+    }
+    if span["parent_id"]:
+        record["parentSpanId"] = span["parent_id"]
+    return record
+
+
+def export_spans(tracer: TurnTracer, path: str = TRACE_PATH):
+    """
+    Append a finished turn to the trace file as one OTLP JSON line.
+
+    Each line is an `ExportTraceServiceRequest`, the format written by the
+    OpenTelemetry Collector's file exporter, so the file can be replayed into
+    any OTLP-compatible backend.
+    """
+    record = {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": SERVICE_NAME}}
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": f"{SERVICE_NAME}.tracing"},
+                        "spans": [
+                            _otlp_span(span, tracer.trace_id)
+                            for span in [tracer.root, *tracer.spans]
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _export_lock:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) > TRACE_MAX_BYTES:
+            os.replace(path, path + ".1")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def format_summary(summary: dict) -> str:
+    """Render a turn summary as plain text: time per category and the slowest steps."""
+    lines = [f"Turn took {summary['total_s']:.2f} s (busy time per category; parallel calls overlap)"]
+    busy = sorted(summary["categories"].items(), key=lambda item: item[1], reverse=True)
+    parts = [f"{name} {seconds:.2f} s" for name, seconds in busy]
+    parts.append(f"agent overhead {summary['overhead_s']:.2f} s")
+    lines.append("  " + ", ".join(parts))
+    llm, tools = summary["llm"], summary["tools"]
+    lines.append(
+        f"  {llm['calls']} model calls ({llm['cache_hits']} cached, "
+        f"{llm['input_tokens']} in / {llm['output_tokens']} out tokens), "
+        f"{tools['calls']} tool calls ({tools['errors']} errors, "
+        f"{tools['cache_hits']} cache hits)"
+    )
+    compression = summary["compression"]
+    if compression["calls"]:
+        lines.append(
+            f"  {compression['calls']} fast-model calls condensing tool outputs "
+            f"({compression['input_tokens']} in / {compression['output_tokens']} out tokens)"
+        )
+    upstream = summary["upstream"]
+    if upstream["queue_wait_s"] or upstream["retries"]:
+        lines.append(
+            f"  API rate limiting: {upstream['queue_wait_s']:.2f} s queued, "
+            f"{upstream['retries']} retries"
+        )
+    if summary["slowest"]:
+        lines.append("  Slowest steps:")
+        for step in summary["slowest"]:
+            flag = "  [error]" if step["error"] else ""
+            lines.append(
+                f"    {step['duration_s']:>7.2f} s  {step['name']} "
+                f"(at +{step['start_s']:.2f} s){flag}"
+            )
+    return "\n".join(lines)